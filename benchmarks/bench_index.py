@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compare DefaultSelectorHandler and IndexedSelectorHandler
+on synthetic class-heavy listing pages.
+
+    $ PYTHONPATH=. python benchmarks/bench_index.py --items 2000 --repeat 5
+
+The index is built once per document; it pays off when simple selectors
+are evaluated on large parts of the document (document-wide keys,
+large scopes), much less for selectors inside small iterated scopes.
+"""
+
+from __future__ import print_function
+import optparse
+import random
+import timeit
+
+import lxml.etree
+
+import parslepy
+from parslepy.index import IndexedSelectorHandler
+
+# values from iterated scopes: selectors run on small subtrees
+SCOPED_RULES = {
+    "title": "h1#title",
+    "categories": [".nav .category"],
+    "products(div.product)": [{
+        "name": "h2.name",
+        "price": "span.price",
+        "currency": "span.currency",
+        "stock": ".stock",
+        "url": "a.details @href",
+        "tags": [".tag"],
+    }],
+}
+
+# document-wide keys: each selector scans the whole document
+DOCUMENT_RULES = {
+    "title": "h1#title",
+    "categories": [".category"],
+    "names": ["h2.name"],
+    "prices": ["span.price"],
+    "currencies": ["span.currency"],
+    "stock": [".stock"],
+    "urls": ["a.details @href"],
+    "tags": [".tag"],
+    "badges": [".badge"],
+    "cards": [".card.shadow @class"],
+}
+
+def make_page(items, seed=0):
+    rnd = random.Random(seed)
+    parts = ['<html><head><title>Listing</title></head><body>',
+             '<h1 id="title" class="page-title">Listing</h1>',
+             '<ul class="nav">%s</ul>' % "".join(
+                '<li class="category c%d">Category %d</li>' % (i, i) for i in range(30))]
+    for i in range(items):
+        parts.append(
+            '<div class="product card shadow col-%d">'
+            '<div class="wrap inner"><h2 class="name title">Product %d</h2>'
+            '<p class="desc text muted">%s</p>'
+            '<span class="price amount">%d.99</span><span class="currency">EUR</span>'
+            '<span class="stock badge">In stock</span>'
+            '<a class="details link" href="/product/%d">details</a>'
+            '%s</div></div>' % (
+                i % 12, i, "lorem ipsum " * rnd.randint(1, 5), rnd.randint(1, 500), i,
+                "".join('<span class="tag label">t%d</span>' % rnd.randint(0, 50)
+                        for _ in range(rnd.randint(0, 4)))))
+    parts.append('</body></html>')
+    return "".join(parts)
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option("--items", type="int", default=1000,
+        help="number of products per page")
+    parser.add_option("--repeat", type="int", default=3)
+    options, args = parser.parse_args()
+
+    html = make_page(options.items)
+    document = lxml.etree.fromstring(html, parser=lxml.etree.HTMLParser())
+    print("%d elements, %d products" % (
+        sum(1 for _ in document.iter()), options.items))
+
+    for title, rules in (("scoped keys", SCOPED_RULES),
+                         ("document-wide keys", DOCUMENT_RULES)):
+        print(title)
+        default = parslepy.Parselet(rules)
+        indexed = parslepy.Parselet(rules, selector_handler=IndexedSelectorHandler())
+
+        def run_indexed():
+            # new index for each run, as for a new document
+            indexed.selector_handler.clear()
+            return indexed.extract(document)
+
+        assert default.extract(document) == run_indexed()
+
+        for name, function in (("default", lambda: default.extract(document)),
+                               ("indexed", run_indexed)):
+            best = min(timeit.repeat(function, number=1, repeat=options.repeat))
+            print("    %-8s %8.1f ms" % (name, best * 1000))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Count the strings shared (and bytes saved) by a StringInterner
+on the documents in tests/data and on synthetic listing pages.
+
+    $ PYTHONPATH=. python benchmarks/bench_interning.py --items 2000 --pages 10
+"""
+
+from __future__ import print_function
+import optparse
+import os
+import random
+import timeit
+
+import lxml.etree
+
+import parslepy
+from parslepy.interning import StringInterner
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tests", "data")
+
+# (file, XML?, Parsley script)
+SAMPLES = (
+    ("itunes.topalbums.rss", True, {
+        "entries(//atom:feed/atom:entry)": [{
+            "title": "atom:title",
+            "artist": "im:artist",
+            "category": "atom:category/@label",
+            "rights": "atom:rights",
+            "price": "im:price/@currency",
+            "images(im:image)": [{"height": "@height", "url": "."}],
+        }],
+    }),
+    ("validator.w3.org.html", False, {
+        "links(a)": [{"url?": "@href", "title?": "@title", "text": "."}],
+        "options(option)": [{"value?": "@value", "label": "."}],
+    }),
+    ("creativecommons.org__licenses__by__3.0.html", False, {
+        "links(a)": [{"url?": "@href", "text": "."}],
+        "languages(#languages a)": [{"lang?": "@hreflang", "title?": "@title"}],
+    }),
+)
+
+LISTING_RULES = {
+    "products(div.product)": [{
+        "name": "h2",
+        "price": "span.price",
+        "currency": "span.currency",
+        "stock": "span.stock",
+        "category": "span.category",
+        "seller": "span.seller",
+    }],
+}
+
+CATEGORIES = ["Books", "Music", "Garden", "Kitchen", "Toys", "Electronics"]
+
+def make_page(items, seed=0):
+    rnd = random.Random(seed)
+    parts = ['<html><body>']
+    for i in range(items):
+        parts.append(
+            '<div class="product"><h2>Product %d</h2>'
+            '<span class="price">%d.99</span><span class="currency">EUR</span>'
+            '<span class="stock">%s</span><span class="category">%s</span>'
+            '<span class="seller">Seller %d</span></div>' % (
+                i, rnd.randint(1, 500), rnd.choice(["In stock", "Sold out"]),
+                rnd.choice(CATEGORIES), rnd.randint(0, 50)))
+    parts.append('</body></html>')
+    return "".join(parts)
+
+def report(name, interner, seconds=None):
+    print("%-46s %6d hits %6d misses %9d bytes saved%s" % (
+        name, interner.hits, interner.misses, interner.bytes_saved,
+        "  %7.1f ms" % (seconds * 1000) if seconds is not None else ""))
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option("--items", type="int", default=1000,
+        help="number of products per page")
+    parser.add_option("--pages", type="int", default=10)
+    options, args = parser.parse_args()
+
+    namespaces = {"atom": "http://www.w3.org/2005/Atom",
+                  "im": "http://itunes.apple.com/rss"}
+    for filename, xml, rules in SAMPLES:
+        html_parser = lxml.etree.XMLParser() if xml else lxml.etree.HTMLParser()
+        document = lxml.etree.parse(os.path.join(DATA, filename),
+            parser=html_parser).getroot()
+        interner = StringInterner()
+        parselet = parslepy.Parselet(rules, interner=interner,
+            selector_handler=parslepy.DefaultSelectorHandler(namespaces=namespaces))
+        parselet.extract(document)
+        report(filename, interner)
+
+    documents = [lxml.etree.fromstring(make_page(options.items, seed),
+                                       parser=lxml.etree.HTMLParser())
+                 for seed in range(options.pages)]
+    plain = parslepy.Parselet(LISTING_RULES)
+    seconds = min(timeit.repeat(
+        lambda: [plain.extract(d) for d in documents], number=1, repeat=3))
+    print("%-46s %49s  %7.1f ms" % ("listing, no interning", "", seconds * 1000))
+    for title, per_document in (("listing, per document", True),
+                                ("listing, per batch", False)):
+        interner = StringInterner(per_document=per_document)
+        parselet = parslepy.Parselet(LISTING_RULES, interner=interner)
+        seconds = min(timeit.repeat(
+            lambda: [parselet.extract(d) for d in documents], number=1, repeat=1))
+        report(title, interner, seconds)
+
+if __name__ == '__main__':
+    main()
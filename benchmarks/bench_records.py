@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compare the memory retained by dict output and record output
+(``Parselet(..., records=True)``) on synthetic listing pages.
+
+    $ PYTHONPATH=. python benchmarks/bench_records.py --items 2000 --pages 20
+
+Results of all pages are kept, as when accumulating results
+before writing them; memory is measured with tracemalloc.
+"""
+
+from __future__ import print_function
+import gc
+import optparse
+import random
+import timeit
+import tracemalloc
+
+import lxml.etree
+
+import parslepy
+
+RULES = {
+    "title": "h1",
+    "products(div.product)": [{
+        "name": "h2",
+        "price": "span.price",
+        "currency": "span.currency",
+        "url": "a @href",
+        "rating?": "span.rating",
+        "seller(div.seller)": {"name": "span.name", "country": "span.country"},
+    }],
+}
+
+def make_page(items, seed=0):
+    rnd = random.Random(seed)
+    parts = ['<html><head><title>Listing</title></head><body><h1>Listing</h1>']
+    for i in range(items):
+        parts.append(
+            '<div class="product"><h2>Product %d</h2>'
+            '<span class="price">%d.99</span><span class="currency">EUR</span>'
+            '<a href="/product/%d">details</a>%s'
+            '<div class="seller"><span class="name">Seller %d</span>'
+            '<span class="country">FR</span></div></div>' % (
+                i, rnd.randint(1, 500), i,
+                '<span class="rating">%d</span>' % rnd.randint(1, 5)
+                    if rnd.random() < 0.7 else "",
+                rnd.randint(0, 100)))
+    parts.append('</body></html>')
+    return "".join(parts)
+
+def retained(parselet, documents):
+    # lxml keeps some memory allocated during XPath evaluation,
+    # so measure what is freed when the results are released
+    tracemalloc.start()
+    results = [parselet.extract(document) for document in documents]
+    gc.collect()
+    with_results = tracemalloc.get_traced_memory()[0]
+    del results
+    gc.collect()
+    size = with_results - tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option("--items", type="int", default=1000,
+        help="number of products per page")
+    parser.add_option("--pages", type="int", default=10)
+    parser.add_option("--repeat", type="int", default=3)
+    options, args = parser.parse_args()
+
+    documents = [lxml.etree.fromstring(make_page(options.items, seed),
+                                       parser=lxml.etree.HTMLParser())
+                 for seed in range(options.pages)]
+    print("%d pages, %d products per page" % (options.pages, options.items))
+
+    dicts = parslepy.Parselet(RULES)
+    records = parslepy.Parselet(RULES, records=True)
+    assert records.extract(documents[0]) == dicts.extract(documents[0])
+    dict_size = retained(dicts, documents)
+    record_size = retained(records, documents)
+
+    for name, parselet, size in (("dicts", dicts, dict_size),
+                                 ("records", records, record_size)):
+        best = min(timeit.repeat(lambda: parselet.extract(documents[0]),
+                                 number=1, repeat=options.repeat))
+        print("    %-8s %8.1f MiB retained  %8.1f ms/page" % (
+            name, size / 1048576.0, best * 1000))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Crawl generated listing pages from file:// URLs with Scrapy,
+extracting content in spider callbacks (on the reactor thread)
+or with ParsleyExtractionPipeline (in a thread pool).
+
+    $ PYTHONPATH=. python benchmarks/bench_scrapy_threaded.py --pages 200 --items 1000
+    $ PYTHONPATH=. python benchmarks/bench_scrapy_threaded.py --pages 200 --items 1000 --threaded
+
+Requires Scrapy.
+"""
+
+from __future__ import print_function
+import optparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import scrapy
+from scrapy.crawler import CrawlerProcess
+
+import parslepy
+from parslepy.utils.scrapytools import extract_response
+
+RULES = {
+    "title": "h1",
+    "products(div.product)": [{
+        "name": "h2",
+        "price": "span.price",
+        "url": "a @href",
+        "tags": [".tag"],
+    }],
+}
+
+def make_page(items, seed=0):
+    rnd = random.Random(seed)
+    parts = ['<html><body><h1>Page %d</h1>' % seed]
+    for i in range(items):
+        parts.append(
+            '<div class="product"><h2>Product %d</h2>'
+            '<span class="price">%d.99</span><a href="/product/%d">details</a>%s</div>' % (
+                i, rnd.randint(1, 500), i,
+                "".join('<span class="tag">t%d</span>' % rnd.randint(0, 50)
+                        for _ in range(rnd.randint(0, 4)))))
+    parts.append('</body></html>')
+    return "".join(parts)
+
+
+class ListingSpider(scrapy.Spider):
+    name = "listing"
+    parselet = parslepy.Parselet(RULES)
+    threaded = False
+    items = 0
+
+    def parse(self, response):
+        if self.threaded:
+            yield {"response": response}
+        else:
+            yield extract_response(self.parselet, response)
+
+
+class CountingPipeline(object):
+
+    def process_item(self, item, spider=None):
+        ListingSpider.items += len(item["products"])
+        return item
+
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option("--pages", type="int", default=100)
+    parser.add_option("--items", type="int", default=1000,
+        help="number of products per page")
+    parser.add_option("--threaded", action="store_true", default=False,
+        help="extract with ParsleyExtractionPipeline")
+    parser.add_option("--threads", type="int", default=4)
+    options, args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        urls = []
+        for page in range(options.pages):
+            path = os.path.join(directory, "page-%04d.html" % page)
+            with open(path, "w") as fp:
+                fp.write(make_page(options.items, page))
+            urls.append("file://" + path)
+
+        pipelines = {"__main__.CountingPipeline": 200}
+        if options.threaded:
+            pipelines["parslepy.utils.scrapytools.ParsleyExtractionPipeline"] = 100
+        process = CrawlerProcess({
+            "LOG_LEVEL": "WARNING",
+            "ITEM_PIPELINES": pipelines,
+            "PARSLEPY_EXTRACTION_THREADS": options.threads,
+        })
+        ListingSpider.threaded = options.threaded
+        ListingSpider.start_urls = urls
+        start = time.time()
+        process.crawl(ListingSpider)
+        process.start()
+        elapsed = time.time() - start
+        print("%s: %d pages, %d items in %.2fs (%.1f pages/s)" % (
+            "threaded" if options.threaded else "reactor thread",
+            options.pages, ListingSpider.items, elapsed, options.pages / elapsed))
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    main()
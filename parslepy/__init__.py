@@ -1,8 +1,47 @@
-from parslepy.base import Parselet, Parslet, NonMatchingNonOptionalKey, InvalidKeySyntax
-from parslepy.selectors import DefaultSelectorHandler, XPathSelectorHandler
+import sys
 
 __version__ = '0.2.0'
 __all__ = [
     'Parselet', 'Parslet',
     'DefaultSelectorHandler', 'XPathSelectorHandler',
-    'NonMatchingNonOptionalKey', 'InvalidKeySyntax']
+    'NonMatchingNonOptionalKey', 'InvalidKeySyntax', 'SlowSelectorWarning',
+    'BudgetExceeded']
+
+# public names, by module; imported on first access
+_LAZY_ATTRIBUTES = {
+    'Parselet': 'parslepy.base',
+    'Parslet': 'parslepy.base',
+    'NonMatchingNonOptionalKey': 'parslepy.base',
+    'InvalidKeySyntax': 'parslepy.base',
+    'SlowSelectorWarning': 'parslepy.base',
+    'BudgetExceeded': 'parslepy.budgets',
+    'DefaultSelectorHandler': 'parslepy.selectors',
+    'XPathSelectorHandler': 'parslepy.selectors',
+}
+
+if sys.version_info >= (3, 7):
+    import importlib
+
+    def __getattr__(name):
+        module = _LAZY_ATTRIBUTES.get(name)
+        if module is not None:
+            value = getattr(importlib.import_module(module), name)
+            globals()[name] = value
+            return value
+        # submodules, e.g. parslepy.base after "import parslepy"
+        try:
+            return importlib.import_module("%s.%s" % (__name__, name))
+        except ImportError as e:
+            if getattr(e, "name", None) != "%s.%s" % (__name__, name):
+                raise
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+    def __dir__():
+        return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
+
+else:
+    # no module __getattr__ (PEP 562)
+    from parslepy.base import Parselet, Parslet, NonMatchingNonOptionalKey, \
+        InvalidKeySyntax, SlowSelectorWarning
+    from parslepy.budgets import BudgetExceeded
+    from parslepy.selectors import DefaultSelectorHandler, XPathSelectorHandler
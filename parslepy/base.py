@@ -2,10 +2,16 @@
 
 from __future__ import unicode_literals
 from parslepy.selectors import DefaultSelectorHandler, SelectorHandler, Selector
+from parslepy.selectors import xpath_scan, SCAN_DOCUMENT_DESCENDANTS, \
+    SCAN_DOCUMENT, SCAN_DESCENDANTS, SCAN_CHILDREN
+from parslepy.selectors import DocumentSelector, xpath_is_document_rooted
 import lxml.etree
-import lxml.html
+import os
 import re
 import json
+import threading
+import warnings
+from timeit import default_timer
 
 # http://stackoverflow.com/questions/11301138/how-to-check-if-variable-is-string-with-python-2-and-3-compatibility
 try:
@@ -39,7 +45,7 @@ class ParsleyContext(object):
     Used as keys in `ParsleyNode` objects
     """
 
-    def __init__(self, key, operator=None, required=True, scope=None, iterate=False):
+    def __init__(self, key, operator=None, required=True, scope=None, iterate=False, path=None):
         """
         Only `key` is required
 
@@ -48,6 +54,8 @@ class ParsleyContext(object):
         required (boolean) -- whether the key is required in the output (defaults to True)
         scope (`Selector`) -- restrict extraction to elements matching this selector
         iterate (boolean)  -- whether multiple objects will be extracted (defaults to False)
+        path (str)         -- "/"-separated keys from the root of the Parsley tree
+                              (defaults to `key`)
         """
 
         self.key = key
@@ -55,6 +63,7 @@ class ParsleyContext(object):
         self.required = required
         self.scope = scope
         self.iterate = iterate
+        self.path = path or key
 
     def __repr__(self):
         return "<ParsleyContext: k=%s; op=%s; required=%s; scope=%s; iter=%s>" % (
@@ -114,14 +123,38 @@ class InvalidKeySyntax(SyntaxError):
     pass
 
 
+class SlowSelectorWarning(UserWarning):
+    """
+    Issued when compiling a :class:`.Parselet` with a selector
+    that looks document-rooted inside an iterated scope,
+    but that cannot safely be evaluated only once per document:
+    it will be evaluated against the whole document for each element in scope.
+
+    >>> import warnings
+    >>> import parslepy
+    >>> with warnings.catch_warnings(record=True) as w:
+    ...     warnings.simplefilter("always")
+    ...     p = parslepy.Parselet({"items(li)": [{"n": "count(//li)"}]})
+    ...     print(w[0].message)
+    items/n: selector count(//li) inside an iterated scope is evaluated against the whole document for each element
+    """
+
+    pass
+
+
 class Parselet(object):
 
     DEBUG = False
     SPECIAL_LEVEL_KEY = "--"
     KEEP_ONLY_FIRST_ELEMENT_IF_LIST = True
     STRICT_MODE = False
+    OPTIMIZE = True
+    PRUNE = False
+    RECORDS = False
 
-    def __init__(self, parselet, selector_handler=None, strict=False, debug=False):
+    def __init__(self, parselet, selector_handler=None, strict=False, debug=False,
+                 metrics=None, tracer=None, optimize=True, prune=False,
+                 records=False, interner=None, budget=None):
         """
         Take a parselet and optional selector_handler
         and build an abstract representation of the Parsley extraction
@@ -138,6 +171,26 @@ class Parselet(object):
         :param selector_handler: an instance of :class:`selectors.SelectorHandler`
             optional selector handler instance;
             defaults to an instance of :class:`selectors.DefaultSelectorHandler`
+        :param metrics: optional :class:`parslepy.metrics.MetricsRegistry` instance
+            updated while compiling, parsing and extracting
+        :param tracer: optional :class:`parslepy.tracing.Tracer` instance
+            notified of documents, keys, scopes and selector evaluations;
+            `debug=True` attaches a :class:`parslepy.tracing.PrintTracer`
+        :param boolean optimize: evaluate document-rooted selectors
+            (e.g. ``//h1``) inside iterated scopes only once per document;
+            default is True
+        :param boolean prune: remove elements that no selector mentions
+            (``script``, ``style``, ``svg``...) and comments from documents
+            right after :meth:`.parse` and :meth:`.parse_fromstring`
+            parse them; see :class:`parslepy.pruning.PruningProfile`.
+            Default is False
+        :param boolean records: return compact record objects
+            (see :mod:`parslepy.records`) instead of dicts; default is False
+        :param interner: optional :class:`parslepy.interning.StringInterner`
+            instance sharing one object between identical extracted strings
+            (and output keys)
+        :param budget: optional :class:`parslepy.budgets.Budget` instance
+            limiting the resources used for each document
         :raises: :class:`.InvalidKeySyntax`
 
         Example:
@@ -162,11 +215,22 @@ class Parselet(object):
             self.DEBUG = True
         if strict:
             self.STRICT_MODE = True
+        if not optimize:
+            self.OPTIMIZE = False
+        if prune:
+            self.PRUNE = True
+        if records:
+            self.RECORDS = True
 
         self.parselet =  parselet
 
+        if tracer is None and self.DEBUG:
+            from parslepy.tracing import PrintTracer
+            tracer = PrintTracer()
+        self.tracer = tracer
+
         if not selector_handler:
-            self.selector_handler = DefaultSelectorHandler(debug=self.DEBUG)
+            self.selector_handler = DefaultSelectorHandler(tracer=tracer)
 
         elif not(isinstance(selector_handler, SelectorHandler)):
             raise ValueError("You must provide a SelectorHandler instance")
@@ -174,12 +238,28 @@ class Parselet(object):
         else:
             self.selector_handler = selector_handler
 
+        self.interner = interner
+        self.budget = budget
+
+        self.metrics = metrics
+        if metrics is not None and self.selector_handler.metrics is None:
+            self.selector_handler.metrics = metrics
+        if tracer is not None and self.selector_handler.tracer is None:
+            self.selector_handler.tracer = tracer
+
         self.compile()
 
     # accept comments in parselets
-    REGEX_COMMENT_LINE = re.compile(r'^\s*#')
+    REGEX_COMMENT_LINES = re.compile(r'^\s*#.*$', re.MULTILINE)
+
+    # Parselets created from files, by (class, path, format, arguments):
+    # (modification time and size of the file, Parselet) tuples
+    _file_cache = {}
+    _file_cache_lock = threading.Lock()
+
     @classmethod
-    def from_jsonfile(cls, fp, selector_handler=None, strict=False, debug=False):
+    def from_jsonfile(cls, fp, selector_handler=None, strict=False, debug=False,
+                      cache=True, **kwargs):
         """
         Create a Parselet instance from a file containing
         the Parsley script as a JSON object
@@ -191,16 +271,20 @@ class Parselet(object):
         <parslepy.base.Parselet object at 0x2014e50>
 
         :param file fp: an open file-like pointer containing the Parsley script
+        :param boolean cache: return the instance already created
+            from the same file, if unchanged, with the same arguments
+            (see :meth:`.clear_file_cache`); default is True
         :rtype: :class:`.Parselet`
 
         Other arguments: same as for :class:`.Parselet` contructor
         """
 
-        return cls._from_jsonlines(fp,
-            selector_handler=selector_handler, strict=strict, debug=debug)
+        return cls._from_file(fp, "json", cache,
+            selector_handler=selector_handler, strict=strict, debug=debug, **kwargs)
 
     @classmethod
-    def from_yamlfile(cls, fp, selector_handler=None, strict=False, debug=False):
+    def from_yamlfile(cls, fp, selector_handler=None, strict=False, debug=False,
+                      cache=True, **kwargs):
         """
         Create a Parselet instance from a file containing
         the Parsley script as a YAML object
@@ -212,12 +296,69 @@ class Parselet(object):
         <parslepy.base.Parselet object at 0x2014e50>
 
         :param file fp: an open file-like pointer containing the Parsley script
+        :param boolean cache: return the instance already created
+            from the same file, if unchanged, with the same arguments
+            (see :meth:`.clear_file_cache`); default is True
         :rtype: :class:`.Parselet`
 
         Other arguments: same as for :class:`.Parselet` contructor
         """
 
-        return cls.from_yamlstring(fp.read(), selector_handler=selector_handler, strict=strict, debug=debug)
+        return cls._from_file(fp, "yaml", cache,
+            selector_handler=selector_handler, strict=strict, debug=debug, **kwargs)
+
+    @classmethod
+    def _from_file(cls, fp, format, cache, **kwargs):
+        """
+        Create a Parselet from a JSON or YAML file, or return the one
+        in the file cache for the same file (path, modification time
+        and size) and arguments.
+
+        Files without a path or that cannot be stat'ed,
+        and unhashable arguments, are not cached.
+        """
+
+        key = stat = None
+        if cache:
+            key, stat = cls._file_cache_key(fp, format, kwargs)
+        if key is not None:
+            with cls._file_cache_lock:
+                cached = cls._file_cache.get(key)
+            if cached is not None and cached[0] == stat:
+                return cached[1]
+
+        if format == "yaml":
+            parselet = cls(cls._load_yaml(fp.read()), **kwargs)
+        else:
+            parselet = cls._from_jsonstring(fp.read(), **kwargs)
+
+        if key is not None:
+            with cls._file_cache_lock:
+                cls._file_cache[key] = (stat, parselet)
+        return parselet
+
+    @classmethod
+    def _file_cache_key(cls, fp, format, kwargs):
+        name = getattr(fp, "name", None)
+        if not isstr(name):
+            return None, None
+        try:
+            st = os.fstat(fp.fileno())
+            key = (cls, os.path.realpath(name), format, tuple(sorted(kwargs.items())))
+            hash(key)
+        except Exception:
+            return None, None
+        return key, (st.st_mtime, st.st_size)
+
+    @classmethod
+    def clear_file_cache(cls):
+        """
+        Forget the Parselets created by :meth:`.from_jsonfile`
+        and :meth:`.from_yamlfile`
+        """
+
+        with cls._file_cache_lock:
+            cls._file_cache.clear()
 
     @classmethod
     def from_yamlstring(cls, s, selector_handler=None, strict=False, debug=False):
@@ -241,8 +382,17 @@ class Parselet(object):
         Other arguments: same as for :class:`.Parselet` contructor
         """
 
+        return cls(cls._load_yaml(s),
+            selector_handler=selector_handler, strict=strict, debug=debug)
+
+    @staticmethod
+    def _load_yaml(s):
+        """
+        Load YAML with the safe loader, using LibYAML if available
+        """
+
         import yaml
-        return cls(yaml.load(s), selector_handler=selector_handler, strict=strict, debug=debug)
+        return yaml.load(s, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
 
     @classmethod
     def from_jsonstring(cls, s, selector_handler=None, strict=False, debug=False):
@@ -263,19 +413,17 @@ class Parselet(object):
         Other arguments: same as for :class:`.Parselet` contructor
         """
 
-        return cls._from_jsonlines(s.split("\n"),
+        return cls._from_jsonstring(s,
             selector_handler=selector_handler, strict=strict, debug=debug)
 
     @classmethod
-    def _from_jsonlines(cls, lines, selector_handler=None, strict=False, debug=False):
+    def _from_jsonstring(cls, s, **kwargs):
         """
-        Interpret input lines as a JSON Parsley script.
+        Interpret a string as a JSON Parsley script.
         Python-style comment lines are skipped.
         """
 
-        return cls(json.loads(
-                "\n".join([l for l in lines if not cls.REGEX_COMMENT_LINE.match(l)])
-            ), selector_handler=selector_handler, strict=strict, debug=debug)
+        return cls(json.loads(cls.REGEX_COMMENT_LINES.sub("", s)), **kwargs)
 
     def parse(self, fp, parser=None, context=None):
         """
@@ -294,14 +442,31 @@ class Parselet(object):
         to `lxml.etree.parse <http://lxml.de/api/lxml.etree-module.html#parse>`_,
         so you can also give it an URL, and lxml will download it for you.
         (Also see `<http://lxml.de/tutorial.html#the-parse-function>`_.)
+
+        Compressed files and streams (gzip, bzip2, xz, or zstd when
+        the `zstandard` package is installed) are detected from their first
+        bytes and decompressed on the fly, feeding the parser
+        chunk by chunk.
         """
 
+        if self.budget is not None:
+            self._check_budget(self.budget.check_input, self._input_size(fp))
         if parser is None:
-            parser = lxml.etree.HTMLParser()
-        doc = lxml.etree.parse(fp, parser=parser).getroot()
-        return self.extract(doc, context=context)
-
-    def parse_fromstring(self, s, parser=None, context=None):
+            parser = self._default_parser()
+        if self.metrics is not None:
+            start = default_timer()
+        doc = self._parse_input(fp, parser)
+        if self.pruning is not None:
+            self.pruning.prune(doc)
+        if self.metrics is not None:
+            self.metrics.document_parsed(default_timer() - start)
+        if self.tracer is None:
+            return self._extract_document(doc, context=context)
+        return self._extract_document(doc, context=context,
+            source=fp if isstr(fp) else getattr(fp, 'name', None),
+            size=self._input_size(fp))
+
+    def parse_fromstring(self, s, parser=None, context=None, source=None):
         """
         Parse an HTML or XML document and
         return the extacted object following the Parsley rules give at instantiation.
@@ -309,14 +474,66 @@ class Parselet(object):
         :param string s: an HTML or XML document as a string
         :param parser: *lxml.etree._FeedParser* instance (optional); defaults to lxml.etree.HTMLParser()
         :param context: user-supplied context that will be passed to custom XPath extensions (as first argument)
+        :param source: optional document identifier (e.g. URL) reported to tracers
         :rtype: Python :class:`dict` object with mapped extracted content
         :raises: :class:`.NonMatchingNonOptionalKey`
 
         """
+        if self.budget is not None:
+            self._check_budget(self.budget.check_input, len(s))
         if parser is None:
-            parser = lxml.etree.HTMLParser()
+            parser = self._default_parser()
+        if self.metrics is not None:
+            start = default_timer()
         doc = lxml.etree.fromstring(s, parser=parser)
-        return self.extract(doc, context=context)
+        if self.pruning is not None:
+            self.pruning.prune(doc)
+        if self.metrics is not None:
+            self.metrics.document_parsed(default_timer() - start)
+        return self._extract_document(doc, context=context,
+            source=source, size=len(s))
+
+    def _default_parser(self):
+        if self.pruning is not None:
+            return self.pruning.parser()
+        return lxml.etree.HTMLParser()
+
+    @staticmethod
+    def _parse_input(fp, parser):
+        """
+        Parse a document from a filename, URL or file object,
+        decompressing it incrementally if needed; return the root element
+        """
+
+        from parslepy.compression import decompressing_reader, feed_parser
+
+        if isstr(fp):
+            if not os.path.isfile(fp):
+                # e.g. URLs, left to lxml
+                return lxml.etree.parse(fp, parser=parser).getroot()
+            with open(fp, "rb") as f:
+                stream, compression = decompressing_reader(f)
+                if compression is not None:
+                    return feed_parser(parser, stream)
+            return lxml.etree.parse(fp, parser=parser).getroot()
+
+        stream, compression = decompressing_reader(fp)
+        if compression is not None:
+            return feed_parser(parser, stream)
+        return lxml.etree.parse(stream, parser=parser).getroot()
+
+    @staticmethod
+    def _input_size(fp):
+        """
+        Size in bytes of a file given by name or file object, if known
+        """
+
+        try:
+            if isstr(fp):
+                return os.path.getsize(fp)
+            return os.fstat(fp.fileno()).st_size
+        except Exception:
+            return None
 
     def compile(self):
         """
@@ -327,6 +544,96 @@ class Parselet(object):
             raise ValueError("Parselet must be a dict of some sort. Or use .from_jsonstring(), " \
                 ".from_jsonfile(), .from_yamlstring(), or .from_yamlfile()")
         self.parselet_tree = self._compile(self.parselet)
+        self._document_selectors = 0
+        if self.OPTIMIZE:
+            self._optimize(self.parselet_tree)
+        if self.interner is not None:
+            self._intern_keys(self.parselet_tree)
+        if self.RECORDS:
+            self._make_record_classes(self.parselet_tree)
+        self.pruning = None
+        if self.PRUNE:
+            from parslepy.pruning import PruningProfile
+            self.pruning = PruningProfile.from_selectors(
+                self._selectors(self.parselet_tree)) or None
+
+    def _intern_keys(self, parselet_node):
+        for ctx, v in parselet_node.items():
+            ctx.key = self.interner.intern(ctx.key)
+            if isinstance(v, ParsleyNode):
+                self._intern_keys(v)
+
+    def _make_record_classes(self, parselet_node, path=None):
+        """
+        Attach a record class to each object level of the Parsley tree
+        (except special "--" levels, merged with their parent level)
+        """
+
+        from parslepy.records import record_class, class_name
+
+        parselet_node.record_class = record_class(class_name(path),
+            self._keys(parselet_node))
+        for ctx, v in parselet_node.items():
+            if isinstance(v, ParsleyNode):
+                self._make_record_classes(v, ctx.path)
+                if ctx.key == self.SPECIAL_LEVEL_KEY:
+                    v.record_class = None
+
+    def _selectors(self, parselet_node):
+        """
+        Generate all selectors of a compiled Parsley tree (scopes included)
+        """
+
+        for ctx, v in parselet_node.items():
+            if ctx.scope is not None:
+                yield ctx.scope
+            if isinstance(v, ParsleyNode):
+                for selector in self._selectors(v):
+                    yield selector
+            else:
+                yield v
+
+    def _optimize(self, parselet_node, iterated=False, depth=0):
+        """
+        Wrap selectors that only depend on the document,
+        and that are inside iterated scopes, with
+        :class:`parslepy.selectors.DocumentSelector`, so that
+        they are evaluated once per document instead of once per element.
+
+        Warn about selectors that look document-rooted but that cannot
+        be handled this way; `depth` is the recursion depth,
+        so that warnings point at the code creating the Parselet.
+        """
+
+        for ctx, v in list(parselet_node.items()):
+            if ctx.scope is not None:
+                ctx.scope = self._optimize_selector(ctx, ctx.scope, iterated, depth)
+            iterated_below = iterated or (ctx.scope is not None and ctx.iterate)
+            if isinstance(v, ParsleyNode):
+                self._optimize(v, iterated_below, depth + 1)
+            elif isinstance(v, Selector):
+                parselet_node[ctx] = self._optimize_selector(ctx, v, iterated_below,
+                    depth)
+
+    def _optimize_selector(self, ctx, selector, iterated, depth=0):
+        xpath = getattr(selector, 'xpath', None)
+        if (not iterated
+            or not xpath
+            or isinstance(selector, DocumentSelector)
+            or xpath_scan(xpath) not in (SCAN_DOCUMENT_DESCENDANTS, SCAN_DOCUMENT)):
+            return selector
+
+        if xpath_is_document_rooted(xpath):
+            self._document_selectors += 1
+            return DocumentSelector(selector)
+
+        warnings.warn("%s: selector %s inside an iterated scope is evaluated "
+                      "against the whole document for each element" % (
+                          ctx.path, selector.source),
+                      SlowSelectorWarning,
+                      # this method, _optimize (depth + 1 frames), compile, __init__
+                      stacklevel=depth + 5)
+        return selector
 
     VALID_KEY_CHARS = "\w-"
     SUPPORTED_OPERATORS = "?"   # "!" not supported for now
@@ -335,22 +642,22 @@ class Parselet(object):
             'validkeychars': VALID_KEY_CHARS,
             'suppop': SUPPORTED_OPERATORS}
         )
-    def _compile(self, parselet_node, level=0):
+    def _compile(self, parselet_node, level=0, path=None):
         """
         Build part of the abstract Parsley extraction tree
 
         Arguments:
         parselet_node (dict) -- part of the Parsley tree to compile
                                 (can be the root dict/node)
-        level (int)          -- current recursion depth (used for debug)
+        level (int)          -- current recursion depth (used for tracing)
+        path (str)           -- key path of the parent node
         """
 
-        if self.DEBUG:
-            debug_offset = "".join(["    " for x in range(level)])
-
-        if self.DEBUG:
-            print(debug_offset, "%s::compile(%s)" % (
-                self.__class__.__name__, parselet_node))
+        tracer = self.tracer
+        if tracer is not None:
+            debug_offset = "    " * level
+            tracer.message("%s%s::compile(%s)" % (
+                debug_offset, self.__class__.__name__, parselet_node))
 
         if isinstance(parselet_node, dict):
             parselet_tree = ParsleyNode()
@@ -361,8 +668,9 @@ class Parselet(object):
                 try:
                     m = self.REGEX_PARSELET_KEY.match(k)
                     if not m:
-                        if self.DEBUG:
-                            print(debug_offset, "could not parse key", k)
+                        if tracer is not None:
+                            tracer.message("%scould not parse key %s" % (
+                                debug_offset, k))
                         raise InvalidKeySyntax(k)
                 except:
                     raise InvalidKeySyntax("Key %s is not valid" % k)
@@ -392,28 +700,29 @@ class Parselet(object):
                         key,
                         operator=operator,
                         required=key_required,
-                        scope=self.selector_handler.make(scope) if scope else None,
-                        iterate=iterate)
+                        scope=self._make_selector(scope) if scope else None,
+                        iterate=iterate,
+                        path="%s/%s" % (path, key) if path else key)
                 except SyntaxError:
-                    if self.DEBUG:
-                        print("Invalid scope:", k, scope)
+                    if tracer is not None:
+                        tracer.message("Invalid scope: %s %s" % (k, scope))
                     raise
 
-                if self.DEBUG:
-                    print(debug_offset, "current context:", parsley_context)
+                if tracer is not None:
+                    tracer.message("%scurrent context: %r" % (
+                        debug_offset, parsley_context))
 
                 # go deeper in the Parsley tree...
                 try:
-                    child_tree = self._compile(v, level=level+1)
+                    child_tree = self._compile(v, level=level+1,
+                        path=parsley_context.path)
                 except SyntaxError:
-                    if self.DEBUG:
-                        print("Invalid value: ", v)
-                    raise
-                except:
+                    if tracer is not None:
+                        tracer.message("Invalid value: %s" % (v,))
                     raise
 
-                if self.DEBUG:
-                    print(debug_offset, "child tree:", child_tree)
+                if tracer is not None:
+                    tracer.message("%schild tree: %r" % (debug_offset, child_tree))
 
                 parselet_tree[parsley_context] = child_tree
 
@@ -422,19 +731,35 @@ class Parselet(object):
         # a string leaf should match some kind of selector,
         # let the selector handler deal with it
         elif isstr(parselet_node):
-            return self.selector_handler.make(parselet_node)
+            return self._make_selector(parselet_node)
         else:
             raise ValueError(
                     "Unsupported type(%s) for Parselet node <%s>" % (
                         type(parselet_node), parselet_node))
 
-    def extract(self, document, context=None):
+    def _make_selector(self, selection):
+        """
+        Compile a selector with the selector handler; errors are also
+        reported to this Parselet's tracer if the handler has another one
+        (e.g. a handler shared by several Parselets)
+        """
+
+        try:
+            return self.selector_handler.make(selection)
+        except Exception as e:
+            tracer = self.tracer
+            if tracer is not None and tracer is not self.selector_handler.tracer:
+                tracer.message("%r %s" % (e, selection))
+            raise
+
+    def extract(self, document, context=None, source=None):
         """
         Extract values as a dict object following the structure
         of the Parsley script (recursive)
 
         :param document: lxml-parsed document
         :param context: user-supplied context that will be passed to custom XPath extensions (as first argument)
+        :param source: optional document identifier (e.g. URL) reported to tracers
         :rtype: Python *dict* object with mapped extracted content
         :raises: :class:`.NonMatchingNonOptionalKey`
 
@@ -470,41 +795,131 @@ class Parselet(object):
         {'headingcss': u'What\u2019s new', 'headingxpath': u'What\u2019s new'}
 
         """
+        return self._extract_document(document, context=context, source=source)
+
+    def _extract_document(self, document, context=None, source=None, size=None):
+        """
+        Run the compiled Parsley tree on a parsed document,
+        notifying the tracer and updating metrics if any
+
+        Arguments:
+        source -- document identifier (file name, URL...), if known
+        size   -- size of the input document in bytes, if known
+        """
+
         if context:
             self.selector_handler.context = context
-        return self._extract(self.parselet_tree, document)
 
-    def _extract(self, parselet_node, document, level=0):
+        # results of document-rooted selectors, for this document only
+        memo = {} if self._document_selectors else None
+        if self.interner is not None:
+            self.interner.start_document()
+
+        tracer = self.tracer
+        if tracer is None and self.metrics is None and self.budget is None:
+            return self._extract(self.parselet_tree, document, memo=memo)
+
+        start = default_timer()
+        if tracer is not None:
+            tracer.start_document(document, source=source, size=size)
+            try:
+                output = self._extract_root(document, memo)
+            except Exception:
+                tracer.end_document(document, None)
+                raise
+            tracer.end_document(document, output)
+        else:
+            output = self._extract_root(document, memo)
+        if self.metrics is not None:
+            self.metrics.document_extracted(default_timer() - start)
+        return output
+
+    def _check_budget(self, check, *args):
+        from parslepy.budgets import BudgetExceeded
+        try:
+            check(*args)
+        except BudgetExceeded as e:
+            if self.metrics is not None:
+                self.metrics.budgets_exceeded.inc(1, e.limit)
+            raise
+
+    def _extract_root(self, document, memo):
+        """
+        Run the compiled Parsley tree on a document
+        within the budget, if any
+        """
+
+        if self.budget is None:
+            return self._extract(self.parselet_tree, document, memo=memo)
+
+        self._check_budget(self.budget.check_document, document)
+        from parslepy.budgets import BudgetExceeded
+        try:
+            return self._extract(self.parselet_tree, document, memo=memo,
+                usage=self.budget.start())
+        except BudgetExceeded as e:
+            if self.metrics is not None:
+                self.metrics.budgets_exceeded.inc(1, e.limit)
+            if self.budget.partial:
+                return e.partial
+            raise
+
+    def _extract(self, parselet_node, document, level=0, memo=None, usage=None):
         """
         Extract values at this document node level
         using the parselet_node instructions:
         - go deeper in tree
         - or call selector handler in case of a terminal selector leaf
+
+        `memo` stores the results of :class:`parslepy.selectors.DocumentSelector`
+        instances for the current document, `usage` the resources used
+        (:class:`parslepy.budgets.BudgetUsage`) if extraction has a budget
         """
 
-        if self.DEBUG:
-            debug_offset = "".join(["    " for x in range(level)])
+        # tracer and metrics hooks are only called when set,
+        # keep them in local variables for the loop below
+        tracer = self.tracer
 
         # we must go deeper in the Parsley tree
         if isinstance(parselet_node, ParsleyNode):
 
             # default output
             output = {}
+            metrics = self.metrics
+            # nothing to catch (and parslepy.budgets not needed) without a budget
+            budget_exceeded = usage.exceeded if usage is not None else ()
 
             # process all children
             for ctx, v in list(parselet_node.items()):
-                if self.DEBUG:
-                    print(debug_offset, "context:", ctx, v)
+                if tracer is not None:
+                    tracer.start_key(ctx)
                 extracted=None
                 try:
                     # scoped-extraction:
                     # extraction should be done deeper in the document tree
                     if ctx.scope:
                         extracted = []
-                        selected = self.selector_handler.select(document, ctx.scope)
+                        if usage is not None:
+                            usage.check_time()
+                        if memo is not None and ctx.scope in memo:
+                            selected = memo[ctx.scope]
+                        else:
+                            if tracer is not None:
+                                tracer.start_selector(ctx.scope, document)
+                            selected = self.selector_handler.select(document, ctx.scope)
+                            if tracer is not None:
+                                tracer.end_selector(ctx.scope, selected)
+                            if memo is not None and isinstance(ctx.scope, DocumentSelector):
+                                memo[ctx.scope] = selected
+                        if usage is not None and selected and ctx.iterate:
+                            usage.check_items(len(selected))
                         if selected:
-                            for i, elem in enumerate(selected, start=1):
-                                parse_result = self._extract(v, elem, level=level+1)
+                            if tracer is not None:
+                                count = len(selected) if ctx.iterate else 1
+                                tracer.start_scope(ctx, count)
+                            for elem in selected:
+                                parse_result = self._extract(v, elem,
+                                    level=level+1, memo=memo, usage=usage)
 
                                 if isinstance(parse_result, (list, tuple)):
                                     extracted.extend(parse_result)
@@ -516,24 +931,49 @@ class Parselet(object):
                                 if not ctx.iterate:
                                     break
 
-                            if self.DEBUG:
-                                print(debug_offset,
-                                    "parsed %d elements in scope (%s)" % (i, ctx.scope))
+                            if tracer is not None:
+                                tracer.end_scope(ctx, count)
 
                     # local extraction
                     else:
-                        extracted = self._extract(v, document, level=level+1)
+                        result = self._extract(v, document,
+                            level=level+1, memo=memo, usage=usage)
+                        # items of iterated keys without a scope
+                        # (e.g. "links": ["a @href"])
+                        if (    usage is not None
+                            and ctx.iterate
+                            and isinstance(result, list)):
+                            usage.check_items(len(result))
+                        extracted = result
 
                 except NonMatchingNonOptionalKey as e:
-                    if self.DEBUG:
-                        print(debug_offset, str(e))
+                    if tracer is not None:
+                        tracer.message(str(e))
                     if not ctx.required or not self.STRICT_MODE:
                         output[ctx.key] = {}
                     else:
                         raise
-                except Exception as e:
-                    if self.DEBUG:
-                        print(str(e))
+
+                except budget_exceeded as e:
+                    # add what was extracted for this key to the partial
+                    # output of the inner level (if any), and pass it up
+                    if e.partial:
+                        if ctx.scope:
+                            extracted.append(e.partial)
+                        else:
+                            extracted = e.partial
+                    if isinstance(extracted, list) and not ctx.iterate:
+                        extracted = extracted[0] if extracted else None
+                    if extracted:
+                        if ctx.key != self.SPECIAL_LEVEL_KEY:
+                            output[ctx.key] = extracted
+                        elif isinstance(extracted, dict):
+                            output.update(extracted)
+                    # partial objects are records too, in records mode
+                    record_class = getattr(parselet_node, 'record_class', None)
+                    if record_class is not None:
+                        output = record_class.from_dict(output)
+                    e.partial = output
                     raise
 
                 # replace empty-list result when not looping by empty dict
@@ -543,25 +983,24 @@ class Parselet(object):
                         extracted = {}
 
                 # keep only the first element if we're not in an array
-                if self.KEEP_ONLY_FIRST_ELEMENT_IF_LIST:
-                    try:
-                        if (    isinstance(extracted, list)
-                            and extracted
-                            and not ctx.iterate):
-
-                            if self.DEBUG:
-                                print(debug_offset, "keep only 1st element")
-                            extracted =  extracted[0]
+                if (    self.KEEP_ONLY_FIRST_ELEMENT_IF_LIST
+                    and isinstance(extracted, list)
+                    and extracted
+                    and not ctx.iterate):
+                        extracted =  extracted[0]
 
-                    except Exception as e:
-                        if self.DEBUG:
-                            print(str(e))
-                            print(debug_offset, "error getting first element")
+                if tracer is not None:
+                    tracer.end_key(ctx, extracted)
+                if metrics is not None:
+                    metrics.key_extracted(ctx.path,
+                        extracted is None or extracted == {} or extracted == [])
 
                 # extraction for a required key gave nothing
                 if (    self.STRICT_MODE
                     and ctx.required
                     and extracted is None):
+                    if metrics is not None:
+                        metrics.nonmatching_keys.inc(1, ctx.path)
                     raise NonMatchingNonOptionalKey(
                         'key "%s" is required but yield nothing\nCurrent path: %s/(%s)\n' % (
                             ctx.key,
@@ -601,11 +1040,41 @@ class Parselet(object):
                         # do not add this optional key/value pair in the output
                         pass
 
+            record_class = getattr(parselet_node, 'record_class', None)
+            if record_class is not None:
+                return record_class.from_dict(output)
             return output
 
         # a leaf/Selector node
         elif isinstance(parselet_node, Selector):
-            return self.selector_handler.extract(document, parselet_node)
+            if memo is not None and isinstance(parselet_node, DocumentSelector):
+                if parselet_node not in memo:
+                    memo[parselet_node] = self._extract(parselet_node.wrapped,
+                        document, level=level, usage=usage)
+                    extracted = memo[parselet_node]
+                else:
+                    extracted = memo[parselet_node]
+                    # each copy counts in the output size
+                    if usage is not None:
+                        usage.add_output(extracted)
+                # do not share lists between output objects
+                if isinstance(extracted, list):
+                    return list(extracted)
+                return extracted
+
+            if usage is not None:
+                usage.check_time()
+            if tracer is None:
+                extracted = self.selector_handler.extract(document, parselet_node)
+            else:
+                tracer.start_selector(parselet_node, document)
+                extracted = self.selector_handler.extract(document, parselet_node)
+                tracer.end_selector(parselet_node, extracted)
+            if usage is not None:
+                usage.add_output(extracted)
+            if self.interner is not None:
+                return self.interner.intern(extracted)
+            return extracted
 
         else:
             # FIXME: can this happen?
@@ -613,6 +1082,154 @@ class Parselet(object):
             #        probably yes
             pass
 
+    # relative cost of evaluating a selector, by type of node scan,
+    # multiplied by ITERATION_COST_FACTOR for each enclosing iterated scope
+    SCAN_COSTS = {
+        SCAN_DOCUMENT_DESCENDANTS: 100,
+        SCAN_DOCUMENT: 2,
+        SCAN_DESCENDANTS: 10,
+        SCAN_CHILDREN: 1,
+        None: 1,
+    }
+    ITERATION_COST_FACTOR = 10
+    # scopes nested deeper than this are reported by explain()
+    MAX_SCOPE_DEPTH = 3
+
+    def explain(self):
+        """
+        Describe the compiled Parsley tree, to inspect what selectors
+        are evaluated and find potentially slow rules before deploying them.
+
+        Return a list with a dict per key, with these entries:
+
+        * "key", "path", "required", "iterate": the key's parameters
+        * "scope": description of the scope selector, or ``None``
+        * "selector": description of the leaf selector, or ``None``
+          for nested objects
+        * "children": list of descriptions for nested objects
+        * "cost": relative cost estimate for the key (including children)
+        * "warnings": list of messages for this key's selectors
+          that are likely to be slow
+
+        Selector descriptions are dicts with the original "selector" string,
+        the final "xpath" expression, its "kind" ("css" or "xpath"),
+        "smart_strings", whether it was "cached" (shared with other rules
+        through the selector handler's cache), the type of node "scan"
+        it does (see :func:`parslepy.selectors.xpath_scan`) and whether
+        it is evaluated only once "per_document" (see `optimize` argument
+        of :class:`.Parselet`).
+
+        Costs are computed from the type of node scan each selector does,
+        multiplied for each enclosing iterated scope;
+        they are only meant to compare rules with each other.
+
+        >>> import parslepy
+        >>> rules = {
+        ...     "news(li.newsitem)": [{
+        ...         "title": "//h1",
+        ...         "url": "a @href"
+        ...     }]
+        ... }
+        >>> p = parslepy.Parselet(rules, optimize=False)
+        >>> for child in p.explain()[0]["children"]:
+        ...     print(child["warnings"][0])
+        news/title: document-rooted selector //h1 is evaluated against the whole document for each element of an iterated scope
+        news/url: selector a @href scans all descendants of each element of an iterated scope
+        """
+
+        return self._explain(self.parselet_tree)
+
+    def _explain_selector(self, selector):
+        if selector is None:
+            return None
+
+        xpath = getattr(selector, 'xpath', None)
+        return {
+            "selector": getattr(selector, 'source', None),
+            "xpath": xpath,
+            "kind": getattr(selector, 'kind', None),
+            "smart_strings": getattr(selector, 'smart_strings', None),
+            "cached": getattr(selector, 'cache_hits', 0) > 0,
+            "scan": xpath_scan(xpath) if xpath else None,
+            "per_document": isinstance(selector, DocumentSelector),
+        }
+
+    def _explain_warnings(self, ctx, description, iterated):
+        if not iterated or description is None or description["per_document"]:
+            return []
+        if description["scan"] in (SCAN_DOCUMENT_DESCENDANTS, SCAN_DOCUMENT):
+            return ["%s: document-rooted selector %s is evaluated against "
+                    "the whole document for each element of an iterated scope" % (
+                        ctx.path, description["selector"])]
+        if description["scan"] == SCAN_DESCENDANTS:
+            return ["%s: selector %s scans all descendants of each element "
+                    "of an iterated scope" % (ctx.path, description["selector"])]
+        return []
+
+    def _explain(self, parselet_node, iterated=0, depth=0):
+        """
+        Arguments:
+        iterated (int) -- number of enclosing iterated scopes
+        depth (int)    -- number of enclosing scopes
+        """
+
+        entries = []
+        seen = {}
+        for ctx, v in list(parselet_node.items()):
+            multiplier = self.ITERATION_COST_FACTOR ** iterated
+            entry = {
+                "key": ctx.key,
+                "path": ctx.path,
+                "required": ctx.required,
+                "iterate": ctx.iterate,
+                "scope": self._explain_selector(ctx.scope),
+                "selector": None,
+                "children": [],
+                "cost": 0,
+                "warnings": [],
+            }
+
+            if ctx.scope is not None:
+                entry["cost"] += self.SCAN_COSTS[entry["scope"]["scan"]] * multiplier
+                entry["warnings"].extend(
+                    self._explain_warnings(ctx, entry["scope"], iterated))
+                depth_below = depth + 1
+                if ctx.iterate:
+                    iterated_below = iterated + 1
+                    multiplier *= self.ITERATION_COST_FACTOR
+                else:
+                    iterated_below = iterated
+                if depth_below > self.MAX_SCOPE_DEPTH:
+                    entry["warnings"].append(
+                        "%s: scope nested %d levels deep" % (ctx.path, depth_below))
+            else:
+                depth_below, iterated_below = depth, iterated
+
+            if isinstance(v, ParsleyNode):
+                entry["children"] = self._explain(v,
+                    iterated=iterated_below, depth=depth_below)
+                entry["cost"] += sum(c["cost"] for c in entry["children"])
+            elif v is not None:
+                entry["selector"] = self._explain_selector(v)
+                entry["cost"] += self.SCAN_COSTS[entry["selector"]["scan"]] * multiplier
+                entry["warnings"].extend(
+                    self._explain_warnings(ctx, entry["selector"], iterated_below))
+
+            # same selector evaluated several times in the same context
+            for description in (entry["scope"], entry["selector"]):
+                if description is None or description["xpath"] is None:
+                    continue
+                if description["xpath"] in seen:
+                    entry["warnings"].append(
+                        "%s: duplicate selector %s (also used for %s)" % (
+                            ctx.path, description["selector"],
+                            seen[description["xpath"]]))
+                else:
+                    seen[description["xpath"]] = ctx.path
+
+            entries.append(entry)
+        return entries
+
     def keys(self):
         """
         Return a list of 1st level keys of the output data model
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+Batch extraction: apply a Parsley script to many documents,
+optionally with several worker processes, and write one JSON object
+per document.
+
+>>> from parslepy.batch import BatchExtractor, iter_paths
+>>> extractor = BatchExtractor(rules, workers=4)
+>>> with open("results.jsonl", "w") as out:
+...     extractor.run(iter_paths(["pages/", "more/*.html"]), out)
+>>> print(extractor.stats.summary())
+
+The Parsley script is compiled once per worker process,
+not once per document.
+"""
+
+from __future__ import unicode_literals
+import glob
+import multiprocessing
+import os
+import sys
+from timeit import default_timer
+
+
+from parslepy.base import Parselet
+from parslepy.budgets import BudgetExceeded
+from parslepy.serializers import FORMATS, CsvSerializer
+from parslepy.utils.parsers import make_parser
+
+
+def iter_paths(inputs, stdin=None):
+    """
+    Expand a list of inputs to document paths:
+
+    * directories give all the files they contain (recursively, sorted)
+    * patterns with wildcards are expanded with :func:`glob.glob`
+    * ``"-"`` reads paths from `stdin` (defaults to ``sys.stdin``), one per line
+    * other inputs are used as-is
+    """
+
+    for item in inputs:
+        if item == "-":
+            for line in (stdin or sys.stdin):
+                line = line.strip()
+                if line:
+                    yield line
+        elif os.path.isdir(item):
+            for dirpath, dirnames, filenames in os.walk(item):
+                dirnames.sort()
+                for filename in sorted(filenames):
+                    yield os.path.join(dirpath, filename)
+        elif glob.has_magic(item):
+            for path in sorted(glob.glob(item)):
+                if os.path.isfile(path):
+                    yield path
+        else:
+            yield item
+
+
+class BatchStats(object):
+    """
+    Throughput and error counts for a batch run
+    """
+
+    def __init__(self):
+        self.documents = 0
+        self.errors = 0
+        self.error_types = {}
+        self.start = default_timer()
+        self.end = None
+
+    def add(self, record):
+        self.documents += 1
+        if "error" in record:
+            self.errors += 1
+            error_type = record["error"].split(":", 1)[0]
+            self.error_types[error_type] = self.error_types.get(error_type, 0) + 1
+
+    def finish(self):
+        self.end = default_timer()
+
+    @property
+    def elapsed(self):
+        return (self.end or default_timer()) - self.start
+
+    def summary(self):
+        elapsed = self.elapsed
+        lines = ["%d documents in %.2fs (%.1f documents/s), %d errors" % (
+            self.documents, elapsed,
+            self.documents / elapsed if elapsed else 0.0,
+            self.errors)]
+        for error_type, count in sorted(self.error_types.items(),
+                                        key=lambda e: -e[1]):
+            lines.append("    %s: %d" % (error_type, count))
+        return "\n".join(lines)
+
+
+# compiled Parselet of the current worker process
+_worker_parselet = None
+_worker_xml = False
+
+def _init_worker(rules, strict, xml, prune=False, budget=None, parselet=None):
+    global _worker_parselet, _worker_xml
+    _worker_parselet = parselet or Parselet(rules, strict=strict, prune=prune,
+        budget=budget)
+    _worker_xml = xml
+
+def _extract_item(item):
+    """
+    Extract content from one document; `item` is either a path,
+    or a (source, content bytes, encoding) tuple
+    """
+
+    if isinstance(item, tuple):
+        source, content, encoding = item
+    else:
+        source, content, encoding = item, None, None
+
+    try:
+        parser = make_parser(_worker_xml, encoding)
+        if content is None:
+            result = _worker_parselet.parse(source, parser=parser)
+        else:
+            result = _worker_parselet.parse_fromstring(content,
+                parser=parser, source=source)
+        return {"source": source, "result": result}
+    except BudgetExceeded as e:
+        record = {"source": source, "error": "%s: %s" % (e.__class__.__name__, e)}
+        if e.partial is not None:
+            record["result"] = e.partial
+        return record
+    except Exception as e:
+        return {"source": source, "error": "%s: %s" % (e.__class__.__name__, e)}
+
+
+class BatchExtractor(object):
+    """
+    Apply a Parsley script to many documents.
+
+    Documents are given as paths (or URLs), or as
+    ``(source, content, encoding)`` tuples where `content` is the document
+    as bytes, `source` an identifier and `encoding` the declared charset
+    (or ``None``).
+
+    Each document gives a record dict with the "source" identifier
+    and either the extracted "result" or an "error" message
+    (or both, for documents that exceeded a budget during extraction).
+    With several workers, records come in completion order.
+    """
+
+    def __init__(self, rules, strict=False, xml=False, workers=1, chunksize=1,
+                 prune=False, budget=None):
+        """
+        :param dict rules: Parsley script as a Python dict
+        :param boolean strict: see :class:`parslepy.base.Parselet`
+        :param boolean xml: parse documents as XML instead of HTML
+        :param int workers: number of worker processes;
+            with 1, documents are processed in the current process
+        :param int chunksize: number of documents sent to a worker at a time
+        :param boolean prune: see :class:`parslepy.base.Parselet`
+        :param budget: :class:`parslepy.budgets.Budget` for each document
+        """
+
+        self.rules = rules
+        self.strict = strict
+        self.xml = xml
+        self.workers = workers
+        self.chunksize = chunksize
+        self.prune = prune
+        self.budget = budget
+        self.stats = BatchStats()
+
+        # fail early on invalid scripts,
+        # and reuse this instance when running in this process
+        self.parselet = Parselet(rules, strict=strict, prune=prune,
+            budget=budget)
+
+    def iter_results(self, items):
+        """
+        Generate a record dict per document
+        """
+
+        self.stats = BatchStats()
+        initargs = (self.rules, self.strict, self.xml, self.prune, self.budget)
+        if self.workers <= 1:
+            _init_worker(*initargs, parselet=self.parselet)
+            records = (_extract_item(item) for item in items)
+            pool = None
+        else:
+            pool = multiprocessing.Pool(self.workers,
+                initializer=_init_worker, initargs=initargs)
+            records = pool.imap_unordered(_extract_item, items,
+                chunksize=self.chunksize)
+        try:
+            for record in records:
+                self.stats.add(record)
+                yield record
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+            self.stats.finish()
+
+    def serializer(self, out, format="jsonlines"):
+        """
+        Return a :mod:`parslepy.serializers` instance writing records
+        to `out` in the given format ("jsonlines", "msgpack" or "csv";
+        CSV columns are "source", "error", and the script's key paths
+        under "result/")
+        """
+
+        if format == "csv":
+            return CsvSerializer.for_parselet(out, self.parselet,
+                prefix="result", extra_columns=("source", "error"))
+        try:
+            serializer_class = FORMATS[format]
+        except KeyError:
+            raise ValueError("unknown output format %r" % format)
+        return serializer_class(out)
+
+    def run(self, items, out, format="jsonlines"):
+        """
+        Write a record per document to the `out` file object,
+        by default as a JSON object per line;
+        return the run's :class:`BatchStats`
+        """
+
+        serializer = self.serializer(out, format)
+        for record in self.iter_results(items):
+            serializer.write(record)
+        serializer.close()
+        return self.stats
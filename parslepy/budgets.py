@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+Resource budgets for extraction, so that one huge or pathological
+document (millions of nodes, a selector matching everything)
+cannot stall a worker.
+
+>>> import parslepy
+>>> from parslepy.budgets import Budget, BudgetExceeded
+>>> budget = Budget(max_input_bytes=10 * 2**20, max_nodes=500000,
+...     max_items=10000, max_output_size=2**20, timeout=2.0)
+>>> p = parslepy.Parselet(rules, budget=budget)
+>>> try:
+...     p.parse(fp)
+... except BudgetExceeded as e:
+...     print(e.limit, e.partial)
+timeout {'title': 'What's new', 'news': [...]}
+
+Limits are checked before parsing (input size), before extracting
+(number of nodes) and during extraction, between selector evaluations
+(items per iterated key, total output size, elapsed time).
+"""
+
+from __future__ import unicode_literals
+import itertools
+from timeit import default_timer
+
+try:
+    string_types = (basestring,)
+except NameError:
+    string_types = (str,)
+
+
+class BudgetExceeded(RuntimeError):
+    """
+    Raised by a :class:`parslepy.base.Parselet` when a document
+    exceeds one of the limits of its :class:`Budget`.
+
+    `limit` is the name of the limit ("max_input_bytes", "max_nodes",
+    "max_items", "max_output_size" or "timeout"), `value` the value
+    that exceeded it, and `partial` the content extracted
+    before extraction was aborted (None if it had not started),
+    made of records with ``Parselet(..., records=True)``,
+    without the objects that were still empty.
+    """
+
+    def __init__(self, limit, value, maximum, partial=None):
+        super(BudgetExceeded, self).__init__(
+            "%s budget exceeded: %s > %s" % (limit, value, maximum))
+        self.limit = limit
+        self.value = value
+        self.maximum = maximum
+        self.partial = partial
+
+
+class Budget(object):
+    """
+    Per-document limits; None means unlimited.
+    """
+
+    def __init__(self, max_input_bytes=None, max_nodes=None, max_items=None,
+                 max_output_size=None, timeout=None, partial=False):
+        """
+        :param int max_input_bytes: largest document to parse, in bytes
+            (or characters for strings); checked when the size is known
+            before parsing: strings, files, and file objects with a file
+            descriptor (compressed inputs are checked on their compressed size)
+        :param int max_nodes: largest document tree to extract from,
+            counting elements, comments and processing instructions
+        :param int max_items: most elements selected by an iterated scope
+            (``"key(selector)": [...]``), or values extracted
+            for an iterated key (``"key": ["selector"]``)
+        :param int max_output_size: most characters of extracted
+            strings in the output (values copied in several places
+            of the output, e.g. ``//h1`` in each iterated item, count
+            each time)
+        :param float timeout: extraction time limit in seconds
+        :param boolean partial: return the content extracted so far
+            when a limit is exceeded during extraction,
+            instead of raising :class:`BudgetExceeded`
+        """
+
+        self.max_input_bytes = max_input_bytes
+        self.max_nodes = max_nodes
+        self.max_items = max_items
+        self.max_output_size = max_output_size
+        self.timeout = timeout
+        self.partial = partial
+
+    def __repr__(self):
+        return "<Budget: %s>" % "; ".join("%s=%s" % (name, getattr(self, name))
+            for name in ("max_input_bytes", "max_nodes", "max_items",
+                         "max_output_size", "timeout")
+            if getattr(self, name) is not None)
+
+    def check_input(self, size):
+        """
+        Check the size of a document before parsing it
+        """
+
+        if (    size is not None
+            and self.max_input_bytes is not None
+            and size > self.max_input_bytes):
+            raise BudgetExceeded("max_input_bytes", size, self.max_input_bytes)
+
+    def check_document(self, document):
+        """
+        Check the number of nodes of a parsed document
+        """
+
+        if self.max_nodes is None:
+            return
+        root = document.getroottree().getroot()
+        # stop counting as soon as the limit is exceeded
+        nodes = sum(1 for _ in itertools.islice(root.iter(), self.max_nodes + 1))
+        if nodes > self.max_nodes:
+            raise BudgetExceeded("max_nodes", "%d+" % self.max_nodes, self.max_nodes)
+
+    def start(self):
+        """
+        Return a :class:`BudgetUsage` for the extraction of a document
+        """
+
+        return BudgetUsage(self)
+
+
+class BudgetUsage(object):
+    """
+    Resources used by the extraction of one document
+    """
+
+    # raised by the checks below; callers can catch it
+    # without importing this module
+    exceeded = BudgetExceeded
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.output_size = 0
+        self.started = default_timer()
+        self.deadline = None
+        if budget.timeout is not None:
+            self.deadline = self.started + budget.timeout
+
+    def check_time(self):
+        if self.deadline is None:
+            return
+        now = default_timer()
+        if now > self.deadline:
+            raise BudgetExceeded("timeout", "%.3fs" % (now - self.started),
+                self.budget.timeout)
+
+    def check_items(self, count):
+        maximum = self.budget.max_items
+        if maximum is not None and count > maximum:
+            raise BudgetExceeded("max_items", count, maximum)
+
+    def add_output(self, value):
+        maximum = self.budget.max_output_size
+        if maximum is None:
+            return
+        if isinstance(value, string_types):
+            self.output_size += len(value)
+        elif isinstance(value, list):
+            self.output_size += sum(len(v) for v in value
+                                    if isinstance(v, string_types))
+        if self.output_size > maximum:
+            raise BudgetExceeded("max_output_size", self.output_size, maximum)
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""
+Columnar output for iterated keys: instead of a list of dicts per document,
+append the values of each item straight to per-key columns,
+across many documents.
+
+>>> import parslepy
+>>> from parslepy.columnar import ColumnarCollector
+>>> parselet = parslepy.Parselet({
+...     "products(div.product)": [{
+...         "name": "h2",
+...         "price": "span.price",
+...     }]
+... })
+>>> collector = ColumnarCollector(parselet, "products", numeric=["price"])
+>>> for filename in filenames:
+...     collector.parse(filename)
+>>> collector.columns["name"][:3]
+['Pen', 'Pencil', 'Eraser']
+>>> table = collector.to_arrow()
+
+Columns are lists, or :class:`array.array` of doubles for `numeric` columns;
+:meth:`ColumnarCollector.to_numpy` and :meth:`ColumnarCollector.to_arrow`
+convert them (and require NumPy or pyarrow respectively).
+"""
+
+from __future__ import unicode_literals
+from array import array
+
+import lxml.etree
+
+from parslepy.base import ParsleyNode, isstr
+from parslepy.selectors import Selector, DocumentSelector
+
+
+class ColumnarCollector(object):
+    """
+    Collect the items of an iterated key of a :class:`parslepy.base.Parselet`
+    (a ``"key(scope)": [{...}]`` rule) as columns, one per key path
+    inside the items (nested objects give "/"-separated paths).
+
+    Missing values are stored as None (NaN in numeric columns).
+    Lists extracted inside items (nested iterated keys) are stored as lists.
+    """
+
+    def __init__(self, parselet, path, numeric=(), source_column=None):
+        """
+        :param parselet: compiled :class:`parslepy.base.Parselet`
+        :param string path: key path of the iterated key, e.g. "products"
+            or "page/products"
+        :param numeric: names of columns to store as floats
+        :param string source_column: name of an extra column holding
+            the `source` of the document each row comes from
+        """
+
+        self.parselet = parselet
+        self.path = path
+        self.numeric = frozenset(numeric)
+        self.source_column = source_column
+
+        self.scopes, self.node = self._find_scope(parselet.parselet_tree, path)
+        self.fields = []
+        self._plan(self.node, (), None)
+        self.fields.sort(key=lambda field: field[0])
+        names = [field[0] for field in self.fields]
+        if source_column in names:
+            raise ValueError("column %s already exists" % source_column)
+        for column in self.numeric:
+            if column not in names:
+                raise ValueError("unknown numeric column %s" % column)
+        self.clear()
+
+    def _find_scope(self, parselet_tree, path):
+        """
+        Return the scope selectors leading from the document root
+        to the items, and the Parsley node of each item
+        """
+
+        scopes = []
+        node = parselet_tree
+        keys = path.split("/")
+        for i, key in enumerate(keys):
+            found = [(ctx, v) for ctx, v in node.items() if ctx.key == key]
+            if not found:
+                raise ValueError("no key %s in Parsley script" % path)
+            ctx, node = found[0]
+            last = (i == len(keys) - 1)
+            if last != bool(ctx.iterate) or not isinstance(node, ParsleyNode):
+                raise ValueError("%s is not an iterated key with nested keys "
+                                 "(e.g. \"%s(scope)\": [{...}])" % (path, key))
+            if ctx.scope is None:
+                raise ValueError("%s has no scope selector" % path)
+            scopes.append(ctx.scope)
+        return scopes, node
+
+    def _plan(self, parselet_node, steps, prefix):
+        """
+        Flatten the keys of the item node into a list of
+        (column, scope selectors from the item element, context, child)
+        """
+
+        special_key = self.parselet.SPECIAL_LEVEL_KEY
+        for ctx, child in parselet_node.items():
+            if ctx.key == special_key:
+                column = prefix
+            else:
+                column = "%s/%s" % (prefix, ctx.key) if prefix else ctx.key
+            if isinstance(child, ParsleyNode) and not ctx.iterate:
+                self._plan(child,
+                    steps + (ctx.scope,) if ctx.scope is not None else steps,
+                    column)
+            elif column:
+                self.fields.append((column, steps, ctx, child))
+
+    def columns_names(self):
+        names = [field[0] for field in self.fields]
+        if self.source_column:
+            names.append(self.source_column)
+        return names
+
+    def clear(self):
+        """
+        Empty all columns
+        """
+
+        self.columns = {}
+        for name in self.columns_names():
+            self.columns[name] = array("d") if name in self.numeric else []
+        self.rows = 0
+
+    def __len__(self):
+        return self.rows
+
+    def _select(self, element, scope, memo):
+        if isinstance(scope, DocumentSelector):
+            if scope not in memo:
+                memo[scope] = self.parselet.selector_handler.select(element, scope)
+            return memo[scope]
+        return self.parselet.selector_handler.select(element, scope)
+
+    def _value(self, element, ctx, child, memo):
+        if ctx.scope is not None or not isinstance(child, Selector):
+            # scoped or nested iterated keys: use regular extraction
+            output = self.parselet._extract(ParsleyNode([(ctx, child)]),
+                element, memo=memo)
+            return output.get(ctx.key)
+
+        extracted = self.parselet._extract(child, element, memo=memo)
+        if isinstance(extracted, list) and not ctx.iterate:
+            extracted = extracted[0] if extracted else None
+        return extracted
+
+    def _append(self, name, value):
+        if name in self.numeric:
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                value = float("nan")
+        self.columns[name].append(value)
+
+    def extract(self, document, source=None):
+        """
+        Append the items of an lxml-parsed document to the columns;
+        return the number of items
+        """
+
+        memo = {}
+        elements = [document]
+        for scope in self.scopes[:-1]:
+            elements = [e for element in elements[:1]
+                          for e in self._select(element, scope, memo)]
+        items = []
+        for element in elements[:1]:
+            items = self._select(element, self.scopes[-1], memo)
+
+        columns = self.columns
+        for item in items:
+            # elements selected by nested scopes, for this item only
+            scoped = {(): item}
+            for name, steps, ctx, child in self.fields:
+                element = scoped.get(steps)
+                if element is None and steps not in scoped:
+                    element = item
+                    for scope in steps:
+                        selected = self._select(element, scope, memo)
+                        if not selected:
+                            element = None
+                            break
+                        element = selected[0]
+                    scoped[steps] = element
+                if element is None:
+                    value = None
+                else:
+                    value = self._value(element, ctx, child, memo)
+                if value == {} or value == []:
+                    value = None
+                self._append(name, value)
+            if self.source_column:
+                columns[self.source_column].append(source)
+
+        self.rows += len(items)
+        return len(items)
+
+    def parse(self, fp, parser=None, source=None):
+        """
+        Parse a document (see :meth:`parslepy.base.Parselet.parse`)
+        and append its items to the columns
+        """
+
+        if parser is None:
+            parser = lxml.etree.HTMLParser()
+        document = self.parselet._parse_input(fp, parser)
+        if source is None and isstr(fp):
+            source = fp
+        return self.extract(document, source=source)
+
+    def parse_fromstring(self, s, parser=None, source=None):
+        """
+        Parse a document from a string and append its items to the columns
+        """
+
+        if parser is None:
+            parser = lxml.etree.HTMLParser()
+        return self.extract(lxml.etree.fromstring(s, parser=parser),
+            source=source)
+
+    def to_numpy(self):
+        """
+        Return a dict of NumPy arrays (float64 for numeric columns,
+        object arrays otherwise)
+        """
+
+        import numpy
+        arrays = {}
+        for name, values in self.columns.items():
+            if name in self.numeric:
+                arrays[name] = numpy.frombuffer(values, dtype=numpy.float64).copy()
+            else:
+                arrays[name] = numpy.array(values, dtype=object)
+        return arrays
+
+    def to_arrow(self):
+        """
+        Return a :class:`pyarrow.Table` with a column per key path
+        """
+
+        import pyarrow
+        names = sorted(self.columns)
+        return pyarrow.Table.from_arrays(
+            [pyarrow.array(self.columns[name]) for name in names],
+            names=names)
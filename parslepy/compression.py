@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+Detect compressed documents from their first bytes,
+and feed lxml parsers incrementally from a streaming decompressor.
+
+Supported formats are gzip, bzip2, xz (Python 3)
+and Zstandard (requires the `zstandard` package).
+"""
+
+from __future__ import unicode_literals
+import bz2
+import gzip
+
+try:
+    import lzma
+except ImportError:
+    lzma = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+GZIP = "gzip"
+BZIP2 = "bzip2"
+XZ = "xz"
+ZSTD = "zstd"
+
+MAGIC_BYTES = (
+    (b"\x1f\x8b", GZIP),
+    (b"BZh", BZIP2),
+    (b"\xfd7zXZ\x00", XZ),
+    (b"\x28\xb5\x2f\xfd", ZSTD),
+)
+MAGIC_LENGTH = max(len(magic) for magic, compression in MAGIC_BYTES)
+
+CHUNK_SIZE = 64 * 1024
+
+
+class _PrefixedStream(object):
+    """
+    Read `prefix` bytes, then the rest of `fp`;
+    used for streams that can neither peek nor seek
+    """
+
+    def __init__(self, prefix, fp):
+        self.prefix = prefix
+        self.fp = fp
+
+    def read(self, size=-1):
+        if not self.prefix:
+            return self.fp.read(size)
+        if size is None or size < 0:
+            data, self.prefix = self.prefix + self.fp.read(), self.prefix[:0]
+            return data
+        data, self.prefix = self.prefix[:size], self.prefix[size:]
+        if len(data) < size:
+            data += self.fp.read(size - len(data))
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self.fp, name)
+
+
+def _peek(fp, size):
+    """
+    Return the first `size` bytes of `fp` without consuming them,
+    and a file object to read from instead of `fp`
+    """
+
+    if hasattr(fp, "peek"):
+        return fp.peek(size)[:size], fp
+    try:
+        if fp.seekable():
+            position = fp.tell()
+            head = fp.read(size)
+            fp.seek(position)
+            return head, fp
+    except AttributeError:
+        pass
+    head = fp.read(size)
+    return head, _PrefixedStream(head, fp)
+
+def detect_compression(head):
+    """
+    Return the compression format name for a document
+    starting with `head` bytes, or None
+
+    >>> detect_compression(b'\\x1f\\x8b\\x08\\x00')
+    'gzip'
+    """
+
+    if not isinstance(head, bytes):
+        return None
+    for magic, compression in MAGIC_BYTES:
+        if head.startswith(magic):
+            return compression
+
+def decompressing_reader(fp):
+    """
+    Return ``(stream, compression)``: if `fp` (a file object) holds
+    compressed data, `stream` reads the decompressed document
+    and `compression` is the format name; otherwise `compression`
+    is None and `stream` reads the document as-is.
+
+    :raises: :class:`RuntimeError` if the format's decompressor
+        is not available
+    """
+
+    head, fp = _peek(fp, MAGIC_LENGTH)
+    compression = detect_compression(head)
+    if compression == GZIP:
+        return gzip.GzipFile(fileobj=fp, mode="rb"), compression
+    if compression == BZIP2:
+        return bz2.BZ2File(fp, mode="rb"), compression
+    if compression == XZ:
+        if lzma is None:
+            raise RuntimeError("xz-compressed input requires the lzma module")
+        return lzma.LZMAFile(fp, mode="rb"), compression
+    if compression == ZSTD:
+        if zstandard is None:
+            raise RuntimeError("zstd-compressed input requires the zstandard package")
+        decompressor = zstandard.ZstdDecompressor()
+        try:
+            return decompressor.stream_reader(fp,
+                read_across_frames=True, closefd=False), compression
+        except TypeError:
+            return decompressor.stream_reader(fp), compression
+    return fp, None
+
+def feed_parser(parser, stream, chunk_size=CHUNK_SIZE):
+    """
+    Feed `parser` with chunks read from `stream`;
+    return the document's root element
+    """
+
+    while True:
+        data = stream.read(chunk_size)
+        if not data:
+            break
+        parser.feed(data)
+    return parser.close()
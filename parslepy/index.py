@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+"""
+Per-document indexes answering simple CSS selectors
+(``tag``, ``#id``, ``.class``, ``tag.class``, ``tag#id.class``...,
+optionally followed by `` @attribute``) without evaluating their
+XPath translation, which scans all descendants of the context node.
+
+>>> import parslepy
+>>> from parslepy.index import IndexedSelectorHandler
+>>> parselet = parslepy.Parselet(rules, selector_handler=IndexedSelectorHandler())
+
+The index of a document is built on first use, in one walk of the tree,
+and reused for all selectors evaluated on the same document;
+other selectors are evaluated as XPath, as with
+:class:`parslepy.selectors.DefaultSelectorHandler`.
+"""
+
+from __future__ import unicode_literals
+import bisect
+import re
+import threading
+
+import lxml.etree
+
+from parslepy.selectors import DefaultSelectorHandler, Selector
+
+
+REGEX_SIMPLE_SELECTOR = re.compile(
+    r"^\s*(?P<tag>[a-zA-Z][\w-]*|\*)?(?P<filters>(?:[#.][a-zA-Z_][\w-]*)*)"
+    r"(?:\s+@(?P<attr>[a-zA-Z_][\w-]*))?\s*$")
+REGEX_FILTER = re.compile(r"([#.])([\w-]+)")
+# XPath's normalize-space() only strips these
+REGEX_XML_WHITESPACE = re.compile(r"[ \t\r\n]+")
+
+
+def parse_simple_selector(selection):
+    """
+    Return (tag, id, classes, attribute) for a simple CSS selector,
+    or None; tag, id and attribute may be None
+
+    >>> parse_simple_selector("li.item.new @href")
+    ('li', None, ('item', 'new'), 'href')
+    >>> parse_simple_selector("ul > li") is None
+    True
+    """
+
+    m = REGEX_SIMPLE_SELECTOR.match(selection)
+    if not m or not (m.group("tag") or m.group("filters")):
+        return None
+    tag = m.group("tag")
+    if tag == "*":
+        tag = None
+    elif tag:
+        # like cssselect's HTMLTranslator
+        tag = tag.lower()
+    element_id = None
+    classes = []
+    for kind, name in REGEX_FILTER.findall(m.group("filters")):
+        if kind == "#":
+            if element_id is not None and element_id != name:
+                return None
+            element_id = name
+        else:
+            classes.append(name)
+    return tag, element_id, tuple(classes), m.group("attr")
+
+
+class DocumentIndex(object):
+    """
+    Elements of a document by id, class token and tag name,
+    in document order, with their position in the tree
+    to restrict lookups to the descendants of a context node.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.by_id = {}
+        self.by_class = {}
+        self.by_tag = {}
+        self._ends = {}
+        self._build()
+
+    def _build(self):
+        # elements only, in document order
+        self.elements = elements = list(self.root.iter(lxml.etree.Element))
+        self.positions = dict(zip(elements, range(len(elements))))
+        self.all = (list(range(len(elements))), elements)
+
+        by_id, by_class, by_tag = self.by_id, self.by_class, self.by_tag
+        split = REGEX_XML_WHITESPACE.split
+        for position, element in enumerate(elements):
+            entry = by_tag.get(element.tag)
+            if entry is None:
+                entry = by_tag[element.tag] = ([], [])
+            entry[0].append(position)
+            entry[1].append(element)
+
+            attrib = element.attrib
+            if not attrib:
+                continue
+            element_id = attrib.get("id")
+            if element_id is not None:
+                entry = by_id.setdefault(element_id, ([], []))
+                entry[0].append(position)
+                entry[1].append(element)
+            classes = attrib.get("class")
+            if classes:
+                tokens = split(classes.strip())
+                if len(tokens) > 1:
+                    tokens = set(tokens)
+                for token in tokens:
+                    if token:
+                        entry = by_class.setdefault(token, ([], []))
+                        entry[0].append(position)
+                        entry[1].append(element)
+
+    def __len__(self):
+        return len(self.elements)
+
+    def _end(self, element, start):
+        """
+        Position after the last descendant of `element`:
+        the position of the first element following it
+        that is not a descendant
+        """
+
+        end = self._ends.get(element)
+        if end is None:
+            end = len(self.elements)
+            node = element
+            while node is not None and node is not self.root:
+                following = node.getnext()
+                while following is not None and not isinstance(following.tag, str):
+                    # comments and processing instructions
+                    following = following.getnext()
+                if following is not None:
+                    end = self.positions[following]
+                    break
+                node = node.getparent()
+            self._ends[element] = end
+        return end
+
+    @staticmethod
+    def _class_tokens(element):
+        return REGEX_XML_WHITESPACE.split((element.get("class") or "").strip())
+
+    def query(self, context, tag=None, element_id=None, classes=()):
+        """
+        Return the elements matching all conditions among `context`
+        and its descendants, in document order,
+        or None if `context` is not an element of the indexed document
+        """
+
+        try:
+            start = self.positions[context]
+        except (KeyError, TypeError):
+            return None
+        end = self._end(context, start)
+
+        # start from the shortest candidate list
+        candidates = []
+        if element_id is not None:
+            candidates.append(self.by_id.get(element_id, ([], [])))
+        for name in classes:
+            candidates.append(self.by_class.get(name, ([], [])))
+        if tag is not None:
+            candidates.append(self.by_tag.get(tag, ([], [])))
+        if not candidates:
+            candidates.append(self.all)
+        positions, elements = min(candidates, key=lambda c: len(c[0]))
+
+        low = bisect.bisect_left(positions, start)
+        high = bisect.bisect_left(positions, end, low)
+        selected = elements[low:high]
+        if len(candidates) == 1:
+            return selected
+        return [e for e in selected
+                if (tag is None or e.tag == tag)
+                and (element_id is None or e.get("id") == element_id)
+                and (not classes or set(classes).issubset(self._class_tokens(e)))]
+
+
+class IndexedSelector(Selector):
+    """
+    A :class:`parslepy.selectors.Selector` for a simple CSS selector,
+    answered from a :class:`DocumentIndex`
+    """
+
+    def __init__(self, selector, tag=None, element_id=None, classes=(), attribute=None):
+        super(IndexedSelector, self).__init__(selector.selector,
+            source=selector.source, xpath=selector.xpath, kind=selector.kind,
+            smart_strings=selector.smart_strings)
+        self.wrapped = selector
+        self.tag = tag
+        self.element_id = element_id
+        self.classes = classes
+        self.attribute = attribute
+
+    def __repr__(self):
+        return "<IndexedSelector: inner=%s>" % self.selector
+
+
+class IndexedSelectorHandler(DefaultSelectorHandler):
+    """
+    Same selectors as :class:`parslepy.selectors.DefaultSelectorHandler`,
+    but simple CSS selectors are answered from a :class:`DocumentIndex`
+    of the document, built on first use.
+
+    The index of the last document is kept (per thread) until
+    another document is processed or :meth:`clear` is called;
+    documents must not be modified while they are being extracted from.
+    """
+
+    _indexed_selector_cache = {}
+
+    def __init__(self, *args, **kwargs):
+        super(IndexedSelectorHandler, self).__init__(*args, **kwargs)
+        self._local = threading.local()
+        self.index_builds = 0
+        self.index_queries = 0
+
+    def make(self, selection):
+        cached = self._indexed_selector_cache.get(selection)
+        if cached is not None:
+            cached.cache_hits += 1
+            if self.metrics is not None:
+                self.metrics.selector_cache_hits.inc()
+            return cached
+        selector = super(IndexedSelectorHandler, self).make(selection)
+        simple = parse_simple_selector(selection) if selector.kind == "css" else None
+        if simple is not None:
+            selector = IndexedSelector(selector, *simple)
+            self._indexed_selector_cache[selection] = selector
+        return selector
+
+    def index(self, document):
+        """
+        Return the :class:`DocumentIndex` for the tree of `document`
+        """
+
+        root = document.getroottree().getroot()
+        index = getattr(self._local, "index", None)
+        if index is None or index.root is not root:
+            index = self._local.index = DocumentIndex(root)
+            self.index_builds += 1
+        return index
+
+    def clear(self):
+        """
+        Release the index of the last document
+        """
+
+        self._local.index = None
+
+    def select(self, document, selector):
+        if isinstance(selector, IndexedSelector) and isinstance(document, lxml.etree._Element):
+            selected = self.index(document).query(document,
+                selector.tag, selector.element_id, selector.classes)
+            if selected is not None:
+                self.index_queries += 1
+                if selector.attribute is None:
+                    return selected
+                attribute = selector.attribute
+                return [value for value in (e.get(attribute) for e in selected)
+                        if value is not None]
+        return super(IndexedSelectorHandler, self).select(document, selector)
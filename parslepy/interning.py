@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Share one string object between identical extracted values.
+
+Listing pages repeat the same values for every item (currency codes,
+category names, "In stock"...), and each extraction produces a new
+string for each of them. With an interner, a :class:`parslepy.base.Parselet`
+replaces extracted strings by the first identical string it has seen:
+
+>>> import parslepy
+>>> from parslepy.interning import StringInterner
+>>> interner = StringInterner()
+>>> p = parslepy.Parselet(rules, interner=interner)
+>>> results = [p.parse(page) for page in pages]
+>>> interner.to_dict()
+{'hits': 8210, 'misses': 1034, 'bytes_saved': 451722, 'size': 1034}
+
+An interner can be shared by several Parselets, e.g. to deduplicate
+values over a whole batch of documents kept in memory,
+or cleared for each document (``per_document=True``).
+"""
+
+from __future__ import unicode_literals
+import sys
+
+from parslepy.base import isstr
+
+
+class StringInterner(object):
+    """
+    Bounded table of strings, returning a single shared object
+    for identical strings.
+
+    Only strings up to `max_length` characters are interned
+    (long texts rarely repeat); once `max_size` strings are held,
+    new strings are returned as they are, and only strings
+    already in the table are shared.
+    """
+
+    def __init__(self, max_size=100000, max_length=200, per_document=False):
+        """
+        :param int max_size: maximum number of strings held
+        :param int max_length: longest string to intern, in characters
+        :param boolean per_document: clear the table before each document
+            extracted (values are shared within documents only)
+        """
+
+        self.max_size = max_size
+        self.max_length = max_length
+        self.per_document = per_document
+        self.table = {}
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+
+    def __len__(self):
+        return len(self.table)
+
+    def __repr__(self):
+        return "<StringInterner: size=%d; hits=%d; bytes_saved=%d>" % (
+            len(self.table), self.hits, self.bytes_saved)
+
+    def intern(self, value):
+        """
+        Return the shared string equal to `value` (a string,
+        or a list of extracted values); other values are returned as is
+        """
+
+        if isstr(value):
+            if len(value) > self.max_length:
+                return value
+            shared = self.table.get(value)
+            if shared is None:
+                self.misses += 1
+                if len(self.table) < self.max_size:
+                    self.table[value] = value
+                return value
+            if shared is not value:
+                self.hits += 1
+                self.bytes_saved += sys.getsizeof(value)
+            return shared
+        if isinstance(value, list):
+            return [self.intern(v) for v in value]
+        return value
+
+    def start_document(self):
+        """
+        Called by Parselets before extracting a document
+        """
+
+        if self.per_document:
+            self.table.clear()
+
+    def clear(self):
+        """
+        Empty the table; counters are kept
+        """
+
+        self.table.clear()
+
+    def to_dict(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "bytes_saved": self.bytes_saved,
+            "size": len(self.table),
+        }
@@ -0,0 +1,366 @@
+# -*- coding: utf-8 -*-
+"""
+Lightweight metrics for monitoring :class:`parslepy.base.Parselet`
+instances running in long-lived processes.
+
+A :class:`MetricsRegistry` instance can be passed to a Parselet
+(``Parselet(rules, metrics=registry)``); it is then updated during
+compilation, parsing and extraction, and can be exported
+as a Prometheus text snapshot (:meth:`~MetricsRegistry.to_prometheus`)
+or as a Python dict (:meth:`~MetricsRegistry.to_dict`).
+
+Each metric holds its own lock, only taken for the duration
+of a single dict or list update.
+"""
+
+import bisect
+import threading
+from timeit import default_timer
+
+
+class Metric(object):
+    """
+    Base class for metrics; values are stored per tuple of label values
+    """
+
+    TYPE = None
+
+    def __init__(self, name, documentation="", labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _labels(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError("%s expects labels %r, got %r" % (
+                self.name, self.labelnames, labels))
+        return tuple(labels)
+
+    def labelsets(self):
+        with self._lock:
+            return sorted(self._values)
+
+    def samples(self):
+        """
+        Return a list of (name suffix, labels dict, value) tuples
+        """
+
+        raise NotImplementedError
+
+    def __repr__(self):
+        return "<%s: %s>" % (self.__class__.__name__, self.name)
+
+
+class Counter(Metric):
+    """
+    Monotonically increasing value
+
+    >>> c = Counter("documents_total")
+    >>> c.inc()
+    >>> c.inc(2)
+    >>> c.value()
+    3
+    """
+
+    TYPE = "counter"
+
+    def inc(self, amount=1, *labels):
+        labels = self._labels(labels)
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(self._labels(labels), 0)
+
+    def values(self):
+        """
+        Return a dict of label values tuples to counts
+        """
+
+        with self._lock:
+            return dict(self._values)
+
+    def samples(self):
+        return [("", dict(zip(self.labelnames, labels)), value)
+                for labels, value in sorted(self.values().items())]
+
+
+class Histogram(Metric):
+    """
+    Distribution of observed values (typically durations in seconds)
+    in cumulative buckets
+
+    >>> h = Histogram("extract_seconds", buckets=(0.1, 1.0))
+    >>> h.observe(0.05)
+    >>> h.observe(0.5)
+    >>> h.count(), h.buckets_counts()
+    (2, [(0.1, 1), (1.0, 2), (inf, 2)])
+    """
+
+    TYPE = "histogram"
+
+    DEFAULT_BUCKETS = (
+        0.0005, 0.001, 0.0025, 0.005,
+        0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+        1.0, 2.5, 5.0, 10.0,
+    )
+
+    def __init__(self, name, documentation="", labelnames=(), buckets=None):
+        super(Histogram, self).__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets or self.DEFAULT_BUCKETS)) + (float("inf"),)
+
+    def observe(self, value, *labels):
+        labels = self._labels(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            data = self._values.get(labels)
+            if data is None:
+                # [per-bucket counts, sum of observed values]
+                data = self._values[labels] = [[0] * len(self.buckets), 0.0]
+            data[0][index] += 1
+            data[1] += value
+
+    def time(self, *labels):
+        """
+        Context manager observing the duration of its block
+        """
+
+        return _Timer(self, labels)
+
+    def _data(self, labels):
+        with self._lock:
+            data = self._values.get(self._labels(labels))
+            if data is None:
+                return [0] * len(self.buckets), 0.0
+            return list(data[0]), data[1]
+
+    def count(self, *labels):
+        return sum(self._data(labels)[0])
+
+    def sum(self, *labels):
+        return self._data(labels)[1]
+
+    def buckets_counts(self, *labels):
+        """
+        Return a list of (upper bound, cumulative count) tuples
+        """
+
+        counts, _ = self._data(labels)
+        cumulated, total = [], 0
+        for bound, count in zip(self.buckets, counts):
+            total += count
+            cumulated.append((bound, total))
+        return cumulated
+
+    def samples(self):
+        samples = []
+        for labels in self.labelsets():
+            labeldict = dict(zip(self.labelnames, labels))
+            for bound, count in self.buckets_counts(*labels):
+                bucket_labels = dict(labeldict, le=_format_value(bound))
+                samples.append(("_bucket", bucket_labels, count))
+            samples.append(("_sum", labeldict, self.sum(*labels)))
+            samples.append(("_count", labeldict, self.count(*labels)))
+        return samples
+
+
+class _Timer(object):
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = default_timer()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.histogram.observe(default_timer() - self.start, *self.labels)
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(value)
+
+
+def _escape_label(value):
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r'\"')
+
+
+class MetricsRegistry(object):
+    """
+    Collection of metrics updated by :class:`parslepy.base.Parselet`
+    instances and their selector handlers.
+
+    >>> import parslepy
+    >>> from parslepy.metrics import MetricsRegistry
+    >>> registry = MetricsRegistry()
+    >>> p = parslepy.Parselet({"title": "h1", "subtitle?": "h2"}, metrics=registry)
+    >>> p.parse_fromstring("<html><body><h1>Hello</h1></body></html>")
+    {'title': 'Hello'}
+    >>> registry.documents_parsed.value()
+    1
+    >>> sorted(registry.empty_result_rates().items())
+    [('subtitle', 1.0), ('title', 0.0)]
+    """
+
+    PREFIX = "parslepy_"
+
+    def __init__(self, prefix=None):
+        if prefix is not None:
+            self.PREFIX = prefix
+        self._metrics = []
+        self._lock = threading.Lock()
+
+        self.documents_parsed = self.counter("documents_parsed_total",
+            "Number of documents parsed")
+        self.parse_seconds = self.histogram("parse_seconds",
+            "Time spent parsing documents with lxml")
+        self.extract_seconds = self.histogram("extract_seconds",
+            "Time spent extracting content from parsed documents")
+        self.selector_cache_hits = self.counter("selector_cache_hits_total",
+            "Selectors served from the selector handler cache")
+        self.selector_cache_misses = self.counter("selector_cache_misses_total",
+            "Selectors compiled by the selector handler")
+        self.selector_cache_evictions = self.counter("selector_cache_evictions_total",
+            "Selectors evicted from a bounded selector handler cache")
+        self.nonmatching_keys = self.counter("nonmatching_required_keys_total",
+            "NonMatchingNonOptionalKey errors raised in strict mode", ("key",))
+        self.key_extractions = self.counter("key_extractions_total",
+            "Number of times a key was extracted", ("key",))
+        self.key_empty_results = self.counter("key_empty_results_total",
+            "Number of times a key extraction yield nothing", ("key",))
+        self.budgets_exceeded = self.counter("budgets_exceeded_total",
+            "Documents that exceeded a resource budget", ("limit",))
+
+    def _register(self, metric):
+        with self._lock:
+            for registered in self._metrics:
+                if registered.name != metric.name:
+                    continue
+                # shared by several routers, registries...
+                if (    type(registered) is type(metric)
+                    and registered.labelnames == metric.labelnames):
+                    return registered
+                raise ValueError("Metric %s already registered "
+                                 "with another type or labels" % metric.name)
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation="", labelnames=()):
+        """
+        Create and register a new :class:`Counter`,
+        or return the counter already registered with this name
+
+        :raises: :class:`ValueError` if another type of metric,
+            or a counter with other label names, has this name
+        """
+
+        return self._register(
+            Counter(self.PREFIX + name, documentation, labelnames))
+
+    def histogram(self, name, documentation="", labelnames=(), buckets=None):
+        """
+        Create and register a new :class:`Histogram`,
+        or return the histogram already registered with this name
+
+        :raises: :class:`ValueError` if another type of metric,
+            or a histogram with other label names, has this name
+        """
+
+        return self._register(
+            Histogram(self.PREFIX + name, documentation, labelnames, buckets))
+
+    def metrics(self):
+        with self._lock:
+            return list(self._metrics)
+
+    # hooks called by Parselet and selector handlers
+
+    def document_parsed(self, seconds):
+        self.documents_parsed.inc()
+        self.parse_seconds.observe(seconds)
+
+    def document_extracted(self, seconds):
+        self.extract_seconds.observe(seconds)
+
+    def key_extracted(self, key, empty):
+        self.key_extractions.inc(1, key)
+        if empty:
+            self.key_empty_results.inc(1, key)
+
+    def empty_result_rates(self):
+        """
+        Return a dict mapping key paths to the ratio of extractions
+        that yield nothing
+        """
+
+        empty = self.key_empty_results.values()
+        return dict((labels[0], float(empty.get(labels, 0)) / total)
+                    for labels, total in self.key_extractions.values().items()
+                    if total)
+
+    # exports
+
+    def to_dict(self):
+        """
+        Snapshot of all metric values as a dict
+
+        Counters without labels map to their value,
+        labelled counters map to a dict of label value to count,
+        histograms map to a dict with "count", "sum" and "buckets" entries.
+        """
+
+        snapshot = {}
+        for metric in self.metrics():
+            name = metric.name[len(self.PREFIX):]
+            if isinstance(metric, Counter):
+                values = metric.values()
+                if metric.labelnames:
+                    snapshot[name] = dict(
+                        (labels[0] if len(labels) == 1 else labels, v)
+                        for labels, v in values.items())
+                else:
+                    snapshot[name] = values.get((), 0)
+            elif isinstance(metric, Histogram) and not metric.labelnames:
+                snapshot[name] = {
+                    "count": metric.count(),
+                    "sum": metric.sum(),
+                    "buckets": metric.buckets_counts(),
+                }
+            elif isinstance(metric, Histogram):
+                snapshot[name] = dict(
+                    (labels[0] if len(labels) == 1 else labels, {
+                        "count": metric.count(*labels),
+                        "sum": metric.sum(*labels),
+                        "buckets": metric.buckets_counts(*labels),
+                    }) for labels in metric.labelsets())
+        snapshot["key_empty_result_rates"] = self.empty_result_rates()
+        return snapshot
+
+    def to_prometheus(self):
+        """
+        Snapshot of all metric values in Prometheus text exposition format
+        """
+
+        lines = []
+        for metric in self.metrics():
+            if metric.documentation:
+                lines.append("# HELP %s %s" % (metric.name, metric.documentation))
+            lines.append("# TYPE %s %s" % (metric.name, metric.TYPE))
+            samples = metric.samples()
+            if not samples and not metric.labelnames:
+                samples = [("", {}, 0)] if metric.TYPE == "counter" else []
+            for suffix, labels, value in samples:
+                if labels:
+                    labelstr = "{%s}" % ",".join(
+                        '%s="%s"' % (k, _escape_label(v))
+                        for k, v in sorted(labels.items()))
+                else:
+                    labelstr = ""
+                lines.append("%s%s%s %s" % (
+                    metric.name, suffix, labelstr, _format_value(value)))
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+Apply several Parsley scripts to the same documents,
+parsing each document once and evaluating identical selectors only once.
+
+>>> import parslepy
+>>> from parslepy.multi import ParseletSet
+>>> parselets = ParseletSet({
+...     "product": {"name": "h1", "price": "span.price"},
+...     "breadcrumbs": {"path": ["ul.breadcrumbs li"]},
+...     "metadata": {"title": "title", "name": "h1"},
+... })
+>>> parselets.parse_fromstring(html)
+{'product': {...}, 'breadcrumbs': {...}, 'metadata': {...}}
+"""
+
+from __future__ import unicode_literals
+
+import lxml.etree
+from timeit import default_timer
+
+from parslepy.base import Parselet
+from parslepy.selectors import SelectorHandler, DefaultSelectorHandler
+
+
+class MemoizingSelectorHandler(SelectorHandler):
+    """
+    Wrap a :class:`parslepy.selectors.SelectorHandler` and remember
+    the results of :meth:`select` and :meth:`extract` for each
+    (compiled selector, context node) pair, until :meth:`clear` is called.
+
+    Selectors built from the same selection string by the wrapped
+    handler share their compiled form, so identical selectors
+    used by several Parselets are evaluated once per context node.
+
+    Instances hold per-document state: do not share them between threads.
+    """
+
+    def __init__(self, handler):
+        super(MemoizingSelectorHandler, self).__init__()
+        self.handler = handler
+        self.memo = {}
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def context(self):
+        return getattr(self.handler, "context", None)
+
+    @context.setter
+    def context(self, value):
+        self.handler.context = value
+
+    @property
+    def metrics(self):
+        return self.handler.metrics
+
+    @metrics.setter
+    def metrics(self, value):
+        self.handler.metrics = value
+
+    @property
+    def tracer(self):
+        return self.handler.tracer
+
+    @tracer.setter
+    def tracer(self, value):
+        self.handler.tracer = value
+
+    def make(self, selection_string):
+        return self.handler.make(selection_string)
+
+    def _memoized(self, method, document, selector):
+        key = (method, getattr(selector, "selector", selector), document)
+        try:
+            result = self.memo[key]
+        except KeyError:
+            self.misses += 1
+            result = self.memo[key] = getattr(self.handler, method)(document, selector)
+            return result
+        except TypeError:
+            # unhashable selector
+            return getattr(self.handler, method)(document, selector)
+        self.hits += 1
+        # do not share lists between output objects
+        if isinstance(result, list):
+            return list(result)
+        return result
+
+    def select(self, document, selector):
+        return self._memoized("select", document, selector)
+
+    def extract(self, document, selector):
+        return self._memoized("extract", document, selector)
+
+    def clear(self):
+        """
+        Forget memoized results (and release the nodes they reference)
+        """
+
+        self.memo = {}
+
+
+class ParseletSet(object):
+    """
+    A named collection of Parselets sharing one selector handler.
+
+    Each document is parsed once; selectors that appear in several
+    Parsley scripts are compiled once and, for each context node,
+    evaluated once. Extraction returns a dict of results
+    per Parselet name.
+
+    Like :class:`MemoizingSelectorHandler`, instances
+    should not be shared between threads.
+    """
+
+    def __init__(self, parselets, selector_handler=None, strict=False,
+                 metrics=None, tracer=None, optimize=True, interner=None):
+        """
+        :param dict parselets: Parsley scripts (as Python dicts) by name
+        :param selector_handler: handler shared by all Parsley scripts;
+            defaults to an instance of :class:`parslepy.selectors.DefaultSelectorHandler`
+
+        Other arguments: same as for :class:`parslepy.base.Parselet`
+        constructor, and applied to all Parsley scripts
+        """
+
+        if selector_handler is None:
+            selector_handler = DefaultSelectorHandler(tracer=tracer)
+        self.selector_handler = MemoizingSelectorHandler(selector_handler)
+        self.metrics = metrics
+        self.parselets = {}
+        for name, rules in parselets.items():
+            self.parselets[name] = Parselet(rules,
+                selector_handler=self.selector_handler, strict=strict,
+                metrics=metrics, tracer=tracer, optimize=optimize,
+                interner=interner)
+
+    def keys(self):
+        """
+        Return the names of the Parselets
+        """
+
+        return list(self.parselets.keys())
+
+    def __getitem__(self, name):
+        return self.parselets[name]
+
+    def __len__(self):
+        return len(self.parselets)
+
+    def extract(self, document, context=None, source=None):
+        """
+        Extract values from an lxml-parsed document with all Parselets
+
+        :rtype: dict of extracted content (as returned by
+            :meth:`parslepy.base.Parselet.extract`) by Parselet name
+        """
+
+        self.selector_handler.clear()
+        try:
+            return dict((name, parselet.extract(document,
+                            context=context, source=source))
+                        for name, parselet in self.parselets.items())
+        finally:
+            self.selector_handler.clear()
+
+    def parse(self, fp, parser=None, context=None):
+        """
+        Parse a document once (see :meth:`parslepy.base.Parselet.parse`)
+        and extract values with all Parselets
+        """
+
+        if parser is None:
+            parser = lxml.etree.HTMLParser()
+        if self.metrics is not None:
+            start = default_timer()
+        document = Parselet._parse_input(fp, parser)
+        if self.metrics is not None:
+            self.metrics.document_parsed(default_timer() - start)
+        return self.extract(document, context=context)
+
+    def parse_fromstring(self, s, parser=None, context=None, source=None):
+        """
+        Parse a document from a string once
+        and extract values with all Parselets
+        """
+
+        if parser is None:
+            parser = lxml.etree.HTMLParser()
+        if self.metrics is not None:
+            start = default_timer()
+        document = lxml.etree.fromstring(s, parser=parser)
+        if self.metrics is not None:
+            self.metrics.document_parsed(default_timer() - start)
+        return self.extract(document, context=context, source=source)
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+Remove parts of documents that a Parsley script never selects
+(inline scripts, stylesheets, SVG images, comments) right after parsing,
+so that they take no memory and are not traversed by selectors.
+
+>>> import parslepy
+>>> p = parslepy.Parselet({"title": "h1", "links": ["a @href"]}, prune=True)
+>>> p.pruning
+<PruningProfile: tags=noscript,script,style,svg,template; comments=True>
+"""
+
+from __future__ import unicode_literals
+import re
+
+import lxml.etree
+
+
+#: elements removed unless a selector mentions them
+PRUNABLE_TAGS = ("script", "style", "svg", "noscript", "template")
+
+
+# XPath string literals, ignored when looking for names and wildcards
+REGEX_STRING_LITERAL = re.compile(r"'[^']*'|\"[^\"]*\"")
+
+# node tests that can select any element, or the text inside any element:
+# "*" (but not the "@*" attribute wildcard), "node()",
+# and descendant "text()" nodes
+REGEX_ANY_ELEMENT = re.compile(
+    r"(?<!@)\*|\bnode\(\)|(?://|descendant(?:-or-self)?::)text\(\)")
+
+
+def _mentions(expression, name):
+    # not as part of a longer name, or as an attribute name
+    return re.search(r"(?<![\w.@$-])%s(?![\w.-])" % re.escape(name),
+                     expression) is not None
+
+
+def _selects_any_element(expression):
+    return REGEX_ANY_ELEMENT.search(expression) is not None
+
+
+class PruningProfile(object):
+    """
+    Element tags (and whether comments) to remove from parsed documents.
+
+    Removed elements keep their tail text in the document.
+    Note that their content no longer appears in the text
+    (or HTML) extracted from their ancestors.
+    """
+
+    def __init__(self, tags=(), comments=False):
+        self.tags = tuple(sorted(set(tags)))
+        self.comments = comments
+
+    def __repr__(self):
+        return "<PruningProfile: tags=%s; comments=%s>" % (
+            ",".join(self.tags), self.comments)
+
+    def __bool__(self):
+        return bool(self.tags or self.comments)
+    __nonzero__ = __bool__
+
+    @classmethod
+    def from_selectors(cls, selectors, tags=PRUNABLE_TAGS):
+        """
+        Return the profile pruning all `tags` that no selector mentions,
+        and comments if no selector can select them
+        (``comment()`` or ``node()`` node tests).
+
+        No element is pruned if a selector can select any element
+        (``*`` or ``node()`` node tests, e.g. ``count(//*)``, CSS ``#x > *``
+        or CSS selectors without a tag name like ``.price``),
+        or the text nodes of any descendant (``//text()``).
+
+        Selectors are :class:`parslepy.selectors.Selector` instances;
+        if one has no XPath expression to inspect (e.g. from a custom
+        selector handler), nothing is pruned.
+        """
+
+        expressions = []
+        for selector in selectors:
+            expression = getattr(selector, 'xpath', None)
+            if not expression:
+                return cls()
+            expressions.append(REGEX_STRING_LITERAL.sub("''", expression))
+
+        if any(_selects_any_element(expression) for expression in expressions):
+            keep = set(tags)
+        else:
+            keep = set()
+            for expression in expressions:
+                for tag in tags:
+                    if _mentions(expression, tag):
+                        keep.add(tag)
+        comments = not any("comment()" in expression or "node()" in expression
+                           for expression in expressions)
+        return cls([tag for tag in tags if tag not in keep], comments)
+
+    def parser(self, xml=False):
+        """
+        Return a new lxml parser that already drops comments
+        if this profile prunes them
+        """
+
+        parser_class = lxml.etree.XMLParser if xml else lxml.etree.HTMLParser
+        return parser_class(remove_comments=self.comments)
+
+    def prune(self, document):
+        """
+        Remove pruned elements and comments from `document` (in place)
+        """
+
+        if self.tags:
+            lxml.etree.strip_elements(document, *self.tags, with_tail=False)
+        if self.comments:
+            lxml.etree.strip_tags(document, lxml.etree.Comment)
+        return document
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+Compact result objects: with ``Parselet(..., records=True)``,
+each object level of a Parsley script gets a record class with
+``__slots__``, and extraction returns instances of these classes
+instead of dicts. Results with the same shape share one class,
+and take a fraction of the memory of dicts.
+
+>>> import parslepy
+>>> p = parslepy.Parselet({"news(li)": [{"title": "a", "url": "a @href"}]},
+...     records=True)
+>>> result = p.parse_fromstring(html)
+>>> item = result["news"][0]
+>>> item["title"], item.url
+('First article', '/article-001.html')
+>>> result.to_dict()
+{'news': [{'title': 'First article', 'url': '/article-001.html'}, ...]}
+
+Records support read-only mapping access (``record[key]``, ``get()``,
+``keys()``, ``items()``, ``in``, iteration) and compare equal
+to the corresponding dicts. Keys that are valid Python identifiers
+are also available as attributes (except keys named like record
+methods or slots, e.g. ``keys`` or ``_0``).
+"""
+
+from __future__ import unicode_literals
+import re
+
+
+_missing = object()
+
+
+class Record(object):
+    """
+    Base class of generated record classes
+    """
+
+    __slots__ = ()
+
+    # output keys, in order
+    _fields = ()
+    # slot name by output key
+    _slot_names = {}
+
+    @classmethod
+    def from_dict(cls, values):
+        record = cls.__new__(cls)
+        slot_names = cls._slot_names
+        for key, value in values.items():
+            setattr(record, slot_names[key], value)
+        return record
+
+    def _get(self, key, default=_missing):
+        slot = self._slot_names.get(key)
+        if slot is not None:
+            value = getattr(self, slot, _missing)
+            if value is not _missing:
+                return value
+        if default is _missing:
+            raise KeyError(key)
+        return default
+
+    def __getitem__(self, key):
+        return self._get(key)
+
+    def get(self, key, default=None):
+        return self._get(key, default)
+
+    def __contains__(self, key):
+        slot = self._slot_names.get(key)
+        return slot is not None and hasattr(self, slot)
+
+    def keys(self):
+        return [key for key in self._fields
+                if hasattr(self, self._slot_names[key])]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def values(self):
+        return [self._get(key) for key in self.keys()]
+
+    def items(self):
+        return [(key, self._get(key)) for key in self.keys()]
+
+    def to_dict(self):
+        """
+        Return the record as a dict (nested records included)
+        """
+
+        return dict((key, _to_plain(value)) for key, value in self.items())
+
+    def __eq__(self, other):
+        if isinstance(other, Record):
+            other = other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        if equal is NotImplemented:
+            return equal
+        return not equal
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "%s(%s)" % (self.__class__.__name__, ", ".join(
+            "%s=%r" % (key, value) for key, value in self.items()))
+
+    def __reduce__(self):
+        # generated classes cannot be pickled by reference:
+        # records are pickled (e.g. sent between processes) as dicts
+        return (dict, (self.to_dict(),))
+
+
+def _to_plain(value):
+    if isinstance(value, Record):
+        return value.to_dict()
+    if isinstance(value, list):
+        return [_to_plain(v) for v in value]
+    return value
+
+def to_plain(value):
+    """
+    Convert records in extraction results (nested in lists, or not)
+    to dicts; e.g. as the `default` function of :func:`json.dumps`
+    """
+
+    return _to_plain(value)
+
+
+REGEX_IDENTIFIER = re.compile(r"^[a-zA-Z_][a-zA-Z0-9_]*$")
+
+def record_class(name, keys):
+    """
+    Generate a :class:`Record` subclass for output objects
+    with the given keys
+    """
+
+    fields = tuple(keys)
+    slot_names = dict((key, "_%d" % i) for i, key in enumerate(fields))
+    namespace = {
+        "__slots__": tuple(slot_names[key] for key in fields),
+        "_fields": fields,
+        "_slot_names": slot_names,
+    }
+    slots = set(namespace["__slots__"])
+    for key in fields:
+        # no attribute for keys named like a slot (e.g. "_0"),
+        # or like a Record method: use record[key] for them
+        if (REGEX_IDENTIFIER.match(key) and key not in slots
+                and not hasattr(Record, key)):
+            namespace[key] = property(
+                lambda self, _key=key: self._get(_key, None),
+                doc="value of key %s" % key)
+    return type(str(name), (Record,), namespace)
+
+def class_name(path):
+    """
+    Record class name for the object at a key path
+
+    >>> class_name("news/author-info")
+    'Record_news_author_info'
+    """
+
+    return "Record_%s" % re.sub(r"\W", "_", path) if path else "Record"
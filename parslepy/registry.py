@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+Named Parselets loaded from a directory of Parsley script files,
+reloaded when files change, without restarting the process.
+
+>>> from parslepy.registry import ParseletRegistry
+>>> registry = ParseletRegistry("parselets/")
+>>> registry.start(interval=5)
+>>> registry["product"].parse_fromstring(html)
+{...}
+
+"parselets/product.let.json" (or "product.json", "product.yml",
+"product.let.yml"...) is registered as "product".
+Files are polled for changes (modification time and size);
+only new and changed files are compiled again, in the polling thread,
+and the new set of Parselets replaces the previous one at once.
+Unchanged Parselets are kept as they are, and all Parselets share
+the same selector handler, so that selectors already compiled
+(:class:`parslepy.selectors.XPathSelectorHandler` caches them)
+are reused when a Parselet is recompiled.
+"""
+
+from __future__ import unicode_literals
+import os
+import threading
+
+from parslepy.base import Parselet
+from parslepy.selectors import DefaultSelectorHandler
+
+
+JSON_EXTENSIONS = (".let.json", ".json")
+YAML_EXTENSIONS = (".let.yml", ".let.yaml", ".yml", ".yaml")
+
+
+def parselet_name(filename):
+    """
+    Return the registry name of a Parsley script file name
+    (without its extension), or None if it is not a script file name
+    """
+
+    for extension in JSON_EXTENSIONS + YAML_EXTENSIONS:
+        if filename.endswith(extension) and len(filename) > len(extension):
+            return filename[:-len(extension)]
+
+
+class ParseletRegistry(object):
+    """
+    Parselets by name, from the Parsley scripts of a directory.
+
+    A script that fails to compile is reported in :attr:`errors`
+    and its previous version (if any) is kept.
+    """
+
+    def __init__(self, directory, selector_handler=None, strict=False,
+                 metrics=None, load=True, **kwargs):
+        """
+        :param string directory: directory of JSON and YAML Parsley scripts
+        :param selector_handler: selector handler shared by all Parselets;
+            a :class:`parslepy.selectors.DefaultSelectorHandler` by default
+        :param boolean strict: strict mode for the Parselets
+        :param metrics: optional :class:`parslepy.metrics.MetricsRegistry`;
+            reloads and compilation errors are counted there
+            (and it is passed to the Parselets)
+        :param boolean load: load the scripts now; else on :meth:`reload`
+
+        Other keyword arguments are passed to the :class:`.Parselet` constructor.
+        """
+
+        self.directory = directory
+        if selector_handler is None:
+            selector_handler = DefaultSelectorHandler()
+        self.selector_handler = selector_handler
+        self.metrics = metrics
+        self.kwargs = dict(kwargs, selector_handler=selector_handler,
+                           strict=strict, metrics=metrics)
+        self.errors = {}
+        # name -> Parselet; replaced (never modified) on reload
+        self._parselets = {}
+        # name -> (path, (modification time, size))
+        self._files = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopped = threading.Event()
+
+        if metrics is not None:
+            self.reloads = metrics.counter("registry_reloads_total",
+                "Parselets compiled again after their file changed", ("name",))
+            self.reload_errors = metrics.counter("registry_reload_errors_total",
+                "Parsley script files that failed to compile", ("name",))
+
+        if load:
+            self.reload()
+
+    def __getitem__(self, name):
+        return self._parselets[name]
+
+    def __contains__(self, name):
+        return name in self._parselets
+
+    def __len__(self):
+        return len(self._parselets)
+
+    def get(self, name, default=None):
+        return self._parselets.get(name, default)
+
+    def names(self):
+        return sorted(self._parselets)
+
+    def _scan(self):
+        """
+        Return the script files of the directory,
+        as a dict of name -> (path, (modification time, size))
+        """
+
+        files = {}
+        for filename in sorted(os.listdir(self.directory)):
+            name = parselet_name(filename)
+            if name is None or name in files:
+                continue
+            path = os.path.join(self.directory, filename)
+            try:
+                st = os.stat(path)
+            except OSError:
+                # removed since listed
+                continue
+            if os.path.isdir(path):
+                continue
+            files[name] = (path, (st.st_mtime, st.st_size))
+        return files
+
+    def _compile(self, path):
+        with open(path) as fp:
+            if path.endswith(YAML_EXTENSIONS):
+                return Parselet.from_yamlfile(fp, cache=False, **self.kwargs)
+            return Parselet.from_jsonfile(fp, cache=False, **self.kwargs)
+
+    def reload(self):
+        """
+        Compile new and changed scripts, forget removed ones,
+        and swap in the new set of Parselets
+
+        :rtype: list of the names of Parselets added, changed or removed
+        """
+
+        with self._lock:
+            files = self._scan()
+            parselets = {}
+            changed = []
+            for name, (path, stat) in files.items():
+                previous = self._parselets.get(name)
+                if self._files.get(name) == (path, stat):
+                    # unchanged (or still failing to compile)
+                    if previous is not None:
+                        parselets[name] = previous
+                    continue
+                try:
+                    parselets[name] = self._compile(path)
+                except Exception as e:
+                    self.errors[name] = e
+                    if self.metrics is not None:
+                        self.reload_errors.inc(1, name)
+                    if previous is not None:
+                        parselets[name] = previous
+                    continue
+                self.errors.pop(name, None)
+                changed.append(name)
+                if self.metrics is not None and previous is not None:
+                    self.reloads.inc(1, name)
+
+            removed = [name for name in self._parselets if name not in files]
+            for name in list(self.errors):
+                if name not in files:
+                    del self.errors[name]
+            self._files = files
+            self._parselets = parselets
+        return sorted(changed + removed)
+
+    def start(self, interval=2.0):
+        """
+        Poll the directory for changes every `interval` seconds,
+        in a daemon thread
+        """
+
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._poll, args=(interval,),
+            name="parslepy-registry")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop polling the directory
+        """
+
+        if self._thread is None:
+            return
+        self._stopped.set()
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def _poll(self, interval):
+        while not self._stopped.wait(interval):
+            try:
+                self.reload()
+            except OSError:
+                # directory temporarily missing
+                pass
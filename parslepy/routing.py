@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+"""
+Pick a Parselet for a document from its URL.
+
+>>> from parslepy.routing import ParseletRouter
+>>> router = ParseletRouter()
+>>> router.add("shop.example.com", r"/product/\\d+", product_rules)
+>>> router.add("*.example.com", r"/blog/", "parselets/blog.let.json")
+>>> router.add("*", r"/", generic_rules)
+>>> router.route("http://shop.example.com/product/42")
+<parslepy.base.Parselet object at ...>
+
+Routes are grouped by host: dispatching a URL is a dict lookup
+for the host (then for wildcard parent domains, then "*"),
+and a single regular expression match combining the host's
+path patterns. Parselets are compiled the first time they are used.
+"""
+
+from __future__ import unicode_literals
+import re
+import threading
+from timeit import default_timer
+
+try:
+    from urllib.parse import urlsplit
+except ImportError:
+    from urlparse import urlsplit
+
+from parslepy.base import Parselet, isstr
+
+
+ANY_HOST = "*"
+
+# named groups would clash once patterns are combined
+REGEX_NAMED_GROUP = re.compile(r"\(\?P<\w+>")
+
+# inline global flags, e.g. "(?i)/product", only allowed
+# at the start of the combined expression
+REGEX_GLOBAL_FLAGS = re.compile(r"^\(\?([aiLmsux]+)\)")
+
+# backreferences ("\1", "(?P=name)") and conditional groups ("(?(1)...)")
+# would refer to other groups once patterns are combined;
+# other escaped characters are matched too, so that "\\1" is not one
+REGEX_BACKREFERENCE = re.compile(r"(\\[1-9]|\(\?P=|\(\?\()|\\.", re.S)
+
+
+class Route(object):
+    """
+    A path pattern and the Parselet (or Parsley script, or script file name)
+    to use for URLs that match it
+    """
+
+    def __init__(self, host, pattern, target):
+        self.host = host
+        self.pattern = pattern
+        self.target = target
+        self.parselet = target if isinstance(target, Parselet) else None
+
+    def __repr__(self):
+        return "<Route: %s %s>" % (self.host, self.pattern)
+
+
+class ParseletRouter(object):
+    """
+    Map host and path patterns to Parselets.
+
+    Hosts are exact names (e.g. "www.example.com"), wildcards for a domain
+    and its subdomains ("*.example.com"), or "*" for any host.
+    Path patterns are regular expressions matched at the start of
+    the URL path (including the query string, if any).
+    For a given host, routes are tried in the order they were added;
+    more specific hosts are tried first.
+    """
+
+    # dispatch latency is measured in microseconds
+    DISPATCH_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5,
+                        1e-4, 2.5e-4, 5e-4, 1e-3, 1e-2)
+
+    def __init__(self, selector_handler=None, strict=False, metrics=None):
+        """
+        :param selector_handler: selector handler for the Parselets
+            compiled by the router
+        :param boolean strict: strict mode for the Parselets compiled
+            by the router
+        :param metrics: optional :class:`parslepy.metrics.MetricsRegistry`;
+            dispatch latency, unrouted URLs and Parselet compilations
+            are recorded there (and passed to compiled Parselets)
+        """
+
+        self.selector_handler = selector_handler
+        self.strict = strict
+        self.metrics = metrics
+        self._routes = {}
+        self._matchers = {}
+        self._lock = threading.Lock()
+
+        if metrics is not None:
+            self.dispatch_seconds = metrics.histogram("route_dispatch_seconds",
+                "Time spent finding the Parselet for a URL",
+                buckets=self.DISPATCH_BUCKETS)
+            self.unrouted = metrics.counter("route_misses_total",
+                "URLs that did not match any route")
+            self.compilations = metrics.counter("route_compilations_total",
+                "Parselets compiled on first use by a router")
+
+    def add(self, host, pattern, target):
+        """
+        Add a route
+
+        :param string host: host name, "*.domain" or "*"
+        :param string pattern: regular expression for URL paths
+        :param target: a :class:`parslepy.base.Parselet` instance,
+            a Parsley script as a dict, or the name of a JSON or YAML
+            Parsley script file; scripts are compiled on first use
+        :raises: :class:`ValueError` for patterns with backreferences
+            or conditional groups, which cannot be combined
+            with other patterns
+        """
+
+        host = host.lower()
+        compiled = re.compile(pattern)
+        for m in REGEX_BACKREFERENCE.finditer(pattern):
+            if m.group(1):
+                raise ValueError("backreferences and conditional groups "
+                    "are not supported in route patterns: %r in %r"
+                    % (m.group(1), pattern))
+        if compiled.groupindex:
+            pattern = REGEX_NAMED_GROUP.sub("(", pattern)
+        m = REGEX_GLOBAL_FLAGS.match(pattern)
+        if m:
+            # scope them to this pattern
+            pattern = "(?%s:%s)" % (m.group(1), pattern[m.end():])
+            try:
+                re.compile(pattern)
+            except re.error:
+                raise ValueError("unsupported inline flags in route pattern %r"
+                                 % m.group(0))
+        with self._lock:
+            self._routes.setdefault(host, []).append(Route(host, pattern, target))
+            self._matchers.pop(host, None)
+
+    def __len__(self):
+        return sum(len(routes) for routes in self._routes.values())
+
+    def _matcher(self, host):
+        """
+        Return the combined regular expression for the paths of a host,
+        and the routes by index of their enclosing group
+        """
+
+        try:
+            return self._matchers[host]
+        except KeyError:
+            pass
+        with self._lock:
+            parts = []
+            routes_by_group = {}
+            group = 1
+            for route in self._routes[host]:
+                parts.append("(%s)" % route.pattern)
+                routes_by_group[group] = route
+                group += 1 + re.compile(route.pattern).groups
+            matcher = (re.compile("|".join(parts)), routes_by_group)
+            self._matchers[host] = matcher
+            return matcher
+
+    def _candidate_hosts(self, hostname):
+        if hostname in self._routes:
+            yield hostname
+        labels = hostname.split(".")
+        for i in range(len(labels)):
+            wildcard = "*." + ".".join(labels[i:])
+            if wildcard in self._routes:
+                yield wildcard
+        if ANY_HOST in self._routes:
+            yield ANY_HOST
+
+    def match(self, url):
+        """
+        Return the :class:`Route` for a URL, or None
+        """
+
+        parts = urlsplit(url)
+        hostname = (parts.hostname or "").lower()
+        path = parts.path or "/"
+        if parts.query:
+            path = "%s?%s" % (path, parts.query)
+        for host in self._candidate_hosts(hostname):
+            regex, routes_by_group = self._matcher(host)
+            m = regex.match(path)
+            if m is not None:
+                return routes_by_group[m.lastindex]
+
+    def _compile(self, route):
+        with self._lock:
+            if route.parselet is None:
+                target = route.target
+                kwargs = dict(selector_handler=self.selector_handler,
+                              strict=self.strict, metrics=self.metrics)
+                if isstr(target):
+                    if target.endswith((".yml", ".yaml")):
+                        with open(target) as fp:
+                            parselet = Parselet.from_yamlfile(fp, **kwargs)
+                    else:
+                        with open(target) as fp:
+                            parselet = Parselet.from_jsonfile(fp, **kwargs)
+                else:
+                    parselet = Parselet(target, **kwargs)
+                if self.metrics is not None:
+                    self.compilations.inc()
+                route.parselet = parselet
+        return route.parselet
+
+    def route(self, url):
+        """
+        Return the Parselet to use for a URL (compiling it if needed),
+        or None if no route matches
+        """
+
+        if self.metrics is not None:
+            start = default_timer()
+        route = self.match(url)
+        if self.metrics is not None:
+            self.dispatch_seconds.observe(default_timer() - start)
+            if route is None:
+                self.unrouted.inc()
+        if route is None:
+            return None
+        if route.parselet is None:
+            return self._compile(route)
+        return route.parselet
+
+    def _route_or_raise(self, url):
+        parselet = self.route(url)
+        if parselet is None:
+            raise LookupError("no Parselet for %s" % url)
+        return parselet
+
+    def parse(self, url, fp=None, parser=None, context=None):
+        """
+        Extract content with the Parselet routed for `url`,
+        from `fp` (see :meth:`parslepy.base.Parselet.parse`;
+        defaults to the URL itself)
+
+        :raises: :class:`LookupError` if no route matches
+        """
+
+        return self._route_or_raise(url).parse(
+            url if fp is None else fp, parser=parser, context=context)
+
+    def parse_fromstring(self, url, s, parser=None, context=None):
+        """
+        Extract content from a document string with the Parselet
+        routed for `url`
+
+        :raises: :class:`LookupError` if no route matches
+        """
+
+        return self._route_or_raise(url).parse_fromstring(s,
+            parser=parser, context=context, source=url)
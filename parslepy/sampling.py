@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+Low-overhead sampling of slow extractions, meant to stay enabled
+in production.
+
+:class:`SlowSampler` is a :class:`parslepy.tracing.Tracer` recording
+selector evaluations and document extractions that take longer than
+a latency threshold into a bounded ring buffer,
+which can be dumped on demand:
+
+>>> import parslepy
+>>> from parslepy.sampling import SlowSampler
+>>> sampler = SlowSampler(selector_threshold=0.01, document_threshold=0.1)
+>>> parselet = parslepy.Parselet(rules, tracer=sampler)
+>>> ...
+>>> for sample in sampler.dump():
+...     print(sample["kind"], sample["duration"], sample["selector"], sample["source"])
+"""
+
+from __future__ import unicode_literals
+import collections
+import json
+import threading
+import time
+from timeit import default_timer
+
+from parslepy.tracing import Tracer, selector_string
+
+
+class SlowSampler(Tracer):
+    """
+    Record slow selector evaluations and document extractions
+
+    Each sample is a dict with these entries:
+
+    * "kind": "selector" or "document"
+    * "duration": in seconds
+    * "selector": selector expression (``None`` for documents)
+    * "path": key path the selector was evaluated for
+    * "source": document identifier (file name, URL, or the `source`
+      argument of :meth:`parslepy.base.Parselet.extract`), if known
+    * "size": document size in bytes, if known
+    * "time": wall-clock time (seconds since the Epoch) when the sample was taken
+    """
+
+    def __init__(self, selector_threshold=0.05, document_threshold=1.0, capacity=1000):
+        """
+        :param selector_threshold: minimum duration, in seconds, for a selector
+            evaluation to be recorded (``None`` to not record selectors)
+        :param document_threshold: minimum duration, in seconds, for a document
+            extraction to be recorded (``None`` to not record documents)
+        :param capacity: maximum number of samples kept; oldest samples are
+            discarded first
+        """
+
+        self.selector_threshold = selector_threshold
+        self.document_threshold = document_threshold
+        self.samples = collections.deque(maxlen=capacity)
+        self._local = threading.local()
+
+    def _state(self):
+        state = getattr(self._local, "state", None)
+        if state is None:
+            # [source, size, document start, key paths stack, selector start]
+            state = self._local.state = [None, None, None, [], None]
+        return state
+
+    def _record(self, kind, duration, selector=None, path=None):
+        state = self._state()
+        self.samples.append({
+            "kind": kind,
+            "duration": duration,
+            "selector": selector,
+            "path": path,
+            "source": state[0],
+            "size": state[1],
+            "time": time.time(),
+        })
+
+    def start_document(self, document, source=None, size=None):
+        state = self._state()
+        state[0] = source
+        state[1] = size
+        state[3] = []
+        state[2] = default_timer()
+
+    def end_document(self, document, output):
+        state = self._state()
+        if state[2] is None or self.document_threshold is None:
+            return
+        duration = default_timer() - state[2]
+        if duration >= self.document_threshold:
+            self._record("document", duration)
+
+    def start_key(self, ctx):
+        self._state()[3].append(ctx.path)
+
+    def end_key(self, ctx, extracted):
+        paths = self._state()[3]
+        if paths:
+            paths.pop()
+
+    def start_selector(self, selector, document):
+        self._state()[4] = default_timer()
+
+    def end_selector(self, selector, result):
+        state = self._state()
+        if state[4] is None or self.selector_threshold is None:
+            return
+        duration = default_timer() - state[4]
+        if duration >= self.selector_threshold:
+            self._record("selector", duration,
+                selector=selector_string(selector),
+                path=state[3][-1] if state[3] else None)
+
+    def dump(self, fp=None):
+        """
+        Return recorded samples, oldest first, as a list of dicts;
+        if `fp` is given, also write them as JSON lines to this file-like object
+        """
+
+        samples = list(self.samples)
+        if fp is not None:
+            for sample in samples:
+                fp.write(json.dumps(sample) + "\n")
+        return samples
+
+    def clear(self):
+        self.samples.clear()
@@ -2,7 +2,6 @@
 import re
 import copy
 
-import lxml.cssselect
 import lxml.etree
 
 import parslepy.funcs
@@ -12,15 +11,117 @@ class Selector(object):
     """
     Class of objects returned by :class:`.SelectorHandler` instances'
     (and subclasses) :meth:`~.SelectorHandler.make` method.
+
+    Besides the compiled `selector`, instances can carry
+    information on how it was built (used by :meth:`parslepy.base.Parselet.explain`):
+
+    * `source`: the selection string given to the handler
+    * `xpath`: the final XPath expression
+    * `kind`: "css" or "xpath", depending on how `source` was interpreted
+    * `smart_strings`: whether lxml "smart strings" are enabled
+    * `cache_hits`: how many times the handler returned this instance from its cache
     """
 
-    def __init__(self, selector):
+    def __init__(self, selector, source=None, xpath=None, kind=None, smart_strings=None):
         self.selector = selector
+        self.source = source
+        self.xpath = xpath
+        self.kind = kind
+        self.smart_strings = smart_strings
+        self.cache_hits = 0
 
     def __repr__(self):
         return "<Selector: inner=%s>" % self.selector
 
 
+class DocumentSelector(Selector):
+    """
+    Wraps a :class:`.Selector` whose result does not depend
+    on the context node, only on the document
+    (see :func:`xpath_is_document_rooted`).
+
+    :class:`parslepy.base.Parselet` evaluates these selectors once
+    per document when they appear inside iterated scopes.
+    """
+
+    def __init__(self, selector):
+        super(DocumentSelector, self).__init__(selector.selector,
+            source=selector.source, xpath=selector.xpath, kind=selector.kind,
+            smart_strings=selector.smart_strings)
+        self.wrapped = selector
+        self.cache_hits = selector.cache_hits
+
+    def __repr__(self):
+        return "<DocumentSelector: inner=%s>" % self.selector
+
+
+# kinds of node scans done by XPath expressions,
+# from the most to the least expensive (see :func:`xpath_scan`)
+SCAN_DOCUMENT_DESCENDANTS = "document-descendants"
+SCAN_DOCUMENT = "document"
+SCAN_DESCENDANTS = "descendants"
+SCAN_CHILDREN = "children"
+
+REGEX_STRING_LITERAL = re.compile(r"'[^']*'|\"[^\"]*\"")
+# a location path starting with "/" at the start of the expression,
+# or of a function argument, predicate, union member or comparison operand
+REGEX_ABSOLUTE_PATH = re.compile(r'(?:^|[(\[,|=<>])\s*/')
+REGEX_DESCENDANT_STEP = re.compile(r'//|descendant(?:-or-self)?::')
+
+def xpath_scan(expression):
+    """
+    Classify an XPath expression by the widest node scan it does:
+
+    * ``SCAN_DOCUMENT_DESCENDANTS``: absolute path with descendant steps, e.g. ``//a``
+    * ``SCAN_DOCUMENT``: absolute path with child steps only, e.g. ``/html/body``
+    * ``SCAN_DESCENDANTS``: relative path with descendant steps, e.g. ``.//a``
+      or ``descendant-or-self::a`` (what CSS selectors translate to)
+    * ``SCAN_CHILDREN``: anything else, e.g. ``a/@href``
+
+    >>> xpath_scan("//h1")
+    'document-descendants'
+    >>> xpath_scan("descendant-or-self::li/a")
+    'descendants'
+    """
+
+    expression = REGEX_STRING_LITERAL.sub("''", expression)
+    descendants = REGEX_DESCENDANT_STEP.search(expression) is not None
+    if REGEX_ABSOLUTE_PATH.search(expression):
+        return SCAN_DOCUMENT_DESCENDANTS if descendants else SCAN_DOCUMENT
+    return SCAN_DESCENDANTS if descendants else SCAN_CHILDREN
+
+
+def xpath_is_document_rooted(expression):
+    """
+    Tell whether an XPath expression is an absolute location path,
+    or a union of absolute location paths, so that its result only depends
+    on the document, not on the context node it is evaluated from.
+
+    This is conservative: expressions such as ``count(//a)``
+    are not recognized.
+
+    >>> xpath_is_document_rooted("//h1 | /html/head/title")
+    True
+    >>> xpath_is_document_rooted("//h1 | h2")
+    False
+    """
+
+    expression = REGEX_STRING_LITERAL.sub("''", expression)
+    branches, current, depth = [], [], 0
+    for char in expression:
+        if char in "([":
+            depth += 1
+        elif char in ")]":
+            depth -= 1
+        if char == "|" and depth == 0:
+            branches.append("".join(current))
+            current = []
+        else:
+            current.append(char)
+    branches.append("".join(current))
+    return all(branch.strip().startswith("/") for branch in branches)
+
+
 class SelectorHandler(object):
     """
     Called when building abstract Parsley trees
@@ -36,9 +137,22 @@ class SelectorHandler(object):
 
     DEBUG = False
 
-    def __init__(self, debug=False):
+    # optional parslepy.metrics.MetricsRegistry
+    metrics = None
+
+    # optional parslepy.tracing.Tracer
+    tracer = None
+
+    def __init__(self, debug=False, metrics=None, tracer=None):
         if debug:
             self.DEBUG = True
+            if tracer is None:
+                from parslepy.tracing import PrintTracer
+                tracer = PrintTracer()
+        if metrics is not None:
+            self.metrics = metrics
+        if tracer is not None:
+            self.tracer = tracer
 
     def make(self, selection_string):
         """
@@ -133,11 +247,16 @@ class XPathSelectorHandler(SelectorHandler):
 
     _selector_cache = {}
 
-    def __init__(self, namespaces=None, extensions=None, context=None, debug=False):
+    def __init__(self, namespaces=None, extensions=None, context=None, debug=False,
+                 metrics=None, tracer=None):
         """
         :param namespaces: namespace mapping as :class:`dict`
         :param extensions: extension :class:`dict`
         :param context: user-context passed to XPath extension functions
+        :param metrics: optional :class:`parslepy.metrics.MetricsRegistry`
+            counting selector cache hits and misses
+        :param tracer: optional :class:`parslepy.tracing.Tracer`
+            receiving diagnostic messages
 
         `namespaces` and `extensions` dicts should have the same format
         as for `lxml`_:
@@ -155,7 +274,8 @@ class XPathSelectorHandler(SelectorHandler):
 
         """
 
-        super(XPathSelectorHandler, self).__init__(debug=debug)
+        super(XPathSelectorHandler, self).__init__(debug=debug, metrics=metrics,
+            tracer=tracer)
 
         # support EXSLT extensions
         self.namespaces = copy.copy(self.EXSLT_NAMESPACES)
@@ -238,14 +358,20 @@ class XPathSelectorHandler(SelectorHandler):
 
         cached = self._selector_cache.get(selection)
         if cached:
+            cached.cache_hits += 1
+            if self.metrics is not None:
+                self.metrics.selector_cache_hits.inc()
             return cached
+        if self.metrics is not None:
+            self.metrics.selector_cache_misses.inc()
 
+        smart_strings = (self.SMART_STRINGS
+                         or self._test_smart_strings_needed(selection))
         try:
             selector = lxml.etree.XPath(selection,
                 namespaces = self.namespaces,
                 extensions = self.extensions,
-                smart_strings=(self.SMART_STRINGS
-                            or self._test_smart_strings_needed(selection)),
+                smart_strings=smart_strings,
                 )
 
         except lxml.etree.XPathSyntaxError as syntax_error:
@@ -253,21 +379,22 @@ class XPathSelectorHandler(SelectorHandler):
             raise syntax_error
 
         except Exception as e:
-            if self.DEBUG:
-                print(repr(e), selection)
+            if self.tracer is not None:
+                self.tracer.message("%r %s" % (e, selection))
             raise
 
         # wrap it/cache it
-        self._selector_cache[selection] = Selector(selector)
+        self._selector_cache[selection] = Selector(selector,
+            source=selection, xpath=selection, kind="xpath",
+            smart_strings=bool(smart_strings))
         return self._selector_cache[selection]
 
-    @classmethod
-    def select(cls, document, selector):
+    def select(self, document, selector):
         try:
             return selector.selector(document)
         except Exception as e:
-            if cls.DEBUG:
-                print(str(e))
+            if self.tracer is not None:
+                self.tracer.message(str(e))
             return
 
     def extract(self, document, selector, debug_offset=''):
@@ -294,8 +421,6 @@ class XPathSelectorHandler(SelectorHandler):
 
         # selector did not match anything
         else:
-            if self.DEBUG:
-                print(debug_offset, "selector did not match anything; return None")
             return None
 
     def _default_element_extract(self, element):
@@ -323,10 +448,10 @@ class XPathSelectorHandler(SelectorHandler):
         #
         #   Note that in the default implementation,
         #   smart strings are disabled
-        if type(retval) == lxml.etree._Element:
-            return self._default_element_extract(retval)
-
-        elif type(retval) == lxml.etree._Comment:
+        #
+        # elements and comments may be instances of subclasses,
+        # e.g. lxml.html.HtmlElement in trees parsed by lxml.html (or Scrapy)
+        if isinstance(retval, lxml.etree._Element):
             return self._default_element_extract(retval)
 
         elif isinstance(retval, tuple(self.EXPECTED_NON_ELEMENT_TYPES)):
@@ -336,9 +461,18 @@ class XPathSelectorHandler(SelectorHandler):
             raise Warning("unusual type %s" % type(retval))
             return retval
 
-try:
-    from cssselect import HTMLTranslator
-    from cssselect.xpath import _unicode_safe_getattr, XPathExpr
+# cssselect (and lxml.cssselect) are imported,
+# and the translator created, on first use
+_css_translator = None
+
+def _make_css_translator():
+    try:
+        from cssselect import HTMLTranslator
+        from cssselect.xpath import _unicode_safe_getattr, XPathExpr
+    except ImportError:
+        # lxml's own css_to_xpath(), without Parsley pseudo-elements
+        import lxml.cssselect
+        return lxml.cssselect
 
     class CssTranslator(HTMLTranslator):
 
@@ -392,14 +526,13 @@ try:
             other = XPathExpr('comment()', '', )
             return xpath.join('/', other)
 
-    css_translator = CssTranslator()
-    def css_to_xpath(css):
-        return css_translator.css_to_xpath(css)
-
-except ImportError:
+    return CssTranslator()
 
-    def css_to_xpath(css):
-        return lxml.cssselect.css_to_xpath(css)
+def css_to_xpath(css):
+    global _css_translator
+    if _css_translator is None:
+        _css_translator = _make_css_translator()
+    return _css_translator.css_to_xpath(css)
 
 
 class DefaultSelectorHandler(XPathSelectorHandler):
@@ -411,23 +544,42 @@ class DefaultSelectorHandler(XPathSelectorHandler):
     that is (roughly) XPath 1.0 and CSS3 for things that dont need browser context
     """
 
-    # newer lxml version (>3) raise SelectorSyntaxError (directly from cssselect)
-    # for invalid CSS selectors
-    # but older lxml (2.3.8 for example) have cssselect included
-    # and for some selectors raise AssertionError and TypeError instead
-    CSSSELECT_SYNTAXERROR_EXCEPTIONS = set([
-        # we could use lxml.cssselect.SelectorError (parent class for both),
-        # but for lxml<3, they're not related
-        lxml.cssselect.SelectorSyntaxError,
-        # for unsupported pseudo-class or XPath namespaces prefix syntax
-        lxml.cssselect.ExpressionError,
-    ])
-    # this is to add AssertionError and TypeError if lxml < 3.0.0
-    for s in ('#a.', '//h1'):
-        try:
-            lxml.cssselect.CSSSelector(s)
-        except Exception as e:
-            CSSSELECT_SYNTAXERROR_EXCEPTIONS.add(type(e))
+    # set on first use, see _cssselect_syntaxerror_exceptions()
+    CSSSELECT_SYNTAXERROR_EXCEPTIONS = None
+
+    @classmethod
+    def _cssselect_syntaxerror_exceptions(cls):
+        """
+        Return the exception types raised by cssselect
+        for selectors that are not CSS selectors
+        """
+
+        exceptions = DefaultSelectorHandler.CSSSELECT_SYNTAXERROR_EXCEPTIONS
+        if exceptions is not None:
+            return exceptions
+
+        import lxml.cssselect
+
+        # newer lxml version (>3) raise SelectorSyntaxError (directly from cssselect)
+        # for invalid CSS selectors
+        # but older lxml (2.3.8 for example) have cssselect included
+        # and for some selectors raise AssertionError and TypeError instead
+        exceptions = set([
+            # we could use lxml.cssselect.SelectorError (parent class for both),
+            # but for lxml<3, they're not related
+            lxml.cssselect.SelectorSyntaxError,
+            # for unsupported pseudo-class or XPath namespaces prefix syntax
+            lxml.cssselect.ExpressionError,
+        ])
+        # this is to add AssertionError and TypeError if lxml < 3.0.0
+        for s in ('#a.', '//h1'):
+            try:
+                lxml.cssselect.CSSSelector(s)
+            except Exception as e:
+                exceptions.add(type(e))
+        exceptions = tuple(exceptions)
+        DefaultSelectorHandler.CSSSELECT_SYNTAXERROR_EXCEPTIONS = exceptions
+        return exceptions
 
     # example: "a img @src" (fetch the 'src' attribute of an IMG tag)
     # other example: "im|img @im|src" when using namespace prefixes
@@ -444,10 +596,17 @@ class DefaultSelectorHandler(XPathSelectorHandler):
         """
         cached = self._selector_cache.get(selection)
         if cached:
+            cached.cache_hits += 1
+            if self.metrics is not None:
+                self.metrics.selector_cache_hits.inc()
             return cached
+        if self.metrics is not None:
+            self.metrics.selector_cache_misses.inc()
 
         namespaces = self.EXSLT_NAMESPACES
         self._add_parsley_ns(namespaces)
+        smart_strings = (self.SMART_STRINGS
+                         or self._test_smart_strings_needed(selection))
         try:
             # CSS with attribute? (non-standard but convenient)
             # CSS selector cannot select attributes
@@ -470,29 +629,29 @@ class DefaultSelectorHandler(XPathSelectorHandler):
                 cssxpath,
                 namespaces = self.namespaces,
                 extensions = self.extensions,
-                smart_strings=(self.SMART_STRINGS
-                            or self._test_smart_strings_needed(selection)),
+                smart_strings=smart_strings,
                 )
+            xpath, kind = cssxpath, "css"
 
-        except tuple(self.CSSSELECT_SYNTAXERROR_EXCEPTIONS) as syntax_error:
-            if self.DEBUG:
-                print(repr(syntax_error), selection)
-                print("Try interpreting as XPath selector")
+        except self._cssselect_syntaxerror_exceptions() as syntax_error:
+            if self.tracer is not None:
+                self.tracer.message("%r %s\nTry interpreting as XPath selector" % (
+                    syntax_error, selection))
             try:
                 selector = lxml.etree.XPath(selection,
                     namespaces = self.namespaces,
                     extensions = self.extensions,
-                    smart_strings=(self.SMART_STRINGS
-                                or self._test_smart_strings_needed(selection)),
+                    smart_strings=smart_strings,
                     )
+                xpath, kind = selection, "xpath"
 
             except lxml.etree.XPathSyntaxError as syntax_error:
                 syntax_error.msg += ": %s" % selection
                 raise syntax_error
 
             except Exception as e:
-                if self.DEBUG:
-                    print(repr(e), selection)
+                if self.tracer is not None:
+                    self.tracer.message("%r %s" % (e, selection))
                 raise
 
         # for exception when trying to convert <cssselector> @<attribute> syntax
@@ -501,10 +660,12 @@ class DefaultSelectorHandler(XPathSelectorHandler):
             raise syntax_error
 
         except Exception as e:
-            if self.DEBUG:
-                print(repr(e), selection)
+            if self.tracer is not None:
+                self.tracer.message("%r %s" % (e, selection))
             raise
 
         # wrap it/cache it
-        self._selector_cache[selection] = Selector(selector)
+        self._selector_cache[selection] = Selector(selector,
+            source=selection, xpath=xpath, kind=kind,
+            smart_strings=bool(smart_strings))
         return self._selector_cache[selection]
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+Serializers writing extraction results to a file object,
+one record at a time: JSON lines, msgpack (requires the `msgpack` package)
+or CSV with one column per key path of a :class:`parslepy.base.Parselet`.
+
+>>> from parslepy.serializers import JsonLinesSerializer
+>>> serializer = JsonLinesSerializer(out)
+>>> for document in documents:
+...     serializer.write(parselet.parse(document))
+>>> serializer.close()
+
+Each record is encoded in one go (with the C accelerated encoder,
+when available) and written with a single ``write()`` call.
+"""
+
+from __future__ import unicode_literals
+import csv
+import json
+
+from parslepy.records import Record, to_plain
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class Serializer(object):
+    """
+    Base class for serializers: call :meth:`write` for each record,
+    then :meth:`close` (which does not close the output file object)
+    """
+
+    #: whether the output file object must be opened in binary mode
+    binary = False
+
+    def __init__(self, out):
+        self.out = out
+        self.records = 0
+
+    def write(self, record):
+        self.records += 1
+
+    def close(self):
+        if hasattr(self.out, "flush"):
+            self.out.flush()
+
+
+class JsonLinesSerializer(Serializer):
+    """
+    Write a JSON object per record and per line
+    """
+
+    def __init__(self, out, sort_keys=True, ensure_ascii=True):
+        super(JsonLinesSerializer, self).__init__(out)
+        self.encoder = json.JSONEncoder(sort_keys=sort_keys,
+            ensure_ascii=ensure_ascii, default=to_plain)
+
+    def write(self, record):
+        super(JsonLinesSerializer, self).write(record)
+        self.out.write(self.encoder.encode(record) + "\n")
+
+
+class MsgpackSerializer(Serializer):
+    """
+    Write records as a stream of msgpack maps
+    (the output file object must be opened in binary mode)
+    """
+
+    binary = True
+
+    def __init__(self, out):
+        if msgpack is None:
+            raise RuntimeError("msgpack output requires the msgpack package")
+        super(MsgpackSerializer, self).__init__(out)
+        self.packer = msgpack.Packer(use_bin_type=True, default=to_plain)
+
+    def write(self, record):
+        super(MsgpackSerializer, self).write(record)
+        self.out.write(self.packer.pack(record))
+
+
+def output_paths(parselet_tree, special_key="--"):
+    """
+    Return the "/"-separated key paths of the values in the output of a
+    compiled Parsley tree (:attr:`parslepy.base.Parselet.parselet_tree`),
+    in sorted order.
+
+    Nested objects give one path per key; lists (iterated keys)
+    give a single path. Keys of special "--" levels are merged
+    with their parent level, as in extraction output.
+    """
+
+    paths = []
+    for ctx, child in parselet_tree.items():
+        if ctx.key == special_key:
+            prefix = None
+        else:
+            prefix = ctx.key
+        if isinstance(child, dict) and not ctx.iterate:
+            for path in output_paths(child, special_key):
+                paths.append("%s/%s" % (prefix, path) if prefix else path)
+        elif prefix:
+            paths.append(prefix)
+    return sorted(paths)
+
+def lookup_path(record, path):
+    """
+    Return the value at a "/"-separated key path in nested dicts
+    (or records), or None
+    """
+
+    value = record
+    for key in path.split("/"):
+        if not isinstance(value, (dict, Record)):
+            return None
+        value = value.get(key)
+        if value is None:
+            return None
+    return value
+
+
+class CsvSerializer(Serializer):
+    """
+    Write a CSV row per record, with one column per key path.
+    Lists and objects are written as JSON; missing and empty values
+    as empty cells.
+
+    Use :meth:`for_parselet` to get the columns from a Parselet.
+    """
+
+    def __init__(self, out, columns, header=True, **fmtparams):
+        """
+        :param out: file object opened in text mode (with ``newline=""``)
+        :param list columns: key paths of the values to write,
+            e.g. ``["title", "meta/author"]``
+        :param boolean header: write the column names as the first row
+        :param fmtparams: :func:`csv.writer` formatting parameters
+        """
+
+        super(CsvSerializer, self).__init__(out)
+        self.columns = list(columns)
+        self.writer = csv.writer(out, **fmtparams)
+        if header:
+            self.writer.writerow(self.columns)
+
+    @classmethod
+    def for_parselet(cls, out, parselet, prefix=None, extra_columns=(), **kwargs):
+        """
+        Create a CSV serializer with a column per key path of `parselet`
+        output, optionally under a `prefix` path (e.g. "result"
+        for :mod:`parslepy.batch` records), after `extra_columns`
+        """
+
+        paths = output_paths(parselet.parselet_tree, parselet.SPECIAL_LEVEL_KEY)
+        if prefix:
+            paths = ["%s/%s" % (prefix, path) for path in paths]
+        return cls(out, list(extra_columns) + paths, **kwargs)
+
+    def cell(self, value):
+        if value is None or value == {} or value == []:
+            return ""
+        if isinstance(value, (dict, list, tuple, Record)):
+            return json.dumps(value, sort_keys=True, default=to_plain)
+        return value
+
+    def write(self, record):
+        super(CsvSerializer, self).write(record)
+        self.writer.writerow([self.cell(lookup_path(record, path))
+                              for path in self.columns])
+
+
+FORMATS = {
+    "jsonlines": JsonLinesSerializer,
+    "msgpack": MsgpackSerializer,
+    "csv": CsvSerializer,
+}
@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+"""
+Tracing hooks for :class:`parslepy.base.Parselet` extraction.
+
+A tracer is attached with ``Parselet(rules, tracer=my_tracer)``
+and is notified at the start and end of each document, key,
+scope and selector evaluation. When no tracer is attached, the only cost
+in the extraction loop is a ``None`` check on a local variable.
+
+:class:`PrintTracer` prints these events (this is what ``debug=True``
+uses) and :class:`JsonLinesTracer` writes timed spans to a JSON-lines file,
+which :func:`folded_stacks` turns into input for flame-graph tools.
+"""
+
+from __future__ import print_function, unicode_literals
+import io
+import json
+import threading
+from timeit import default_timer
+
+
+def selector_string(selector):
+    """
+    Return a readable representation of a :class:`parslepy.selectors.Selector`
+    """
+
+    inner = getattr(selector, "selector", selector)
+    return getattr(inner, "path", None) or repr(inner)
+
+
+class Tracer(object):
+    """
+    Base class for tracers: all hooks do nothing.
+
+    Subclasses override the hooks they are interested in.
+    `ctx` arguments are :class:`parslepy.base.ParsleyContext` instances,
+    `selector` arguments are :class:`parslepy.selectors.Selector` instances.
+    """
+
+    def start_document(self, document, source=None, size=None):
+        pass
+
+    def end_document(self, document, output):
+        pass
+
+    def start_key(self, ctx):
+        pass
+
+    def end_key(self, ctx, extracted):
+        pass
+
+    def start_scope(self, ctx, count):
+        """
+        Called before iterating over the `count` elements matching
+        the scope selector of `ctx`
+        """
+
+        pass
+
+    def end_scope(self, ctx, count):
+        """
+        Called after extracting content from `count` elements
+        of the scope of `ctx`
+        """
+
+        pass
+
+    def start_selector(self, selector, document):
+        pass
+
+    def end_selector(self, selector, result):
+        pass
+
+    def message(self, text):
+        """
+        Free-form diagnostic message (e.g. invalid selectors at compile time)
+        """
+
+        pass
+
+
+class MultiTracer(Tracer):
+    """
+    Forward all events to several tracers, in order
+    """
+
+    def __init__(self, *tracers):
+        self.tracers = list(tracers)
+
+    def start_document(self, document, source=None, size=None):
+        for t in self.tracers:
+            t.start_document(document, source=source, size=size)
+
+    def end_document(self, document, output):
+        for t in self.tracers:
+            t.end_document(document, output)
+
+    def start_key(self, ctx):
+        for t in self.tracers:
+            t.start_key(ctx)
+
+    def end_key(self, ctx, extracted):
+        for t in self.tracers:
+            t.end_key(ctx, extracted)
+
+    def start_scope(self, ctx, count):
+        for t in self.tracers:
+            t.start_scope(ctx, count)
+
+    def end_scope(self, ctx, count):
+        for t in self.tracers:
+            t.end_scope(ctx, count)
+
+    def start_selector(self, selector, document):
+        for t in self.tracers:
+            t.start_selector(selector, document)
+
+    def end_selector(self, selector, result):
+        for t in self.tracers:
+            t.end_selector(selector, result)
+
+    def message(self, text):
+        for t in self.tracers:
+            t.message(text)
+
+
+class PrintTracer(Tracer):
+    """
+    Print extraction events, indented by nesting level
+    """
+
+    def __init__(self, out=None):
+        self.out = out
+        self.level = 0
+
+    def _print(self, *args):
+        print("    " * self.level, *args, file=self.out)
+
+    def start_document(self, document, source=None, size=None):
+        self.level = 0
+        self._print("document:", source or document, size or "")
+
+    def end_document(self, document, output):
+        self.level = 0
+        self._print("output:", output)
+
+    def start_key(self, ctx):
+        self._print("key %s:" % ctx.path, ctx)
+        self.level += 1
+
+    def end_key(self, ctx, extracted):
+        self.level = max(self.level - 1, 0)
+
+    def start_scope(self, ctx, count):
+        self._print("%d elements in scope (%s)" % (count, ctx.scope))
+
+    def start_selector(self, selector, document):
+        self._print("selector:", selector_string(selector))
+
+    def end_selector(self, selector, result):
+        if result is None:
+            self._print("selector did not match anything")
+
+    def message(self, text):
+        self._print(text)
+
+
+class JsonLinesTracer(Tracer):
+    """
+    Record timed spans and write them, one JSON object per line,
+    to a file-like object or to a file path (opened in append mode).
+
+    Each span has a "kind" ("document", "key", "scope" or "selector"),
+    a "name", the key "path" it belongs to, a "stack" of enclosing span
+    names (root first), its "start" time, its "duration" in seconds,
+    and the "document" source when known.
+
+    Spans are tracked per thread, so a single instance can be shared by
+    Parselets used from several threads.
+    """
+
+    def __init__(self, output):
+        if isinstance(output, (str, type(""))):
+            self.fp = io.open(output, "a", encoding="utf-8")
+            self._owned = True
+        else:
+            self.fp = output
+            self._owned = False
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _push(self, kind, name, path):
+        self._stack().append((kind, name, path, default_timer()))
+
+    def _pop(self, **extra):
+        stack = self._stack()
+        if not stack:
+            return
+        end = default_timer()
+        kind, name, path, start = stack.pop()
+        span = {
+            "kind": kind,
+            "name": name,
+            "path": path,
+            "stack": [s[1] for s in stack],
+            "start": start,
+            "duration": end - start,
+            "document": getattr(self._local, "source", None),
+        }
+        span.update(extra)
+        line = json.dumps(span, default=str)
+        with self._lock:
+            self.fp.write(line + "\n")
+
+    def start_document(self, document, source=None, size=None):
+        self._local.stack = []
+        self._local.source = source
+        self._push("document", "document", "")
+
+    def end_document(self, document, output):
+        # only the document span should be left
+        # unless an exception interrupted extraction
+        del self._stack()[1:]
+        self._pop()
+
+    def start_key(self, ctx):
+        self._push("key", ctx.key, ctx.path)
+
+    def end_key(self, ctx, extracted):
+        self._pop()
+
+    def start_scope(self, ctx, count):
+        self._push("scope", selector_string(ctx.scope), ctx.path)
+
+    def end_scope(self, ctx, count):
+        self._pop(count=count)
+
+    def start_selector(self, selector, document):
+        stack = self._stack()
+        self._push("selector", selector_string(selector),
+                   stack[-1][2] if stack else "")
+
+    def end_selector(self, selector, result):
+        self._pop()
+
+    def flush(self):
+        with self._lock:
+            self.fp.flush()
+
+    def close(self):
+        self.flush()
+        if self._owned:
+            self.fp.close()
+
+
+def folded_stacks(lines):
+    """
+    Aggregate spans written by :class:`JsonLinesTracer` into
+    "folded" stacks (``frame1;frame2;frame3 microseconds``), with self-time
+    per stack, as expected by flame-graph tools such as
+    ``flamegraph.pl`` or speedscope.
+
+    :param lines: iterable of JSON lines (e.g. an open file)
+    :rtype: list of strings
+    """
+
+    totals = {}
+    children = {}
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        span = json.loads(line)
+        frames = tuple(span["stack"]) + (span["name"],)
+        totals[frames] = totals.get(frames, 0.0) + span["duration"]
+        if span["stack"]:
+            parent = tuple(span["stack"])
+            children[parent] = children.get(parent, 0.0) + span["duration"]
+
+    folded = []
+    for frames in sorted(totals):
+        self_time = totals[frames] - children.get(frames, 0.0)
+        folded.append("%s %d" % (
+            ";".join(frames), max(int(round(self_time * 1e6)), 0)))
+    return folded
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+"""
+lxml parser helpers, shared by batch extraction and the Scrapy tools
+without importing either.
+"""
+
+from __future__ import unicode_literals
+import codecs
+
+import lxml.etree
+
+
+def make_parser(xml=False, encoding=None):
+    """
+    Return an lxml HTML (or XML) parser for documents in the given encoding.
+
+    Encoding names unknown to libxml2 (e.g. "latin-1") are replaced
+    by Python's canonical name for the codec; unknown encodings are ignored
+    and the parser detects the document encoding itself.
+    """
+
+    parser_class = lxml.etree.XMLParser if xml else lxml.etree.HTMLParser
+    if not encoding:
+        return parser_class()
+    try:
+        return parser_class(encoding=encoding)
+    except LookupError:
+        pass
+    try:
+        return parser_class(encoding=codecs.lookup(encoding).name)
+    except LookupError:
+        return parser_class()
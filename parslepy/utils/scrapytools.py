@@ -1,10 +1,17 @@
-import io as StringIO
-from scrapy.contrib.loader import ItemLoader
+import lxml.etree
+try:
+    from scrapy.loader import ItemLoader
+except ImportError:
+    # Scrapy < 1.0
+    from scrapy.contrib.loader import ItemLoader
 from scrapy.item import Item, Field
 from scrapy.http import Request
-import urllib.parse
 import pprint
 
+from parslepy.base import ParsleyNode
+from parslepy.utils.parsers import make_parser
+from parslepy.utils.urltools import iter_urls
+
 class ParsleyItemLoaderConfig(object):
 
     def __init__(self, item_class=None, item_loader_class=None, iter_item_key=None):
@@ -19,20 +26,154 @@ class ParsleyItemLoaderConfig(object):
 
 class ParsleyRequestConfig(object):
 
-    def __init__(self, iter_request_key=None, url_getter=None, callback=None):
+    def __init__(self, iter_request_key=None, url_getter=None, callback=None,
+                 seen_urls=None):
+        """
+        `seen_urls` is an optional set-like object
+        (e.g. a :class:`parslepy.utils.urltools.BloomFilter`)
+        remembering the URLs of requests across responses,
+        so that requests are generated once per URL
+        """
+
         if url_getter:
             self.url_getter = url_getter
         else:
             self.url_getter = lambda u: u
         self.iter_request_key = iter_request_key
         self.callback = callback
+        self.seen_urls = seen_urls
 
     def __repr__(self):
         return "<ParsleyRequestConfig: key=%s, getter=%s, callback=%s>" % (
                 self.iter_request_key, self.url_getter, self.callback)
 
 
-class ParsleyItemClassLoader(object):
+def extract_response(parselet, response):
+    """
+    Extract content from a Scrapy response with a Parselet,
+    reusing the lxml tree of the response's selector
+    (``response.selector.root``) when it has one,
+    or else parsing the response body bytes
+    in the response's encoding
+    """
+
+    try:
+        root = response.selector.root
+    except AttributeError:
+        # not a text response
+        root = None
+    if isinstance(root, lxml.etree._Element):
+        return parselet.extract(root, source=response.url)
+
+    parser = make_parser(xml=False, encoding=getattr(response, "encoding", None))
+    return parselet.parse_fromstring(response.body, parser=parser,
+        source=response.url)
+
+
+# generated Item classes, by (class name, frozenset of keys)
+_item_classes = {}
+
+def get_item_class(class_name, keys):
+    """
+    Return an Item subclass with a Field per key,
+    generated once per class name and set of keys
+    """
+
+    signature = (class_name, frozenset(keys))
+    item_class = _item_classes.get(signature)
+    if item_class is None:
+        item_class = _item_classes.setdefault(signature, type(
+            str(class_name),
+            (Item,),
+            dict([(k, Field()) for k in signature[1]])))
+    return item_class
+
+def item_class_name(iter_item_key=None):
+    if iter_item_key:
+        return "%sClass" % iter_item_key.capitalize()
+    return "CustomClass"
+
+def parselet_item_classes(parselet):
+    """
+    Return a dict of Item classes for the objects extracted by `parselet`,
+    with a Field per key of its compiled Parsley tree: for the top level
+    (as None) and for the items of keys holding objects
+    (e.g. "products(div.product)": [{...}]), by key.
+
+    Loaders build it once per Parselet.
+    """
+
+    tree = parselet.parselet_tree
+    if not isinstance(tree, ParsleyNode):
+        return {}
+    item_classes = {None: get_item_class(item_class_name(), parselet._keys(tree))}
+    nodes = [tree]
+    while nodes:
+        for ctx, child in nodes.pop().items():
+            if not isinstance(child, ParsleyNode):
+                continue
+            if ctx.key == parselet.SPECIAL_LEVEL_KEY:
+                nodes.append(child)
+            elif ctx.key not in item_classes:
+                keys = parselet._keys(child)
+                if keys:
+                    item_classes[ctx.key] = get_item_class(
+                        item_class_name(ctx.key), keys)
+    return item_classes
+
+def infer_item_class(parselet, config, extracted=None, item_classes=None):
+    """
+    Return an Item class for the objects extracted by `parselet`
+    for this :class:`ParsleyItemLoaderConfig`, from `item_classes`
+    (see :func:`parselet_item_classes`, built if not given)
+    or, if the keys cannot be known beforehand, from the keys of `extracted`
+    """
+
+    if item_classes is None:
+        item_classes = parselet_item_classes(parselet)
+    item_class = item_classes.get(config.iter_item_key)
+    if item_class is not None or extracted is None:
+        return item_class
+
+    if config.iter_item_key:
+        keys = [
+            k
+            for e in extracted.get(config.iter_item_key) or ()
+            for k in list(e.keys())
+        ]
+    else:
+        keys = list(extracted.keys())
+    if keys:
+        return get_item_class(item_class_name(config.iter_item_key), keys)
+
+
+class ParsleyExtractionCache(object):
+    """
+    Mixin for loaders: content extracted from a response is kept
+    until another response is processed or :meth:`invalidate` is called,
+    so that items and requests come from a single extraction.
+    """
+
+    extracted = None
+    _extracted_response = None
+
+    def _parse(self, response=None):
+        response = response or self.response
+        if self.extracted is None or self._extracted_response is not response:
+            self.extracted = extract_response(self.parselet, response)
+            self._extracted_response = response
+        return self.extracted
+
+    def invalidate(self):
+        """
+        Forget the content extracted from the last response
+        """
+
+        self.extracted = None
+        self._extracted_response = None
+
+
+class ParsleyItemClassLoader(ParsleyExtractionCache):
     def __init__(self, parselet, configs, response=None, **context):
 
         self.configs = configs
@@ -41,14 +182,8 @@ class ParsleyItemClassLoader(object):
         self.extracted = None
         self.context = context
 
-    def _extract(self, response=None):
-        self.extracted = self.parselet.parse(
-            StringIO.StringIO(response.body))
-
-
     def iter_items(self, response=None):
-        if self.extracted is None:
-            self._extract(response or self.response)
+        self._parse(response)
 
         for config in self.configs:
             if config.iter_item_key is None:
@@ -64,41 +199,25 @@ class ParsleyItemClassLoader(object):
                     yield loader.load_item()
 
 
-class ParsleyImplicitItemClassLoader(object):
+class ParsleyImplicitItemClassLoader(ParsleyExtractionCache):
     def __init__(self, parselet, configs=None, response=None, **context):
 
         self.configs = configs
         self.parselet = parselet
+        self.item_classes = parselet_item_classes(parselet)
         self.response = response
         self.extracted = None
         self.context = context
 
     def _generate_item_classes(self, extracted):
         for config in self.configs:
-            if config.iter_item_key:
-                keys = [
-                    k
-                    for e in extracted.get(config.iter_item_key)
-                    for k in list(e.keys())
-                ]
-                class_name = "%sClass" % config.iter_item_key.capitalize()
-            else:
-                keys = list(extracted.keys())
-                class_name = "CustomClass"
-
-            if keys:
-                print(("keys:", set(keys)))
-                config.item_class = type(
-                    class_name,
-                    (Item,),
-                    dict([(k, Field()) for k in set(keys)]))
-
-    def _parse(self, response=None):
-        return self.parselet.parse(
-            StringIO.StringIO(response.body))
+            item_class = infer_item_class(self.parselet, config, extracted,
+                self.item_classes)
+            if item_class is not None:
+                config.item_class = item_class
 
     def iter_items(self, response=None):
-        extracted = self._parse(response or self.response)
+        extracted = self._parse(response)
 
         # generate Item classes based on Parsley structure
         self._generate_item_classes(extracted)
@@ -112,60 +231,41 @@ class ParsleyImplicitItemClassLoader(object):
                 #print extracted
                 for item_value in extracted.get(config.iter_item_key):
                     yield config.item_class(**item_value)
-        del extracted
 
-    def iter_requests(self, response=None, iter_request_key=None, get_url_function=None, request_callback=None):
+    def iter_requests(self, response=None, iter_request_key=None, get_url_function=None,
+                      request_callback=None, seen_urls=None):
 
-        extracted = self._parse(response or self.response)
+        response = response or self.response
+        extracted = self._parse(response)
 
         if get_url_function is None:
             get_url_function = lambda x: x
 
-        #pprint.pprint(self.extracted)
-        for request_info in extracted.get(iter_request_key):
-            yield Request(
-                url=urllib.parse.urljoin(
-                            response.url,
-                            get_url_function(request_info)),
-                callback=request_callback)
-        del extracted
+        # one request per URL
+        links = (get_url_function(request_info)
+                 for request_info in extracted.get(iter_request_key) or ())
+        for url in iter_urls(response.url, links, seen_urls):
+            yield Request(url=url, callback=request_callback)
 
 
-class ParsleyLoader(object):
+class ParsleyLoader(ParsleyExtractionCache):
     def __init__(self, parselet, response=None, **context):
         self.parselet = parselet
+        self.item_classes = parselet_item_classes(parselet)
         self.response = response
         self.extracted = None
         self.context = context
 
     def _infer_item_class(self, extracted, config):
-        if config.iter_item_key:
-            keys = [
-                k
-                for e in extracted.get(config.iter_item_key)
-                for k in list(e.keys())
-            ]
-            class_name = "%sClass" % config.iter_item_key.capitalize()
-        else:
-            keys = list(extracted.keys())
-            class_name = "CustomClass"
-
-        if keys:
-            return type(class_name,
-                        (Item,),
-                        dict([(k, Field()) for k in set(keys)]))
-
-    def _parse(self, response=None):
-        return self.parselet.parse(
-            StringIO.StringIO(response.body))
+        return infer_item_class(self.parselet, config, extracted,
+            self.item_classes)
 
     def iter_items(self, config, response=None):
 
         if not isinstance(config, ParsleyItemLoaderConfig):
             raise ValueError("You must provide a ParsleyItemLoaderConfig instance")
 
-        # FIXME: should this be cached?
-        extracted = self._parse(response or self.response)
+        extracted = self._parse(response)
 
         if not config.item_class:
             # generate Item classes based on Parsley structure
@@ -179,13 +279,12 @@ class ParsleyLoader(object):
         # FIXME: if item_loader_class is not None,
         #        we should use it
         if config.iter_item_key is None:
-            yield config.item_class(**extracted)
+            yield item_class(**extracted)
         else:
             itemdata = extracted.get(config.iter_item_key)
             if itemdata:
                 for item_value in itemdata:
-                    yield config.item_class(**item_value)
-        del extracted
+                    yield item_class(**item_value)
 
     def _load_item(self, data, config, **context):
         if config.item_loader_class:
@@ -200,16 +299,137 @@ class ParsleyLoader(object):
         if not isinstance(config, ParsleyRequestConfig):
             raise ValueError("You must provide a ParsleyRequestConfig instance")
 
-        # FIXME: should this be cached?
-        extracted = self._parse(response or self.response)
+        response = response or self.response
+        extracted = self._parse(response)
         reqdata = extracted.get(config.iter_request_key)
         if reqdata:
-            for request_data in reqdata:
-                nurl = urllib.parse.urljoin(
-                                response.url,
-                                config.url_getter(request_data))
-                if nurl:
-                    yield Request(
-                        url=nurl,
-                        callback=config.callback)
-        del extracted
+            # one request per URL
+            links = (config.url_getter(request_data) for request_data in reqdata)
+            for nurl in iter_urls(response.url, links, config.seen_urls):
+                yield Request(
+                    url=nurl,
+                    callback=config.callback)
+
+
+class ThreadedExtractor(object):
+    """
+    Run extractions in a bounded pool of threads,
+    off the Twisted reactor thread (which keeps handling downloads);
+    works with any reactor, including the asyncio reactor.
+
+    :meth:`extract` returns a Deferred firing with the extracted content,
+    that item pipelines can return and coroutine callbacks can await.
+    """
+
+    def __init__(self, max_threads=4, reactor=None):
+        from twisted.python.threadpool import ThreadPool
+
+        if reactor is None:
+            from twisted.internet import reactor
+        self.reactor = reactor
+        self.max_threads = max_threads
+        self.pool = ThreadPool(minthreads=0, maxthreads=max_threads,
+            name="parslepy-extraction")
+        self.pool.start()
+        self._shutdown_trigger = reactor.addSystemEventTrigger(
+            "during", "shutdown", self.stop)
+
+    def extract(self, parselet, response):
+        """
+        Return a Deferred firing with the content extracted
+        from a response with a Parselet (see :func:`extract_response`)
+        """
+
+        from twisted.internet import threads
+
+        return threads.deferToThreadPool(self.reactor, self.pool,
+            extract_response, parselet, response)
+
+    def stop(self):
+        if self.pool is not None:
+            self.pool.stop()
+            self.pool = None
+        if self._shutdown_trigger is not None:
+            try:
+                self.reactor.removeSystemEventTrigger(self._shutdown_trigger)
+            except (ValueError, KeyError):
+                # already fired
+                pass
+            self._shutdown_trigger = None
+
+
+class ParsleyExtractionPipeline(object):
+    """
+    Item pipeline extracting content in a thread pool.
+
+    Spiders with a `parselet` attribute yield ``{"response": response}``
+    dicts (or items with a "response" field); the pipeline replaces
+    the response by the content extracted from it, without blocking
+    the reactor. Other items are passed through.
+    For :class:`scrapy.item.Item` instances, only the extracted keys
+    declared as fields of the item are set; yield dicts to keep all keys.
+
+    Extractions in progress hold Scrapy's scraper slot, so that
+    downloads slow down when extraction cannot keep up
+    (see the ``CONCURRENT_ITEMS`` and ``SCRAPER_SLOT_MAX_ACTIVE_SIZE``
+    settings). The number of threads is the ``PARSLEPY_EXTRACTION_THREADS``
+    setting, defaulting to ``REACTOR_THREADPOOL_MAXSIZE``.
+
+    Enable it in the settings of a project::
+
+        ITEM_PIPELINES = {
+            "parslepy.utils.scrapytools.ParsleyExtractionPipeline": 100,
+        }
+    """
+
+    RESPONSE_FIELD = "response"
+
+    def __init__(self, max_threads=4, reactor=None):
+        self.max_threads = max_threads
+        self.reactor = reactor
+        self.extractor = None
+        self.crawler = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        pipeline = cls(max_threads=settings.getint("PARSLEPY_EXTRACTION_THREADS")
+                           or settings.getint("REACTOR_THREADPOOL_MAXSIZE", 10))
+        pipeline.crawler = crawler
+        return pipeline
+
+    # newer Scrapy versions no longer pass the spider to pipelines
+    def _spider(self, spider):
+        if spider is None and self.crawler is not None:
+            return self.crawler.spider
+        return spider
+
+    def open_spider(self, spider=None):
+        self.extractor = ThreadedExtractor(self.max_threads, self.reactor)
+
+    def close_spider(self, spider=None):
+        if self.extractor is not None:
+            self.extractor.stop()
+            self.extractor = None
+
+    def process_item(self, item, spider=None):
+        response = item.get(self.RESPONSE_FIELD)
+        if response is None:
+            return item
+        spider = self._spider(spider)
+
+        def extracted(content):
+            del item[self.RESPONSE_FIELD]
+            fields = getattr(item, "fields", None)
+            if fields is None:
+                item.update(content)
+            else:
+                # Item instances raise KeyError for undeclared fields
+                for key, value in content.items():
+                    if key in fields:
+                        item[key] = value
+            return item
+
+        d = self.extractor.extract(spider.parselet, response)
+        d.addCallback(extracted)
+        return d
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+URL helpers for turning extracted links into requests:
+joining many links with one base URL, canonical forms
+for deduplication, and a bounded Bloom filter to remember
+URLs across a whole crawl.
+
+>>> from parslepy.utils.urltools import iter_urls, BloomFilter
+>>> seen = BloomFilter(capacity=1000000)
+>>> list(iter_urls("http://example.com/news/", ["a.html", "/news/a.html#top", "b.html"], seen))
+['http://example.com/news/a.html', 'http://example.com/news/b.html']
+>>> list(iter_urls("http://example.com/", ["/news/b.html"], seen))
+[]
+"""
+
+from __future__ import unicode_literals
+import hashlib
+import math
+
+try:
+    from urllib.parse import urljoin, urlsplit, urlunsplit
+except ImportError:
+    from urlparse import urljoin, urlsplit, urlunsplit
+
+
+DEFAULT_PORTS = {"http": "80", "https": "443"}
+
+
+def canonicalize_url(url, keep_fragments=False):
+    """
+    Return a canonical form of an absolute URL, to compare URLs:
+    lowercase scheme and host, no default port, "/" for an empty path,
+    sorted query arguments and, unless `keep_fragments`, no fragment.
+
+    >>> canonicalize_url("HTTP://Example.COM:80?b=2&a=1#top")
+    'http://example.com/?a=1&b=2'
+    """
+
+    scheme, netloc, path, query, fragment = urlsplit(url)
+    scheme = scheme.lower()
+    userinfo, _, hostport = netloc.rpartition("@")
+    host, _, port = hostport.partition(":")
+    # IPv6 addresses
+    if hostport.startswith("["):
+        host, _, port = hostport.partition("]")
+        host += "]"
+        port = port[1:]
+    if port == DEFAULT_PORTS.get(scheme):
+        port = ""
+    netloc = "%s%s%s" % (userinfo + "@" if userinfo else "", host.lower(),
+                         ":" + port if port else "")
+    if not path and netloc:
+        path = "/"
+    if query:
+        query = "&".join(sorted(query.split("&")))
+    return urlunsplit((scheme, netloc, path, query,
+                       fragment if keep_fragments else ""))
+
+
+class URLJoiner(object):
+    """
+    Join many links with the same base URL.
+
+    The base URL is split once; absolute URLs and absolute paths
+    (the most common links) are resolved without going through
+    :func:`urllib.parse.urljoin`.
+    """
+
+    def __init__(self, base):
+        self.base = base
+        parts = urlsplit(base)
+        self.scheme = parts.scheme
+        self.origin = "%s://%s" % (parts.scheme, parts.netloc) if parts.netloc else None
+
+    def join(self, link):
+        link = link.strip()
+        if link.startswith(("http://", "https://")):
+            return link
+        if (    self.origin is not None
+            and link.startswith("/")
+            and not link.startswith("//")
+            and "/." not in link):
+            return self.origin + link
+        return urljoin(self.base, link)
+
+    def join_all(self, links):
+        """
+        Generate the absolute URL of each link
+        """
+
+        join = self.join
+        for link in links:
+            yield join(link)
+
+
+class BloomFilter(object):
+    """
+    Probabilistic set of strings with a fixed memory size:
+    tests for membership may give false positives (at about
+    `error_rate` while it holds up to `capacity` strings), never false negatives.
+
+    Once `capacity` strings were added, a new empty filter is started
+    and the previous one is still queried; older strings are then
+    forgotten, so that the false positive rate stays bounded
+    (memory use is at most twice the size for `capacity`).
+    """
+
+    def __init__(self, capacity=1000000, error_rate=0.001):
+        if capacity <= 0 or not 0 < error_rate < 1:
+            raise ValueError("invalid Bloom filter capacity or error rate")
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.bits = int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, int(round(self.bits / float(capacity) * math.log(2))))
+        self.current = bytearray((self.bits + 7) // 8)
+        self.previous = None
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def _positions(self, value):
+        # double hashing, from a single digest
+        digest = int(hashlib.md5(value.encode("utf-8")).hexdigest(), 16)
+        h1 = digest >> 64
+        h2 = (digest & 0xffffffffffffffff) | 1
+        bits = self.bits
+        return [(h1 + i * h2) % bits for i in range(self.hashes)]
+
+    @staticmethod
+    def _test(array, positions):
+        for position in positions:
+            if not array[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def __contains__(self, value):
+        positions = self._positions(value)
+        return self._test(self.current, positions) or (
+            self.previous is not None and self._test(self.previous, positions))
+
+    def add(self, value):
+        """
+        Add a string; return False if it was (probably) already there
+        """
+
+        positions = self._positions(value)
+        if self._test(self.current, positions) or (
+                self.previous is not None and self._test(self.previous, positions)):
+            return False
+        if self.count >= self.capacity:
+            self.previous = self.current
+            self.current = bytearray(len(self.current))
+            self.count = 0
+        current = self.current
+        for position in positions:
+            current[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+        return True
+
+
+def iter_urls(base, links, seen=None, canonicalize=True):
+    """
+    Generate the absolute URLs of `links` relative to `base`,
+    skipping empty links and duplicates: URLs with the same canonical
+    form (see :func:`canonicalize_url`) as an earlier URL, or already
+    in `seen`, a set-like object (e.g. a set or a :class:`BloomFilter`)
+    with `add()` and ``in``, updated with the canonical forms of new URLs.
+    """
+
+    joiner = URLJoiner(base)
+    generated = set()
+    for link in links:
+        if not link:
+            continue
+        url = joiner.join(link)
+        key = canonicalize_url(url) if canonicalize else url
+        if key in generated:
+            continue
+        generated.add(key)
+        if seen is not None:
+            if key in seen:
+                continue
+            seen.add(key)
+        yield url
@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+"""
+Read HTTP responses from WARC archives, to extract content
+from crawled pages without writing them to temporary files first.
+
+>>> from parslepy.batch import BatchExtractor
+>>> from parslepy.warc import iter_warc_documents
+>>> extractor = BatchExtractor(rules, workers=4)
+>>> with open("crawl.warc.gz", "rb") as fp:
+...     extractor.run(iter_warc_documents(fp), out)
+
+Archives are read in one pass, record by record; per-record gzip
+compression (``.warc.gz`` files) is supported.
+"""
+
+from __future__ import unicode_literals
+import gzip
+import re
+import zlib
+
+
+GZIP_MAGIC = b"\x1f\x8b"
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml")
+
+REGEX_CHARSET = re.compile(r"""charset\s*=\s*["']?([\w.:-]+)""", re.I)
+
+
+class InvalidWarcRecord(ValueError):
+    """
+    Raised when a WARC record header or an HTTP response
+    inside a record cannot be parsed
+    """
+    pass
+
+
+class WarcRecord(object):
+    """
+    A WARC record: version line, header fields (lower-cased names)
+    and content block as bytes
+    """
+
+    def __init__(self, version, headers, content):
+        self.version = version
+        self.headers = headers
+        self.content = content
+
+    @property
+    def type(self):
+        return self.headers.get("warc-type")
+
+    @property
+    def target_uri(self):
+        return self.headers.get("warc-target-uri")
+
+    def __repr__(self):
+        return "<WarcRecord %s %s>" % (self.type, self.target_uri)
+
+
+def _decode(line):
+    return line.decode("utf-8", "replace").strip()
+
+def _read_headers(fp):
+    """
+    Read "Name: value" lines until an empty line;
+    return a dict with lower-cased names
+    """
+
+    headers = {}
+    name = None
+    while True:
+        line = fp.readline()
+        if not line or not line.strip():
+            return headers
+        if line[:1] in (b" ", b"\t") and name is not None:
+            # continuation line
+            headers[name] += " " + _decode(line)
+            continue
+        name, sep, value = _decode(line).partition(":")
+        if not sep:
+            raise InvalidWarcRecord("invalid header line %r" % line)
+        name = name.strip().lower()
+        headers[name] = value.strip()
+
+def open_warc(fp):
+    """
+    Return a file object reading the uncompressed archive from `fp`.
+    gzip-compressed archives (one gzip member per record, or a single
+    member for the whole file) are detected by their first bytes.
+    """
+
+    if hasattr(fp, "peek"):
+        magic = fp.peek(2)[:2]
+    else:
+        magic = fp.read(2)
+        fp.seek(-len(magic), 1)
+    if magic == GZIP_MAGIC:
+        return gzip.GzipFile(fileobj=fp, mode="rb")
+    return fp
+
+def iter_warc_records(fp):
+    """
+    Generate :class:`WarcRecord` objects from a WARC file object
+    opened in binary mode (compressed or not)
+    """
+
+    fp = open_warc(fp)
+    while True:
+        line = fp.readline()
+        if not line:
+            return
+        if not line.strip():
+            # blank lines between records
+            continue
+        version = _decode(line)
+        if not version.startswith("WARC/"):
+            raise InvalidWarcRecord("expected WARC version line, got %r" % line)
+        headers = _read_headers(fp)
+        try:
+            length = int(headers["content-length"])
+        except (KeyError, ValueError):
+            raise InvalidWarcRecord("missing or invalid Content-Length")
+        content = fp.read(length)
+        if len(content) < length:
+            raise InvalidWarcRecord("truncated record for %s" % (
+                headers.get("warc-target-uri"),))
+        yield WarcRecord(version, headers, content)
+
+def _dechunk(body):
+    """
+    Decode a "Transfer-Encoding: chunked" HTTP body
+    """
+
+    chunks = []
+    pos = 0
+    while True:
+        eol = body.find(b"\r\n", pos)
+        if eol < 0:
+            break
+        try:
+            size = int(body[pos:eol].split(b";", 1)[0], 16)
+        except ValueError:
+            raise InvalidWarcRecord("invalid chunk size")
+        if size == 0:
+            break
+        chunks.append(body[eol + 2:eol + 2 + size])
+        pos = eol + 2 + size + 2
+    return b"".join(chunks)
+
+def _decompress(body, encoding):
+    if encoding in ("gzip", "x-gzip"):
+        return zlib.decompress(body, 16 + zlib.MAX_WBITS)
+    if encoding == "deflate":
+        try:
+            return zlib.decompress(body)
+        except zlib.error:
+            return zlib.decompress(body, -zlib.MAX_WBITS)
+    return body
+
+def parse_http_response(content):
+    """
+    Split an HTTP response, as stored in WARC "response" records,
+    into (status code, headers dict, body bytes).
+
+    Chunked transfer encoding and gzip/deflate content encoding
+    are decoded.
+    """
+
+    head, sep, body = content.partition(b"\r\n\r\n")
+    if not sep:
+        head, sep, body = content.partition(b"\n\n")
+    lines = head.splitlines()
+    if not lines or not lines[0].startswith(b"HTTP/"):
+        raise InvalidWarcRecord("not an HTTP response")
+    try:
+        status = int(lines[0].split()[1])
+    except (IndexError, ValueError):
+        raise InvalidWarcRecord("invalid HTTP status line %r" % lines[0])
+
+    headers = {}
+    for line in lines[1:]:
+        name, sep, value = _decode(line).partition(":")
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        body = _dechunk(body)
+    try:
+        body = _decompress(body,
+            headers.get("content-encoding", "").strip().lower())
+    except zlib.error:
+        raise InvalidWarcRecord("invalid compressed content")
+    return status, headers, body
+
+def content_charset(content_type):
+    """
+    Return the charset declared in a Content-Type header value, or None
+
+    >>> content_charset('text/html; charset="ISO-8859-1"')
+    'ISO-8859-1'
+    """
+
+    match = REGEX_CHARSET.search(content_type or "")
+    if match:
+        return match.group(1)
+
+def iter_warc_documents(fp, content_types=HTML_CONTENT_TYPES, statuses=(200,),
+                        skip_invalid=False):
+    """
+    Generate ``(URI, body bytes, charset)`` tuples for HTTP responses
+    in a WARC archive, as accepted by :class:`parslepy.batch.BatchExtractor`.
+
+    :param fp: WARC file object opened in binary mode
+    :param content_types: only keep responses with these media types
+        (``None`` keeps all responses)
+    :param statuses: only keep responses with these HTTP status codes
+        (``None`` keeps all responses)
+    :param boolean skip_invalid: skip response records that do not contain
+        a valid HTTP response, instead of raising :class:`InvalidWarcRecord`
+    """
+
+    for record in iter_warc_records(fp):
+        if record.type != "response":
+            continue
+        try:
+            status, headers, body = parse_http_response(record.content)
+        except InvalidWarcRecord:
+            if skip_invalid:
+                continue
+            raise
+        if statuses is not None and status not in statuses:
+            continue
+        content_type = headers.get("content-type", "")
+        media_type = content_type.split(";", 1)[0].strip().lower()
+        if content_types is not None and media_type not in content_types:
+            continue
+        yield record.target_uri, body, content_charset(content_type)
+
+def iter_warc_files(paths, **kwargs):
+    """
+    Chain :func:`iter_warc_documents` over several WARC files given by path;
+    keyword arguments are passed to :func:`iter_warc_documents`
+    """
+
+    for path in paths:
+        with open(path, "rb") as fp:
+            for document in iter_warc_documents(fp, **kwargs):
+                yield document
@@ -3,32 +3,103 @@
 
 import optparse
 import pprint
+import sys
 import parslepy
-import lxml.html
+import parslepy.batch
+import parslepy.budgets
+import parslepy.serializers
+import parslepy.warc
 
 def main():
 
-    parser = optparse.OptionParser()
+    parser = optparse.OptionParser(
+        usage="%prog --script SCRIPT (--url URL | --file FILE)\n"
+              "       %prog --script SCRIPT --batch [--workers N] "
+              "[--output FILE] [--warc] INPUT...")
     parser.add_option("--debug", dest="debug", action="store_true", help="debug mode", default=False)
     parser.add_option("--url", dest="url", help="fetch this URL", default=None)
     parser.add_option("--file", dest="inputfile", help="parse this HTML file", default=None)
     parser.add_option("--script", dest="parselet", help="Parsley script filename", default=None)
+    parser.add_option("--batch", dest="batch", action="store_true", default=False,
+        help="process all INPUT arguments (files, directories, glob patterns, "
+             "or - to read paths from standard input) "
+             "and write one JSON object per line")
+    parser.add_option("--workers", dest="workers", type="int", default=1,
+        help="number of worker processes in batch mode")
+    parser.add_option("--output", dest="output", default=None,
+        help="write JSON lines to this file in batch mode (default: standard output)")
+    parser.add_option("--xml", dest="xml", action="store_true", default=False,
+        help="parse documents as XML in batch mode")
+    parser.add_option("--format", dest="format", default="jsonlines",
+        choices=sorted(parslepy.serializers.FORMATS),
+        help="output format in batch mode: jsonlines (default), msgpack or csv")
+    parser.add_option("--prune", dest="prune", action="store_true", default=False,
+        help="remove scripts, styles, SVG images and comments "
+             "that the script does not select before extracting, in batch mode")
+    parser.add_option("--max-bytes", dest="max_bytes", type="int", default=None,
+        help="skip documents larger than this many bytes in batch mode")
+    parser.add_option("--max-nodes", dest="max_nodes", type="int", default=None,
+        help="skip documents with more nodes than this in batch mode")
+    parser.add_option("--timeout", dest="timeout", type="float", default=None,
+        help="abort extraction from a document after this many seconds "
+             "in batch mode, keeping the partial result")
+    parser.add_option("--warc", dest="warc", action="store_true", default=False,
+        help="INPUT arguments are WARC archives (optionally gzip-compressed); "
+             "extract content from their HTML responses in batch mode")
 
     (options, args) = parser.parse_args()
 
     if not options.parselet:
         print("You must provide a Parsley script")
         return
+
+    if options.batch:
+        return run_batch(options, args)
+
     if not options.url and not options.inputfile:
         print("You must provide an URL")
         return
 
     with open(options.parselet) as fp:
 
-        extractor = parslepy.Parselet.from_jsonfile(fp, options.debug)
+        extractor = parslepy.Parselet.from_jsonfile(fp, debug=options.debug)
         output = extractor.parse(options.url or options.inputfile)
         pprint.pprint(output)
 
-if __name__ == '__main__':
-	main()
+def run_batch(options, inputs):
 
+    if not inputs:
+        print("You must provide files, directories or glob patterns to process")
+        return 1
+
+    with open(options.parselet) as fp:
+        rules = parslepy.Parselet.from_jsonfile(fp).parselet
+
+    budget = None
+    if options.max_bytes or options.max_nodes or options.timeout:
+        budget = parslepy.budgets.Budget(max_input_bytes=options.max_bytes,
+            max_nodes=options.max_nodes, timeout=options.timeout)
+    extractor = parslepy.batch.BatchExtractor(rules,
+        xml=options.xml, workers=options.workers, prune=options.prune,
+        budget=budget)
+    binary = parslepy.serializers.FORMATS[options.format].binary
+    if options.output:
+        out = open(options.output, "wb" if binary else "w")
+    elif binary:
+        out = getattr(sys.stdout, "buffer", sys.stdout)
+    else:
+        out = sys.stdout
+    try:
+        items = parslepy.batch.iter_paths(inputs)
+        if options.warc:
+            items = parslepy.warc.iter_warc_files(items, skip_invalid=True)
+        stats = extractor.run(items, out, format=options.format)
+    finally:
+        if options.output:
+            out.close()
+
+    sys.stderr.write(stats.summary() + "\n")
+    return 1 if stats.errors else 0
+
+if __name__ == '__main__':
+	sys.exit(main())
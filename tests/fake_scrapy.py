@@ -0,0 +1,95 @@
+"""
+Minimal stand-ins for the parts of Scrapy used by
+parslepy.utils.scrapytools, so that its tests run without Scrapy.
+They are only installed (in sys.modules) if Scrapy cannot be imported.
+"""
+
+import sys
+import types
+
+
+class Field(dict):
+    pass
+
+
+class BaseItem(dict):
+    """
+    Like scrapy.item.Item: only declared fields can be set
+    """
+
+    fields = {}
+
+    def __init__(self, *args, **kwargs):
+        super(BaseItem, self).__init__()
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def __setitem__(self, key, value):
+        if key not in self.fields:
+            raise KeyError("%s does not support field: %s" % (
+                self.__class__.__name__, key))
+        super(BaseItem, self).__setitem__(key, value)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+
+class ItemMeta(type):
+    def __new__(mcs, name, bases, attrs):
+        fields = {}
+        for base in bases:
+            fields.update(getattr(base, "fields", {}))
+        fields.update((k, v) for k, v in attrs.items() if isinstance(v, Field))
+        attrs["fields"] = fields
+        return super(ItemMeta, mcs).__new__(mcs, name, bases, attrs)
+
+# Python 2 and 3 compatible metaclass use
+Item = ItemMeta(str("Item"), (BaseItem,), {})
+
+
+class ItemLoader(object):
+    def __init__(self, item=None, **context):
+        self.item = item
+        self.context = context
+
+    def add_value(self, field_name, value):
+        if field_name is None:
+            self.item.update(value)
+        else:
+            self.item[field_name] = value
+
+    def load_item(self):
+        return self.item
+
+
+class Request(object):
+    def __init__(self, url, callback=None):
+        self.url = url
+        self.callback = callback
+
+
+def install():
+    """
+    Register the fake "scrapy" package if Scrapy is not installed
+    """
+
+    try:
+        import scrapy.item
+        return
+    except ImportError:
+        pass
+    modules = {
+        "scrapy": {},
+        "scrapy.item": {"Item": Item, "Field": Field},
+        "scrapy.loader": {"ItemLoader": ItemLoader},
+        "scrapy.http": {"Request": Request},
+    }
+    for name, attributes in modules.items():
+        module = types.ModuleType(str(name))
+        module.__dict__.update(attributes)
+        sys.modules[name] = module
+    for name in modules:
+        if "." in name:
+            package, _, attribute = name.rpartition(".")
+            setattr(sys.modules[package], attribute, sys.modules[name])
@@ -0,0 +1,82 @@
+from __future__ import unicode_literals
+from parslepy.batch import BatchExtractor, iter_paths
+from nose.tools import *
+from .tools import *
+import io
+import json
+import os
+import shutil
+import tempfile
+
+dirname = os.path.dirname(os.path.abspath(__file__))
+
+rules = {"title": "title", "heading?": "h1"}
+
+class TestBatch(object):
+
+    def setup(self):
+        self.tmpdir = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.tmpdir, "sub"))
+        for i, path in enumerate(("a.html", "b.html", "sub/c.html")):
+            with open(os.path.join(self.tmpdir, path), "w") as fp:
+                fp.write("<html><head><title>Page %d</title></head></html>" % i)
+        with open(os.path.join(self.tmpdir, "notes.txt"), "w") as fp:
+            fp.write("not html")
+
+    def teardown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_iter_paths(self):
+        paths = list(iter_paths([self.tmpdir]))
+        assert_equal([os.path.relpath(p, self.tmpdir) for p in paths],
+            ["a.html", "b.html", "notes.txt", os.path.join("sub", "c.html")])
+
+        paths = list(iter_paths([os.path.join(self.tmpdir, "*.html"), "other.html"]))
+        assert_equal([os.path.basename(p) for p in paths],
+            ["a.html", "b.html", "other.html"])
+
+        stdin = io.StringIO("x.html\n\ny.html\n")
+        assert_equal(list(iter_paths(["-"], stdin=stdin)), ["x.html", "y.html"])
+
+    def check_run(self, workers):
+        extractor = BatchExtractor(rules, workers=workers)
+        out = io.StringIO()
+        paths = list(iter_paths([os.path.join(self.tmpdir, "*.html")]))
+        stats = extractor.run(paths + [os.path.join(self.tmpdir, "missing.html")], out)
+
+        records = [json.loads(l) for l in out.getvalue().splitlines()]
+        results = sorted((os.path.basename(r["source"]), r.get("result"))
+                         for r in records if "result" in r)
+        assert_equal(results, [
+            ("a.html", {"title": "Page 0"}),
+            ("b.html", {"title": "Page 1"}),
+        ])
+        errors = [r for r in records if "error" in r]
+        assert_equal(len(errors), 1)
+        assert_true(errors[0]["source"].endswith("missing.html"))
+
+        assert_equal(stats.documents, 3)
+        assert_equal(stats.errors, 1)
+        assert_in("3 documents", stats.summary())
+
+    def test_run(self):
+        self.check_run(workers=1)
+
+    def test_run_parallel(self):
+        self.check_run(workers=2)
+
+def test_bytes_items():
+    extractor = BatchExtractor(rules)
+    items = [
+        ("doc1", "<html><head><title>caf\xe9</title></head></html>".encode("latin-1"), "latin-1"),
+        ("doc2", b"<html><body><h1>Hello</h1></body></html>", None),
+    ]
+    records = dict((r["source"], r) for r in extractor.iter_results(items))
+    assert_equal(records["doc1"]["result"], {"title": "caf\xe9"})
+    assert_equal(records["doc2"]["result"], {"heading": "Hello"})
+
+def test_strict_errors():
+    extractor = BatchExtractor({"subtitle": "h2"}, strict=True)
+    records = list(extractor.iter_results([("doc", b"<html><h1>x</h1></html>", None)]))
+    assert_true(records[0]["error"].startswith("NonMatchingNonOptionalKey"))
+    assert_equal(extractor.stats.error_types, {"NonMatchingNonOptionalKey": 1})
@@ -0,0 +1,153 @@
+from __future__ import unicode_literals
+import parslepy
+from parslepy.budgets import Budget, BudgetExceeded
+from parslepy.metrics import MetricsRegistry
+from parslepy.records import Record
+from nose.tools import *
+from .tools import *
+import io
+import os
+import tempfile
+
+html = news_html(3, after="<p>The end</p>")
+
+rules = {
+    "title": "h1",
+    "news(li.newsitem)": [{"title": "a", "url": "a @href"}],
+    "footer": "p",
+}
+
+def check_exceeded(budget, limit, partial=None, **kwargs):
+    parselet = parslepy.Parselet(rules, budget=budget, **kwargs)
+    try:
+        parselet.parse_fromstring(html)
+    except BudgetExceeded as e:
+        assert_equal(e.limit, limit)
+        assert_equal(e.partial, partial)
+        return e
+    raise AssertionError("%s budget not exceeded" % limit)
+
+def test_within_budget():
+    budget = Budget(max_input_bytes=10000, max_nodes=1000, max_items=10,
+        max_output_size=1000, timeout=60)
+    parselet = parslepy.Parselet(rules, budget=budget)
+    assert_dict_equal(parselet.parse_fromstring(html),
+        parslepy.Parselet(rules).parse_fromstring(html))
+
+def test_input_size():
+    check_exceeded(Budget(max_input_bytes=100), "max_input_bytes")
+
+    parselet = parslepy.Parselet(rules, budget=Budget(max_input_bytes=100))
+    fd, path = tempfile.mkstemp(suffix=".html")
+    try:
+        with os.fdopen(fd, "w") as fp:
+            fp.write(html)
+        assert_raises(BudgetExceeded, parselet.parse, path)
+    finally:
+        os.remove(path)
+    # unknown size
+    assert_equal(parselet.parse(io.BytesIO(html.encode("utf-8")))["title"], "What's new")
+
+def test_nodes():
+    e = check_exceeded(Budget(max_nodes=10), "max_nodes")
+    assert_equal(e.maximum, 10)
+
+def test_items():
+    check_exceeded(Budget(max_items=2), "max_items", {"title": "What's new"})
+
+def test_output_size():
+    # fails on the second item's URL
+    len_before = len("What's new") + len("This is the first article") \
+        + len("/article-001.html") + len("A second report on something")
+    e = check_exceeded(Budget(max_output_size=len_before), "max_output_size", {
+        "title": "What's new",
+        "news": [
+            {"title": "This is the first article", "url": "/article-001.html"},
+            {"title": "A second report on something"},
+        ],
+    }, optimize=False)
+    assert_true(e.value > len_before)
+
+def test_output_size_memoized_selectors():
+    # the same document-rooted result is copied into every item
+    links = len("This is the first article") + len("A second report on something") \
+        + len("Python is great!")
+    rules = {"news(li.newsitem)": [{"all": ["//a"]}]}
+    parselet = parslepy.Parselet(rules,
+        budget=Budget(max_output_size=links * 2))
+    assert_raises(BudgetExceeded, parselet.parse_fromstring, html)
+    parselet = parslepy.Parselet(rules,
+        budget=Budget(max_output_size=links * 3))
+    assert_equal(len(parselet.parse_fromstring(html)["news"]), 3)
+
+def test_partial_without_empty_items():
+    # fails on the first key of the third item
+    size = len("What's new") + len("This is the first article") \
+        + len("/article-001.html") + len("A second report on something") \
+        + len("/article-002.html")
+    rules = {"news(li.newsitem)": [{"title": "a", "url": "a @href"}]}
+    parselet = parslepy.Parselet(dict(rules, title="h1"),
+        budget=Budget(max_output_size=size, partial=True), optimize=False)
+    news = parselet.parse_fromstring(html)["news"]
+    assert_equal(len(news), 2)
+    assert_true(all(news))
+
+def test_partial_records():
+    len_before = len("What's new") + len("This is the first article") \
+        + len("/article-001.html") + len("A second report on something")
+    parselet = parslepy.Parselet(rules, records=True, optimize=False,
+        budget=Budget(max_output_size=len_before, partial=True))
+    extracted = parselet.parse_fromstring(html)
+    assert_is_instance(extracted, Record)
+    assert_true(all(isinstance(item, Record) for item in extracted["news"]))
+    assert_equal(extracted, {
+        "title": "What's new",
+        "news": [
+            {"title": "This is the first article", "url": "/article-001.html"},
+            {"title": "A second report on something"},
+        ],
+    })
+
+def test_timeout():
+    e = check_exceeded(Budget(timeout=-1), "timeout", {})
+    # time spent, not the limit
+    assert_true(e.value.endswith("s"), e.value)
+    assert_true(0 <= float(e.value[:-1]) < 60, e.value)
+    assert_equal(e.maximum, -1)
+    assert_equal(str(e), "timeout budget exceeded: %s > -1" % e.value)
+
+def test_items_without_scope():
+    links = {"title": "h1", "links": ["li a @href"]}
+    parselet = parslepy.Parselet(links, budget=Budget(max_items=2))
+    try:
+        parselet.parse_fromstring(html)
+        raise AssertionError("max_items budget not exceeded")
+    except BudgetExceeded as e:
+        assert_equal(e.limit, "max_items")
+        assert_equal(e.value, 3)
+        # the over-limit list is not in the partial output
+        assert_equal(e.partial, {"title": "What's new"})
+    # not iterated: only the first value is kept
+    parselet = parslepy.Parselet({"link": "li a @href"}, budget=Budget(max_items=2))
+    assert_equal(parselet.parse_fromstring(html), {"link": "/article-001.html"})
+
+def test_partial_results():
+    parselet = parslepy.Parselet(rules, budget=Budget(max_items=2, partial=True))
+    assert_equal(parselet.parse_fromstring(html), {"title": "What's new"})
+
+def test_metrics():
+    registry = MetricsRegistry()
+    parselet = parslepy.Parselet(rules, budget=Budget(max_items=1, max_input_bytes=len(html)),
+        metrics=registry)
+    assert_raises(BudgetExceeded, parselet.parse_fromstring, html)
+    assert_raises(BudgetExceeded, parselet.parse_fromstring, html * 2)
+    assert_equal(registry.budgets_exceeded.value("max_items"), 1)
+    assert_equal(registry.budgets_exceeded.value("max_input_bytes"), 1)
+
+def test_batch_budget():
+    from parslepy.batch import BatchExtractor
+    extractor = BatchExtractor(rules, budget=Budget(max_items=2))
+    records = list(extractor.iter_results([("doc", html.encode("utf-8"), "utf-8")]))
+    assert_equal(records[0]["result"], {"title": "What's new"})
+    assert_true(records[0]["error"].startswith("BudgetExceeded: max_items"))
+    assert_equal(extractor.stats.error_types, {"BudgetExceeded": 1})
@@ -0,0 +1,117 @@
+from __future__ import unicode_literals
+import parslepy
+from parslepy.columnar import ColumnarCollector
+from nose.tools import *
+from nose.plugins.skip import SkipTest
+from .tools import *
+import math
+
+html = """
+<html>
+<head><title>Catalog</title></head>
+<body>
+<div id="catalog">
+<div class="product">
+    <h2>Pen</h2><span class="price">1.50</span>
+    <div class="details"><span class="color">blue</span></div>
+    <ul><li>office</li><li>school</li></ul>
+</div>
+<div class="product">
+    <h2>Pencil</h2><span class="price">n/a</span>
+    <ul><li>school</li></ul>
+</div>
+<div class="product">
+    <h2>Eraser</h2>
+    <div class="details"><span class="color">white</span></div>
+</div>
+</div>
+</body>
+</html>
+"""
+
+rules = {
+    "title": "title",
+    "catalog(#catalog)": {
+        "products(div.product)": [{
+            "name": "h2",
+            "price?": "span.price",
+            "details(div.details)": {"color": "span.color"},
+            "--(.)": {"heading": "//title"},
+            "tags": ["li"],
+        }],
+    },
+}
+
+def test_columns():
+    parselet = parslepy.Parselet(rules)
+    collector = ColumnarCollector(parselet, "catalog/products",
+        numeric=["price"], source_column="page")
+    assert_equal(collector.columns_names(),
+        ["details/color", "heading", "name", "price", "tags", "page"])
+
+    assert_equal(collector.parse_fromstring(html, source="doc1"), 3)
+    assert_equal(collector.parse_fromstring(html, source="doc2"), 3)
+    assert_equal(len(collector), 6)
+
+    columns = collector.columns
+    assert_equal(columns["name"], ["Pen", "Pencil", "Eraser"] * 2)
+    assert_equal(columns["details/color"], ["blue", None, "white"] * 2)
+    assert_equal(columns["heading"], ["Catalog"] * 6)
+    assert_equal(columns["tags"], [["office", "school"], ["school"], None] * 2)
+    assert_equal(columns["page"], ["doc1"] * 3 + ["doc2"] * 3)
+    assert_equal(columns["price"].typecode, "d")
+    assert_equal(columns["price"][0], 1.5)
+    assert_true(math.isnan(columns["price"][1]))
+    assert_true(math.isnan(columns["price"][2]))
+
+    collector.clear()
+    assert_equal(len(collector), 0)
+    assert_equal(columns["name"], ["Pen", "Pencil", "Eraser"] * 2)
+    assert_equal(collector.columns["name"], [])
+
+def test_same_values_as_extract():
+    parselet = parslepy.Parselet(rules)
+    products = parselet.parse_fromstring(html)["catalog"]["products"]
+    collector = ColumnarCollector(parselet, "catalog/products")
+    collector.parse_fromstring(html)
+    assert_equal(collector.columns["name"], [p["name"] for p in products])
+    assert_equal(collector.columns["price"], [p.get("price") for p in products])
+    assert_equal(collector.columns["tags"], [p.get("tags") for p in products])
+
+def test_no_items():
+    collector = ColumnarCollector(parslepy.Parselet(rules), "catalog/products")
+    assert_equal(collector.parse_fromstring("<html><body></body></html>"), 0)
+    assert_equal(collector.columns["name"], [])
+
+def test_invalid_paths():
+    parselet = parslepy.Parselet(rules)
+    for path in ("title", "catalog", "missing", "catalog/missing"):
+        assert_raises(ValueError, ColumnarCollector, parselet, path)
+    assert_raises(ValueError, ColumnarCollector, parselet, "catalog/products",
+        numeric=["weight"])
+    assert_raises(ValueError, ColumnarCollector, parselet, "catalog/products",
+        source_column="name")
+
+def test_to_numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise SkipTest("numpy not installed")
+    collector = ColumnarCollector(parslepy.Parselet(rules), "catalog/products",
+        numeric=["price"])
+    collector.parse_fromstring(html)
+    arrays = collector.to_numpy()
+    assert_equal(arrays["price"].dtype, numpy.float64)
+    assert_equal(list(arrays["name"]), ["Pen", "Pencil", "Eraser"])
+
+def test_to_arrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise SkipTest("pyarrow not installed")
+    collector = ColumnarCollector(parslepy.Parselet(rules), "catalog/products",
+        numeric=["price"])
+    collector.parse_fromstring(html)
+    table = collector.to_arrow()
+    assert_equal(table.num_rows, 3)
+    assert_equal(table.column("name").to_pylist(), ["Pen", "Pencil", "Eraser"])
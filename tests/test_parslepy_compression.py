@@ -0,0 +1,100 @@
+from __future__ import unicode_literals
+import parslepy
+from parslepy.compression import decompressing_reader, detect_compression, \
+    feed_parser, GZIP, BZIP2, XZ, ZSTD
+import parslepy.compression
+from nose.tools import *
+from nose.plugins.skip import SkipTest
+from .tools import *
+import bz2
+import gzip
+import io
+import os
+import shutil
+import tempfile
+import lxml.etree
+
+html = news_html().encode("utf-8")
+
+rules = {
+    "title": "title",
+    "news(li.newsitem)": [{"url": "a @href"}],
+}
+
+expected = {
+    "title": "Sample document to test parslepy",
+    "news": [{"url": "/article-001.html"}, {"url": "/article-002.html"}],
+}
+
+def gzip_compress(data):
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode="wb") as fp:
+        fp.write(data)
+    return buf.getvalue()
+
+class UnseekableStream(object):
+    """A file object that can only read"""
+
+    def __init__(self, data):
+        self.fp = io.BytesIO(data)
+
+    def read(self, size=-1):
+        return self.fp.read(size)
+
+
+def test_detect_compression():
+    assert_equal(detect_compression(gzip_compress(html)), GZIP)
+    assert_equal(detect_compression(bz2.compress(html)), BZIP2)
+    assert_equal(detect_compression(b"\xfd7zXZ\x00\x00"), XZ)
+    assert_equal(detect_compression(b"\x28\xb5\x2f\xfd\x00"), ZSTD)
+    assert_equal(detect_compression(html), None)
+    assert_equal(detect_compression("<html>"), None)
+
+def test_decompressing_reader():
+    for fp in (io.BytesIO(gzip_compress(html)), io.BufferedReader(io.BytesIO(gzip_compress(html))),
+               UnseekableStream(gzip_compress(html))):
+        stream, compression = decompressing_reader(fp)
+        assert_equal(compression, GZIP)
+        assert_equal(stream.read(), html)
+
+    stream, compression = decompressing_reader(UnseekableStream(html))
+    assert_equal(compression, None)
+    assert_equal(stream.read(3), html[:3])
+    assert_equal(stream.read(), html[3:])
+
+def test_feed_parser():
+    root = feed_parser(lxml.etree.HTMLParser(), io.BytesIO(html), chunk_size=16)
+    assert_equal(root.findtext(".//title"), "Sample document to test parslepy")
+
+def test_parse_compressed_streams():
+    parselet = parslepy.Parselet(rules)
+    for data in (html, gzip_compress(html), bz2.compress(html)):
+        assert_dict_equal(parselet.parse(io.BytesIO(data)), expected)
+        assert_dict_equal(parselet.parse(UnseekableStream(data)), expected)
+
+def test_parse_compressed_file():
+    tmpdir = tempfile.mkdtemp()
+    try:
+        for name, data in (("page.html", html), ("page.html.gz", gzip_compress(html))):
+            path = os.path.join(tmpdir, name)
+            with open(path, "wb") as fp:
+                fp.write(data)
+            assert_dict_equal(parslepy.Parselet(rules).parse(path), expected)
+            with open(path, "rb") as fp:
+                assert_dict_equal(parslepy.Parselet(rules).parse(fp), expected)
+    finally:
+        shutil.rmtree(tmpdir)
+
+def test_parse_xz():
+    if parslepy.compression.lzma is None:
+        raise SkipTest("lzma not available")
+    data = parslepy.compression.lzma.compress(html)
+    assert_dict_equal(parslepy.Parselet(rules).parse(io.BytesIO(data)), expected)
+
+def test_parse_zstd():
+    if parslepy.compression.zstandard is None:
+        assert_raises(RuntimeError, parslepy.Parselet(rules).parse,
+            io.BytesIO(b"\x28\xb5\x2f\xfd\x00\x00"))
+        raise SkipTest("zstandard not installed")
+    data = parslepy.compression.zstandard.ZstdCompressor().compress(html)
+    assert_dict_equal(parslepy.Parselet(rules).parse(io.BytesIO(data)), expected)
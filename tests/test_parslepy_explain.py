@@ -0,0 +1,97 @@
+from __future__ import unicode_literals
+import parslepy
+import parslepy.selectors
+from parslepy.selectors import xpath_scan
+from nose.tools import *
+from .tools import *
+
+def test_xpath_scan():
+    expressions = (
+        ("//h1", parslepy.selectors.SCAN_DOCUMENT_DESCENDANTS),
+        ("parslepy:text(//h1)", parslepy.selectors.SCAN_DOCUMENT_DESCENDANTS),
+        ("a | //b", parslepy.selectors.SCAN_DOCUMENT_DESCENDANTS),
+        ("/html/body/h1", parslepy.selectors.SCAN_DOCUMENT),
+        (".//a", parslepy.selectors.SCAN_DESCENDANTS),
+        ("descendant-or-self::li/a", parslepy.selectors.SCAN_DESCENDANTS),
+        ("a[contains(@href, '/x')]", parslepy.selectors.SCAN_CHILDREN),
+        ("a/@href", parslepy.selectors.SCAN_CHILDREN),
+        (".", parslepy.selectors.SCAN_CHILDREN),
+    )
+    for expression, expected in expressions:
+        assert_equal(xpath_scan(expression), expected, expression)
+
+def test_explain_selectors():
+    parselet = parslepy.Parselet({
+        "title": "h1.explaintest",
+        "links": ["//a[@class='explaintest']/@href"],
+    })
+    entries = dict((e["key"], e) for e in parselet.explain())
+
+    title = entries["title"]["selector"]
+    assert_equal(title["selector"], "h1.explaintest")
+    assert_equal(title["kind"], "css")
+    assert_true(title["xpath"].startswith("descendant-or-self::h1"))
+    assert_false(title["smart_strings"])
+    assert_false(title["cached"])
+
+    links = entries["links"]
+    assert_true(links["iterate"])
+    assert_equal(links["selector"]["kind"], "xpath")
+    assert_equal(links["selector"]["xpath"], "//a[@class='explaintest']/@href")
+    assert_equal(links["warnings"], [])
+
+def test_explain_cached_selector():
+    parslepy.Parselet({"title": "h2.explaincached"})
+    parselet = parslepy.Parselet({"title": "h2.explaincached"})
+    assert_true(parselet.explain()[0]["selector"]["cached"])
+
+def test_explain_smart_strings():
+    parselet = parslepy.Parselet({"names": ["parslepy:attrname(//img/@*)"]})
+    assert_true(parselet.explain()[0]["selector"]["smart_strings"])
+
+def test_explain_warnings():
+    parselet = parslepy.Parselet({
+        "news(li.newsitem)": [{
+            "title": "//h1",
+            "url": "a @href",
+            "link": "a @href",
+        }],
+        "--(#a)": {"--(#b)": {"--(#c)": {"--(#d)": {"deep": "."}}}},
+    }, optimize=False)
+    entries = dict((e["key"], e) for e in parselet.explain())
+
+    news = entries["news"]
+    assert_equal(news["warnings"], [])
+    children = dict((c["key"], c) for c in news["children"])
+    assert_equal(len(children["title"]["warnings"]), 1)
+    assert_in("document-rooted selector //h1", children["title"]["warnings"][0])
+    assert_in("scans all descendants", children["url"]["warnings"][0])
+    assert_true(any("duplicate selector a @href" in w
+                    for w in children["link"]["warnings"]))
+
+    # cost is multiplied for children of iterated scopes
+    assert_true(children["title"]["cost"] > children["url"]["cost"])
+    assert_equal(news["cost"], news["children"][0]["cost"]
+        + news["children"][1]["cost"] + news["children"][2]["cost"]
+        + parselet.SCAN_COSTS[news["scope"]["scan"]])
+
+    deepest = entries["--"]
+    for i in range(3):
+        deepest = deepest["children"][0]
+    assert_in("scope nested 4 levels deep", deepest["warnings"][0])
+
+def test_explain_per_document_selector():
+    parselet = parslepy.Parselet({"news(li.newsitem)": [{"title": "//h1"}]})
+    title = parselet.explain()[0]["children"][0]
+    assert_true(title["selector"]["per_document"])
+    assert_equal(title["warnings"], [])
+
+def test_explain_custom_selector_handler():
+    class MyHandler(parslepy.selectors.SelectorHandler):
+        def make(self, selection):
+            return parslepy.selectors.Selector(selection)
+
+    parselet = parslepy.Parselet({"title": "h1"}, selector_handler=MyHandler())
+    entry = parselet.explain()[0]
+    assert_equal(entry["selector"]["xpath"], None)
+    assert_equal(entry["cost"], 1)
@@ -0,0 +1,83 @@
+from __future__ import unicode_literals
+from nose.tools import *
+from .tools import *
+from nose import SkipTest
+import os
+import subprocess
+import sys
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def imported_modules(code):
+    """
+    Run `code` in a new interpreter with ``-X importtime``;
+    return the names of the modules it imported and their
+    cumulative import times in microseconds
+    """
+
+    if sys.version_info < (3, 7):
+        raise SkipTest("-X importtime and lazy attributes need Python 3.7+")
+    env = dict(os.environ, PYTHONPATH=root)
+    process = subprocess.Popen([sys.executable, "-X", "importtime", "-c", code],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env, cwd=root)
+    out, err = process.communicate()
+    assert_equal(process.returncode, 0, err)
+    modules = {}
+    for line in err.decode("utf-8").splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        try:
+            modules[name.strip()] = int(cumulative)
+        except ValueError:
+            # header line
+            continue
+    return modules
+
+def test_import_parslepy_is_lazy():
+    modules = imported_modules("import parslepy")
+    assert_in("parslepy", modules)
+    for name in ("parslepy.base", "parslepy.selectors", "lxml.etree",
+                 "lxml.cssselect", "cssselect"):
+        assert_not_in(name, modules)
+
+def test_import_base_defers_cssselect():
+    modules = imported_modules("import parslepy.base")
+    assert_in("parslepy.selectors", modules)
+    assert_not_in("lxml.cssselect", modules)
+    assert_not_in("cssselect", modules)
+
+def test_parselet_defers_optional_features():
+    # compression, tracing, records, budgets and pruning
+    # are only imported when used (bz2, gzip... are already
+    # imported by site and lxml, they are not checked)
+    optional = ("parslepy.compression", "parslepy.tracing", "parslepy.records",
+                "parslepy.budgets", "parslepy.pruning")
+    modules = imported_modules(
+        "import parslepy.base; "
+        "parslepy.base.Parselet({'title': 'h1'}).parse_fromstring('<h1>x</h1>')")
+    for name in optional:
+        assert_not_in(name, modules)
+
+    modules = imported_modules(
+        "import io, parslepy.base; "
+        "parslepy.base.Parselet({'title': 'h1'}, debug=True, records=True, prune=True)"
+        ".parse(io.BytesIO(b'<h1>x</h1>'))")
+    for name in ("parslepy.compression", "parslepy.tracing", "parslepy.records",
+                 "parslepy.pruning"):
+        assert_in(name, modules)
+
+def test_lazy_attributes():
+    modules = imported_modules(
+        "import parslepy; parslepy.Parselet({'title': 'h1'}); parslepy.XPathSelectorHandler")
+    # modules loaded with importlib.import_module() are not reported
+    # themselves by -X importtime, only their own imports
+    assert_in("parslepy.selectors", modules)
+    assert_in("cssselect", modules)
+
+def test_xpath_parselet_defers_cssselect():
+    # the CSS translator is only needed for selectors that can be CSS
+    modules = imported_modules(
+        "import parslepy; parslepy.Parselet({'title': 'h1'}, "
+        "selector_handler=parslepy.XPathSelectorHandler())")
+    assert_not_in("cssselect", modules)
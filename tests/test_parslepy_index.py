@@ -0,0 +1,108 @@
+from __future__ import unicode_literals
+import parslepy
+from parslepy.index import DocumentIndex, IndexedSelectorHandler, \
+    IndexedSelector, parse_simple_selector
+from nose.tools import *
+from .tools import *
+import os
+import lxml.etree
+
+dirname = os.path.dirname(os.path.abspath(__file__))
+
+html = """
+<html>
+<head><title>Sample document to test parslepy</title></head>
+<body>
+<!-- a comment -->
+<h1 id="main" class="title big">What's new</h1>
+<ul id="news">
+    <li class="newsitem first"><a href="/article-001.html">This is the first article</a></li>
+    <li class="newsitem"><a href="/article-002.html" class="ext">A second report on something</a></li>
+    <li class="newsitem  fresh"><a>No link</a></li>
+</ul>
+<div class="newsitem"><a href="/elsewhere.html">Elsewhere</a></div>
+</body>
+</html>
+"""
+
+def test_parse_simple_selector():
+    selectors = (
+        ("li", ("li", None, (), None)),
+        ("LI", ("li", None, (), None)),
+        ("#main", (None, "main", (), None)),
+        (".a.b", (None, None, ("a", "b"), None)),
+        ("li.newsitem @class", ("li", None, ("newsitem",), "class")),
+        ("div#x.y", ("div", "x", ("y",), None)),
+        ("*", (None, None, (), None)),
+        ("ul li", None),
+        ("li:first-child", None),
+        ("a[href]", None),
+        ("a @xlink:href", None),
+        ("#a#b", None),
+        ("//li", None),
+    )
+    for selection, expected in selectors:
+        assert_equal(parse_simple_selector(selection), expected, selection)
+
+def test_document_index():
+    root = lxml.etree.fromstring(html, parser=lxml.etree.HTMLParser())
+    index = DocumentIndex(root)
+    items = index.query(root, "li", None, ("newsitem",))
+    assert_equal([e.tag for e in items], ["li"] * 3)
+    assert_equal(len(index.query(root, None, None, ("newsitem",))), 4)
+    assert_equal(len(index.query(root, None, None, ("fresh", "newsitem"))), 1)
+
+    ul = index.query(root, None, "news")[0]
+    assert_equal(len(index.query(ul, None, None, ("newsitem",))), 3)
+    assert_equal(index.query(items[0], "li"), [items[0]])
+    assert_equal(index.query(items[0], "ul"), [])
+    assert_equal(index.query(root, "span"), [])
+
+    other = lxml.etree.fromstring("<p/>")
+    assert_equal(index.query(other, "p"), None)
+
+def check_same_results(selections, document):
+    default = parslepy.DefaultSelectorHandler()
+    indexed = IndexedSelectorHandler()
+    for selection in selections:
+        assert_equal(indexed.extract(document, indexed.make(selection)),
+            default.extract(document, default.make(selection)), selection)
+
+def test_same_results_as_xpath():
+    root = lxml.etree.fromstring(html, parser=lxml.etree.HTMLParser())
+    check_same_results(["li", "li.newsitem", ".newsitem", "#main", "h1.big",
+        "li a @href", "a @href", "a @class", "li.fresh a", "#missing", "ul#news"],
+        root)
+
+    doc = lxml.etree.parse(os.path.join(dirname, "data/validator.w3.org.html"),
+        parser=lxml.etree.HTMLParser()).getroot()
+    check_same_results(["a", "div", "p.note", "#frontforms", "a @href",
+        "img @alt", "span.hideme", "label", "fieldset.moreoptions", "legend"], doc)
+
+def test_parselet_with_index():
+    rules = {
+        "title": "h1#main",
+        "news(li.newsitem)": [{"url?": "a @href", "title": "a"}],
+        "others(div.newsitem)": [{"url": "a @href"}],
+    }
+    handler = IndexedSelectorHandler()
+    parselet = parslepy.Parselet(rules, selector_handler=handler)
+    extracted = parselet.parse_fromstring(html)
+    assert_dict_equal(extracted, parslepy.Parselet(rules).parse_fromstring(html))
+
+    assert_is_instance(handler.make("li.newsitem"), IndexedSelector)
+    assert_is_instance(handler.make("a @href"), IndexedSelector)
+    assert_equal(handler.index_builds, 1)
+    assert_true(handler.index_queries >= 7)
+
+    parselet.parse_fromstring(html)
+    assert_equal(handler.index_builds, 2)
+    handler.clear()
+
+def test_fallback_to_xpath():
+    handler = IndexedSelectorHandler()
+    selector = handler.make("ul > li")
+    assert_false(isinstance(selector, IndexedSelector))
+    root = lxml.etree.fromstring(html, parser=lxml.etree.HTMLParser())
+    assert_equal(len(handler.select(root, selector)), 3)
+    assert_equal(handler.index_builds, 0)
@@ -0,0 +1,84 @@
+from __future__ import unicode_literals
+import parslepy
+from parslepy.interning import StringInterner
+from parslepy.columnar import ColumnarCollector
+from nose.tools import *
+from .tools import *
+
+html = """
+<html>
+<body>
+<ul>
+    <li class="product"><span class="name">Alpha</span><span class="currency">EUR</span><span class="stock">In stock</span></li>
+    <li class="product"><span class="name">Beta</span><span class="currency">EUR</span><span class="stock">In stock</span></li>
+    <li class="product"><span class="name">Gamma</span><span class="currency">EUR</span><span class="stock">Sold out</span></li>
+</ul>
+</body>
+</html>
+"""
+
+rules = {
+    "products(li.product)": [{
+        "name": "span.name",
+        "currency": "span.currency",
+        "stock": "span.stock",
+    }],
+    "currencies": ["span.currency"],
+}
+
+def test_interner():
+    interner = StringInterner(max_size=2, max_length=5)
+    a = "".join(["E", "UR"])
+    b = "".join(["EU", "R"])
+    assert_is_not(a, b)
+    assert_is(interner.intern(a), a)
+    assert_is(interner.intern(b), a)
+    assert_equal(interner.hits, 1)
+    assert_true(interner.bytes_saved > 0)
+    # too long
+    long_value = "".join(["In ", "stock"])
+    assert_is(interner.intern(long_value), long_value)
+    # lists and other values
+    assert_is(interner.intern([b])[0], a)
+    assert_equal(interner.intern(None), None)
+    assert_equal(interner.intern({}), {})
+    # table full: new strings are not kept
+    interner.intern("x")
+    interner.intern("y")
+    assert_equal(len(interner), 2)
+    assert_equal(interner.to_dict()["size"], 2)
+
+def test_parselet_interning():
+    interner = StringInterner()
+    parselet = parslepy.Parselet(rules, interner=interner)
+    extracted = parselet.parse_fromstring(html)
+    assert_dict_equal(extracted, parslepy.Parselet(rules).parse_fromstring(html))
+
+    products = extracted["products"]
+    assert_is(products[0]["currency"], products[1]["currency"])
+    assert_is(products[0]["currency"], extracted["currencies"][2])
+    assert_is(products[0]["stock"], products[1]["stock"])
+    assert_equal(interner.hits, 6)
+    assert_true(interner.bytes_saved > 0)
+
+    # shared across documents
+    other = parselet.parse_fromstring(html)
+    assert_is(other["products"][0]["currency"], products[0]["currency"])
+
+def test_per_document_interning():
+    interner = StringInterner(per_document=True)
+    parselet = parslepy.Parselet(rules, interner=interner)
+    first = parselet.parse_fromstring(html)
+    second = parselet.parse_fromstring(html)
+    assert_is(second["products"][0]["currency"], second["products"][1]["currency"])
+    assert_is_not(second["products"][0]["currency"], first["products"][0]["currency"])
+
+def test_columnar_interning():
+    interner = StringInterner()
+    collector = ColumnarCollector(parslepy.Parselet(rules, interner=interner),
+        "products")
+    collector.parse_fromstring(html)
+    collector.parse_fromstring(html)
+    currencies = collector.columns["currency"]
+    assert_equal(len(currencies), 6)
+    assert_equal(len(set(id(value) for value in currencies)), 1)
@@ -0,0 +1,96 @@
+from __future__ import unicode_literals
+import parslepy
+import parslepy.base
+from parslepy.metrics import MetricsRegistry, Counter, Histogram
+from nose.tools import *
+from .tools import *
+
+html = news_html()
+
+def test_counter():
+    c = Counter("test_total", labelnames=("key",))
+    c.inc(1, "a")
+    c.inc(2, "a")
+    c.inc(1, "b")
+    assert_equal(c.value("a"), 3)
+    assert_equal(c.value("b"), 1)
+    assert_equal(c.value("c"), 0)
+
+@raises(ValueError)
+def test_counter_wrong_labels():
+    c = Counter("test_total", labelnames=("key",))
+    c.inc(1)
+
+def test_registry_get_or_create():
+    registry = MetricsRegistry()
+    c = registry.counter("things_total", "Things", ("kind",))
+    assert_is(registry.counter("things_total", "Things", ("kind",)), c)
+    assert_raises(ValueError, registry.counter, "things_total")
+    assert_raises(ValueError, registry.histogram, "things_total", "", ("kind",))
+
+def test_histogram():
+    h = Histogram("test_seconds", buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        h.observe(value)
+    assert_equal(h.count(), 4)
+    assert_almost_equal(h.sum(), 2.65)
+    assert_equal(h.buckets_counts(),
+        [(0.1, 2), (1.0, 3), (float("inf"), 4)])
+
+def test_parselet_metrics():
+    registry = MetricsRegistry()
+    rules = {
+        "title": "h1",
+        "subtitle?": "h2",
+        "news(li.newsitem)": [{
+            "url": "a @href",
+            "fresh?": ".fresh",
+        }],
+    }
+    parselet = parslepy.Parselet(rules, metrics=registry)
+    for i in range(3):
+        parselet.parse_fromstring(html)
+
+    assert_equal(registry.documents_parsed.value(), 3)
+    assert_equal(registry.parse_seconds.count(), 3)
+    assert_equal(registry.extract_seconds.count(), 3)
+    assert_equal(registry.key_extractions.value("title"), 3)
+    assert_equal(registry.key_extractions.value("news/url"), 6)
+    assert_dict_equal(registry.empty_result_rates(), {
+        "title": 0.0,
+        "subtitle": 1.0,
+        "news": 0.0,
+        "news/url": 0.0,
+        "news/fresh": 1.0,
+    })
+
+def test_selector_cache_metrics():
+    registry = MetricsRegistry()
+    rules = {"title": "h1.metricstest", "heading": "h1.metricstest"}
+    parslepy.Parselet(rules, metrics=registry)
+    assert_equal(registry.selector_cache_misses.value(), 1)
+    assert_equal(registry.selector_cache_hits.value(), 1)
+
+def test_nonmatching_key_metrics():
+    registry = MetricsRegistry()
+    parselet = parslepy.Parselet({"subtitle": "h2"}, strict=True, metrics=registry)
+    assert_raises(parslepy.base.NonMatchingNonOptionalKey,
+        parselet.parse_fromstring, html)
+    assert_equal(registry.nonmatching_keys.value("subtitle"), 1)
+
+def test_exports():
+    registry = MetricsRegistry()
+    parselet = parslepy.Parselet({"title": "h1"}, metrics=registry)
+    parselet.parse_fromstring(html)
+
+    snapshot = registry.to_dict()
+    assert_equal(snapshot["documents_parsed_total"], 1)
+    assert_equal(snapshot["key_extractions_total"], {"title": 1})
+    assert_equal(snapshot["extract_seconds"]["count"], 1)
+
+    text = registry.to_prometheus()
+    assert_in("# TYPE parslepy_documents_parsed_total counter", text)
+    assert_in("parslepy_documents_parsed_total 1", text)
+    assert_in('parslepy_key_extractions_total{key="title"} 1', text)
+    assert_in('parslepy_parse_seconds_bucket{le="+Inf"} 1', text)
+    assert_in("parslepy_parse_seconds_count 1", text)
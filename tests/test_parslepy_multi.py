@@ -0,0 +1,69 @@
+from __future__ import unicode_literals
+import parslepy
+from parslepy.multi import ParseletSet, MemoizingSelectorHandler
+from parslepy.metrics import MetricsRegistry
+from nose.tools import *
+from .tools import *
+import io
+
+html = news_html(before='<ul class="breadcrumbs"><li>Home</li><li>News</li></ul>')
+
+parselets = {
+    "news": {
+        "heading": "h1#main",
+        "news(li.newsitem)": [{"url": "a @href", "title": "a"}],
+    },
+    "links": {
+        "urls": ["li.newsitem a @href"],
+        "items(li.newsitem)": [{"url": "a @href"}],
+    },
+    "metadata": {
+        "title": "title",
+        "heading": "h1#main",
+        "breadcrumbs": ["ul.breadcrumbs li"],
+    },
+}
+
+def test_same_output_as_parselets():
+    parselet_set = ParseletSet(parselets)
+    extracted = parselet_set.parse_fromstring(html)
+    assert_equal(sorted(extracted), ["links", "metadata", "news"])
+    for name, rules in parselets.items():
+        assert_dict_equal(extracted[name],
+            parslepy.Parselet(rules).parse_fromstring(html))
+
+def test_selectors_evaluated_once():
+    parselet_set = ParseletSet(parselets)
+    handler = parselet_set.selector_handler
+    parselet_set.parse_fromstring(html)
+    # h1#main twice, li.newsitem scope and "a @href" for each item
+    assert_equal(handler.hits, 1 + 1 + 2)
+    assert_equal(handler.memo, {})
+
+    # results are not kept from one document to the next
+    parselet_set.parse_fromstring(html)
+    assert_equal(handler.hits, 2 * (1 + 1 + 2))
+
+def test_outputs_do_not_share_lists():
+    parselet_set = ParseletSet({
+        "a": {"items": ["li"]},
+        "b": {"items": ["li"]},
+    })
+    extracted = parselet_set.parse_fromstring(html)
+    extracted["a"]["items"].append("extra")
+    assert_not_in("extra", extracted["b"]["items"])
+
+def test_parse_file_and_metrics():
+    registry = MetricsRegistry()
+    parselet_set = ParseletSet(parselets, metrics=registry)
+    extracted = parselet_set.parse(io.BytesIO(html.encode("utf-8")))
+    assert_equal(extracted["metadata"]["breadcrumbs"], ["Home", "News"])
+    assert_equal(registry.documents_parsed.value(), 1)
+    assert_equal(len(parselet_set), 3)
+    assert_equal(sorted(parselet_set.keys()), ["links", "metadata", "news"])
+    assert_is_instance(parselet_set["news"], parslepy.Parselet)
+
+def test_shared_handler_context():
+    handler = MemoizingSelectorHandler(parslepy.DefaultSelectorHandler())
+    handler.context = "user-context"
+    assert_equal(handler.handler.context, "user-context")
@@ -0,0 +1,107 @@
+from __future__ import unicode_literals
+import parslepy
+import parslepy.base
+import parslepy.selectors
+from parslepy.selectors import xpath_is_document_rooted, DocumentSelector
+from parslepy.tracing import Tracer
+from nose.tools import *
+from .tools import *
+import warnings
+
+html = news_html(3)
+
+class SelectorCounter(Tracer):
+
+    def __init__(self):
+        self.evaluations = {}
+
+    def start_selector(self, selector, document):
+        self.evaluations[selector.source] = self.evaluations.get(selector.source, 0) + 1
+
+
+def test_xpath_is_document_rooted():
+    expressions = (
+        ("//h1", True),
+        ("/html/head/title", True),
+        ("//h1 | /html/head/title", True),
+        ("//a[contains(@href, '|')]", True),
+        ("//li[a | b]", True),
+        ("//h1 | h2", False),
+        ("count(//h1)", False),
+        ("parslepy:text(//h1)", False),
+        (".//h1", False),
+        ("descendant-or-self::h1", False),
+    )
+    for expression, expected in expressions:
+        assert_equal(xpath_is_document_rooted(expression), expected, expression)
+
+def test_document_rooted_selectors_evaluated_once():
+    rules = {
+        "news(li.newsitem)": [{
+            "url": "a @href",
+            "heading": "//h1",
+            "titles": ["//title"],
+        }],
+    }
+    expected = parslepy.Parselet(rules, optimize=False).parse_fromstring(html)
+
+    counter = SelectorCounter()
+    parselet = parslepy.Parselet(rules, tracer=counter)
+    extracted = parselet.parse_fromstring(html)
+    assert_dict_equal(extracted, expected)
+    assert_equal(counter.evaluations["//h1"], 1)
+    assert_equal(counter.evaluations["//title"], 1)
+    assert_equal(counter.evaluations["a @href"], 3)
+
+    # lists are not shared between items
+    news = extracted["news"]
+    assert_false(news[0]["titles"] is news[1]["titles"])
+
+    # results are not kept from one document to the next
+    parselet.parse_fromstring(html.replace("What's new", "What's old"))
+    assert_equal(counter.evaluations["//h1"], 2)
+
+def test_document_rooted_scope():
+    rules = {
+        "news(li.newsitem)": [{
+            "url": "a @href",
+            "page(//body)": {"heading": "h1"},
+        }],
+    }
+    counter = SelectorCounter()
+    parselet = parslepy.Parselet(rules, tracer=counter)
+    extracted = parselet.parse_fromstring(html)
+    assert_equal(extracted["news"][2]["page"], {"heading": "What's new"})
+    assert_equal(counter.evaluations["//body"], 1)
+    assert_equal(counter.evaluations["h1"], 3)
+
+def test_not_iterated_selectors_unchanged():
+    parselet = parslepy.Parselet({"heading": "//h1", "news(li)": {"h": "//h1"}})
+    for ctx, v in parselet.parselet_tree.items():
+        if ctx.key == "heading":
+            assert_false(isinstance(v, DocumentSelector))
+        else:
+            assert_false(isinstance(list(v.values())[0], DocumentSelector))
+
+def test_optimize_disabled():
+    parselet = parslepy.Parselet({"news(li)": [{"h": "//h1"}]}, optimize=False)
+    leaf = list(list(parselet.parselet_tree.values())[0].values())[0]
+    assert_false(isinstance(leaf, DocumentSelector))
+
+def test_warning_when_not_document_rooted():
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        parslepy.Parselet({"news(li)": [{"n": "count(//li)", "u": "a @href"}]})
+    assert_equal(len(caught), 1)
+    assert_true(issubclass(caught[0].category, parslepy.base.SlowSelectorWarning))
+    assert_in("news/n", str(caught[0].message))
+
+def test_warning_points_at_caller():
+    # at any depth in the Parsley tree
+    for rules in ({"news(li)": [{"n": "count(//li)"}]},
+                  {"page": {"news(li)": [{"meta": {"n": "count(//li)"}}]}}):
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            parslepy.Parselet(rules)
+        assert_equal(len(caught), 1)
+        assert_equal(caught[0].filename.rstrip("c"), __file__.rstrip("c"))
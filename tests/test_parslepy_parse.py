@@ -264,3 +264,19 @@ def test_parslepy_parse_html_fromstring():
 
     extracted = parselet.parse_fromstring(htmldoc)
     assert_dict_equal(extracted, expected)
+
+
+def test_parslepy_extract_lxml_html_tree():
+
+    # e.g. Scrapy's response.selector.root
+    import lxml.html
+    htmldoc = """<html><body><!-- menu --><h1 id="main">What's <b>new</b></h1>
+    <ul><li><a href="/a">First</a></li><li><a href="/b">Second</a></li></ul>
+    </body></html>"""
+    root = lxml.html.fromstring(htmldoc)
+    assert_true(type(root) is not lxml.etree._Element)
+
+    rules = {"title": "h1", "links(li)": [{"url": "a @href", "text": "a"}],
+             "comment": "//comment()"}
+    parselet = parslepy.Parselet(rules)
+    assert_dict_equal(parselet.extract(root), parselet.parse_fromstring(htmldoc))
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from parslepy.base import Parselet
 from nose.tools import assert_dict_equal
 
@@ -41,3 +42,59 @@ def test_parslepy_from_yamlstring():
         p = Parselet.from_yamlfile(fp)
     extracted = p.parse_fromstring(html)
     assert_dict_equal(extracted, expected)
+
+
+def test_parslepy_from_jsonfile_cache():
+    path = os.path.join(dirname, 'data/parselet.json')
+    with open(path) as fp:
+        p1 = Parselet.from_jsonfile(fp)
+    with open(path) as fp:
+        p2 = Parselet.from_jsonfile(fp)
+    assert p1 is p2
+    with open(path) as fp:
+        assert Parselet.from_jsonfile(fp, cache=False) is not p1
+    with open(path) as fp:
+        assert Parselet.from_jsonfile(fp, strict=True) is not p1
+    Parselet.clear_file_cache()
+    with open(path) as fp:
+        assert Parselet.from_jsonfile(fp) is not p1
+
+
+def test_parslepy_from_yamlfile_cache():
+    path = os.path.join(dirname, 'data/parselet.yml')
+    with open(path) as fp:
+        p1 = Parselet.from_yamlfile(fp)
+    with open(path) as fp:
+        assert Parselet.from_yamlfile(fp) is p1
+    with open(path) as fp:
+        assert Parselet.from_yamlfile(fp, debug=True) is not p1
+
+
+def test_parslepy_from_jsonfile_cache_changed_file():
+    fd, path = tempfile.mkstemp(suffix='.let.json')
+    try:
+        with os.fdopen(fd, 'w') as fp:
+            fp.write('{"title": "h1"}')
+        with open(path) as fp:
+            p1 = Parselet.from_jsonfile(fp)
+        assert_dict_equal(p1.parse_fromstring(html), {"title": "hi"})
+
+        with open(path, 'w') as fp:
+            fp.write('# comment\n{"title": "h1", "link": "a @href"}')
+        with open(path) as fp:
+            p2 = Parselet.from_jsonfile(fp)
+        assert p2 is not p1
+        assert_dict_equal(p2.parse_fromstring(html), expected)
+    finally:
+        os.remove(path)
+
+
+def test_parslepy_from_jsonstring_comments():
+    s = '''# a parselet
+    {
+        # the title
+        "title": "h1",
+        "link": "a @href"
+    }'''
+    p = Parselet.from_jsonstring(s)
+    assert_dict_equal(p.parse_fromstring(html), expected)
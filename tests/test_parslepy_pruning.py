@@ -0,0 +1,111 @@
+from __future__ import unicode_literals
+import parslepy
+from parslepy.pruning import PruningProfile
+from parslepy.batch import BatchExtractor
+from nose.tools import *
+from .tools import *
+import io
+import lxml.etree
+
+html = """
+<html>
+<head>
+<title>Sample document to test parslepy</title>
+<script>var tracking = "lots of javascript";</script>
+<style>body { color: red }</style>
+</head>
+<body>
+<!-- navigation -->
+<h1 id="main">What's <svg><path d="M0 0"/></svg>new</h1>
+<div id="content">Some <script>document.write("x")</script>text <noscript>Enable JS</noscript>here</div>
+<script type="application/ld+json">{"@type": "Product"}</script>
+</body>
+</html>
+"""
+
+def profile_for(rules):
+    return parslepy.Parselet(rules, prune=True).pruning
+
+def test_profile_from_selectors():
+    profile = profile_for({"title": "h1", "links": ["a @href"]})
+    assert_equal(profile.tags, ("noscript", "script", "style", "svg", "template"))
+    assert_true(profile.comments)
+
+    profile = profile_for({"ld(script[type='application/ld+json'])": ["."],
+                           "icons": ["//svg:svg"]})
+    assert_equal(profile.tags, ("noscript", "style", "template"))
+
+    profile = profile_for({"comments": ["//comment()"], "scripts": ["noscript"]})
+    assert_equal(profile.tags, ("script", "style", "svg", "template"))
+    assert_false(profile.comments)
+
+    # identifiers that merely contain a tag name
+    profile = profile_for({"desc": "div#description", "x": "span.svg-icon",
+                           "s": "div @style", "q": "a[href*='script']"})
+    assert_equal(profile.tags, ("noscript", "script", "style", "svg", "template"))
+
+def test_profile_everything_selected():
+    assert_equal(profile_for({"n": ["//node()"], "t": "script, style, svg, noscript, template"}),
+        None)
+    assert_equal(parslepy.Parselet({"title": "h1"}).pruning, None)
+
+def test_profile_any_element():
+    # selectors that can select any element (or its text) keep all elements
+    for rules in ({"kids": ["#x > *"]},
+                  {"n": "count(//*)"},
+                  {"content": "#content"},
+                  {"nodes": ["//div/node()"]},
+                  {"texts": ["//text()"]},
+                  {"texts": ["body/descendant::text()"]}):
+        profile = profile_for(rules)
+        assert_false(profile and profile.tags, rules)
+
+    # attribute wildcards and string literals are not element wildcards
+    profile = profile_for({"attrs": ["a/@*"], "q": "//a[@title='*']"})
+    assert_equal(profile.tags, ("noscript", "script", "style", "svg", "template"))
+
+def test_pruning_keeps_wildcard_results():
+    document = """<html><body><div id="x"><a>a</a><script>var s=1;</script>
+<style>p{}</style></div></body></html>"""
+    for rules in ({"kids": ["#x > *"]}, {"n": "count(//*)"}):
+        assert_equal(parslepy.Parselet(rules, prune=True).parse_fromstring(document),
+                     parslepy.Parselet(rules).parse_fromstring(document))
+
+def test_prune_document():
+    profile = PruningProfile(["script", "style", "svg"], comments=True)
+    root = lxml.etree.fromstring(html, parser=lxml.etree.HTMLParser())
+    profile.prune(root)
+    assert_equal(root.xpath("//script | //style | //svg | //comment()"), [])
+    # tail text is kept
+    assert_equal(root.xpath("string(//h1)"), "What's new")
+
+def test_parse_with_pruning():
+    rules = {
+        "heading": "h1",
+        "content": "div#content",
+        "all": "body",
+    }
+    extracted = parslepy.Parselet(rules, prune=True).parse_fromstring(html)
+    assert_equal(extracted["heading"], "What's new")
+    assert_equal(extracted["content"], "Some text here")
+    assert_not_in("javascript", extracted["all"])
+    assert_not_in("Product", extracted["all"])
+
+    extracted = parslepy.Parselet(rules, prune=True).parse(io.StringIO(html),
+        parser=lxml.etree.HTMLParser())
+    assert_equal(extracted["content"], "Some text here")
+
+    # without pruning, script content is part of element text
+    extracted = parslepy.Parselet(rules).parse_fromstring(html)
+    assert_in('document.write("x")', extracted["content"])
+
+def test_selected_elements_are_kept():
+    rules = {"ld": "script[type='application/ld+json']", "heading": "h1"}
+    extracted = parslepy.Parselet(rules, prune=True).parse_fromstring(html)
+    assert_equal(extracted["ld"], '{"@type": "Product"}')
+    assert_equal(extracted["heading"], "What's new")
+
+def test_batch_pruning():
+    extractor = BatchExtractor({"content": "div#content"}, prune=True)
+    records = list(extractor.iter_results([("doc", html.encode("utf-8"), "utf-8")]))
+    assert_equal(records[0]["result"], {"content": "Some text here"})
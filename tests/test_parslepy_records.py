@@ -0,0 +1,96 @@
+from __future__ import unicode_literals
+import parslepy
+from parslepy.records import Record, record_class, class_name, to_plain
+from parslepy.serializers import JsonLinesSerializer, CsvSerializer
+from nose.tools import *
+from .tools import *
+import io
+import json
+import pickle
+
+html = news_html(0, ul_attributes=' id="news"', items=[
+    '<li class="newsitem"><a href="/article-001.html">This is the first article</a>'
+        '<span class="author">Alice</span></li>',
+    '<li class="newsitem"><a href="/article-002.html">A second report on something</a></li>',
+    '<li class="newsitem"><a>No link</a><span class="author">Bob</span></li>',
+])
+
+rules = {
+    "title": "h1",
+    "news(li.newsitem)": [{
+        "title": "a",
+        "url?": "a @href",
+        "--(span.author)": {"author-name": "."},
+    }],
+    "meta(head)": {"page-title": "title"},
+}
+
+def test_record_class():
+    cls = record_class(class_name("news"), ["title", "url", "author-name"])
+    assert_equal(cls.__name__, "Record_news")
+    assert_equal(cls.__slots__, ("_0", "_1", "_2"))
+    record = cls.from_dict({"title": "a", "author-name": "b"})
+    assert_false(hasattr(record, "__dict__"))
+    assert_equal(record.title, "a")
+    assert_equal(record.url, None)
+    assert_equal(record["author-name"], "b")
+    assert_raises(KeyError, lambda: record["url"])
+    assert_equal(record.get("url", "x"), "x")
+    assert_in("title", record)
+    assert_not_in("url", record)
+    assert_equal(record.keys(), ["title", "author-name"])
+    assert_equal(len(record), 2)
+    assert_equal(dict(record.items()), {"title": "a", "author-name": "b"})
+    assert_equal(record, {"title": "a", "author-name": "b"})
+    assert_not_equal(record, {"title": "a"})
+    assert_equal(repr(record), "Record_news(title='a', author-name='b')")
+
+def test_keys_named_like_slots():
+    cls = record_class("Record", ["_1", "_0", "a"])
+    record = cls.from_dict({"_0": "x", "_1": "y", "a": "z"})
+    assert_equal(record["_0"], "x")
+    assert_equal(record["_1"], "y")
+    assert_equal(record.a, "z")
+    assert_equal(record, {"_0": "x", "_1": "y", "a": "z"})
+
+    parselet = parslepy.Parselet({"_0": "h1", "a": "title"}, records=True)
+    assert_equal(parselet.parse_fromstring(html).to_dict(),
+        {"_0": "What's new", "a": "Sample document to test parslepy"})
+
+def test_records_output():
+    parselet = parslepy.Parselet(rules, records=True)
+    extracted = parselet.parse_fromstring(html)
+    expected = parslepy.Parselet(rules).parse_fromstring(html)
+
+    assert_is_instance(extracted, Record)
+    assert_equal(extracted, expected)
+    assert_dict_equal(extracted.to_dict(), expected)
+    assert_dict_equal(to_plain(extracted), expected)
+
+    news = extracted.news
+    assert_equal(len(news), 3)
+    assert_equal(news[0].url, "/article-001.html")
+    assert_equal(news[0]["author-name"], "Alice")
+    assert_not_in("url", news[2])
+    assert_not_in("author-name", news[1])
+    # one class per object level
+    assert_true(type(news[0]) is type(news[1]) is type(news[2]))
+    assert_equal(type(news[0]).__name__, "Record_news")
+    assert_equal(extracted.meta["page-title"], "Sample document to test parslepy")
+
+    # records are pickled as dicts
+    assert_equal(type(pickle.loads(pickle.dumps(news[0]))), dict)
+
+def test_records_serialized():
+    extracted = parslepy.Parselet(rules, records=True).parse_fromstring(html)
+    expected = parslepy.Parselet(rules).parse_fromstring(html)
+
+    out = io.StringIO()
+    JsonLinesSerializer(out).write(extracted)
+    assert_dict_equal(json.loads(out.getvalue()), expected)
+
+    out = io.StringIO()
+    serializer = CsvSerializer(out, ["title", "meta/page-title", "news"], header=False)
+    serializer.write(extracted)
+    row = out.getvalue().strip()
+    assert_true(row.startswith("What's new,Sample document to test parslepy,"), row)
@@ -0,0 +1,145 @@
+from __future__ import unicode_literals
+from parslepy.registry import ParseletRegistry, parselet_name
+from parslepy.metrics import MetricsRegistry
+from nose.tools import *
+from .tools import *
+import json
+import os
+import shutil
+import tempfile
+import time
+
+html = """
+<html>
+<head><title>Sample document</title></head>
+<body><h1>Heading</h1><p>Paragraph</p></body>
+</html>
+"""
+
+def write(directory, filename, content):
+    path = os.path.join(directory, filename)
+    with open(path, "w") as fp:
+        fp.write(content)
+    return path
+
+def touch(path, delta=10):
+    # change modification time even on coarse-grained file systems
+    st = os.stat(path)
+    os.utime(path, (st.st_atime, st.st_mtime + delta))
+
+def make_directory():
+    directory = tempfile.mkdtemp()
+    write(directory, "title.let.json", json.dumps({"title": "title"}))
+    write(directory, "heading.yml", "heading: h1\n")
+    write(directory, "README.txt", "not a parselet")
+    return directory
+
+def test_parselet_name():
+    assert_equal(parselet_name("product.let.json"), "product")
+    assert_equal(parselet_name("product.json"), "product")
+    assert_equal(parselet_name("product.let.yml"), "product")
+    assert_equal(parselet_name("product.yaml"), "product")
+    assert_equal(parselet_name("README.txt"), None)
+    assert_equal(parselet_name(".json"), None)
+
+def test_load():
+    directory = make_directory()
+    try:
+        registry = ParseletRegistry(directory)
+        assert_equal(registry.names(), ["heading", "title"])
+        assert_equal(len(registry), 2)
+        assert "title" in registry
+        assert_equal(registry.get("missing"), None)
+        assert_dict_equal(registry["title"].parse_fromstring(html),
+            {"title": "Sample document"})
+        assert_dict_equal(registry["heading"].parse_fromstring(html),
+            {"heading": "Heading"})
+        assert registry["title"].selector_handler is registry.selector_handler
+    finally:
+        shutil.rmtree(directory)
+
+def test_reload():
+    directory = make_directory()
+    try:
+        metrics = MetricsRegistry()
+        registry = ParseletRegistry(directory, metrics=metrics)
+        title, heading = registry["title"], registry["heading"]
+        assert_equal(registry.reload(), [])
+        assert registry["title"] is title
+
+        # changed, added and removed files
+        path = write(directory, "title.let.json",
+            json.dumps({"title": "title", "heading": "h1"}))
+        touch(path)
+        write(directory, "paragraph.json", json.dumps({"p": "p"}))
+        os.remove(os.path.join(directory, "heading.yml"))
+        assert_equal(registry.reload(), ["heading", "paragraph", "title"])
+        assert_equal(registry.names(), ["paragraph", "title"])
+        assert registry["title"] is not title
+        assert_dict_equal(registry["title"].parse_fromstring(html),
+            {"title": "Sample document", "heading": "Heading"})
+        assert_equal(metrics.to_dict()["registry_reloads_total"],
+            {"title": 1})
+    finally:
+        shutil.rmtree(directory)
+
+def test_shared_metrics():
+    directory = make_directory()
+    try:
+        metrics = MetricsRegistry()
+        first = ParseletRegistry(directory, metrics=metrics)
+        second = ParseletRegistry(directory, metrics=metrics)
+        assert_is(first.reloads, second.reloads)
+    finally:
+        shutil.rmtree(directory)
+
+def test_reload_error_keeps_previous():
+    directory = make_directory()
+    try:
+        registry = ParseletRegistry(directory)
+        title = registry["title"]
+        path = write(directory, "title.let.json", "{not json")
+        touch(path)
+        assert_equal(registry.reload(), [])
+        assert registry["title"] is title
+        assert "title" in registry.errors
+
+        # not retried until the file changes again
+        assert_equal(registry.reload(), [])
+        path = write(directory, "title.let.json", json.dumps({"t": "title"}))
+        touch(path, 20)
+        assert_equal(registry.reload(), ["title"])
+        assert_equal(registry.errors, {})
+        assert_dict_equal(registry["title"].parse_fromstring(html),
+            {"t": "Sample document"})
+    finally:
+        shutil.rmtree(directory)
+
+def test_reload_shares_selectors():
+    directory = make_directory()
+    try:
+        registry = ParseletRegistry(directory)
+        selector = registry.selector_handler.make("title")
+        hits = selector.cache_hits
+        path = write(directory, "title.let.json",
+            json.dumps({"title": "title", "h": "h1"}))
+        touch(path)
+        registry.reload()
+        assert_true(selector.cache_hits > hits)
+    finally:
+        shutil.rmtree(directory)
+
+def test_polling():
+    directory = make_directory()
+    try:
+        registry = ParseletRegistry(directory)
+        registry.start(interval=0.01)
+        write(directory, "paragraph.json", json.dumps({"p": "p"}))
+        for _ in range(500):
+            if "paragraph" in registry:
+                break
+            time.sleep(0.01)
+        registry.stop()
+        assert "paragraph" in registry
+    finally:
+        shutil.rmtree(directory)
@@ -0,0 +1,117 @@
+from __future__ import unicode_literals
+import parslepy
+from parslepy.routing import ParseletRouter
+from parslepy.metrics import MetricsRegistry
+from nose.tools import *
+from .tools import *
+import json
+import os
+import shutil
+import tempfile
+
+html = """
+<html>
+<head><title>Sample document</title></head>
+<body><h1>Heading</h1></body>
+</html>
+"""
+
+def make_router(**kwargs):
+    router = ParseletRouter(**kwargs)
+    router.add("shop.example.com", r"/product/(?P<id>\d+)", {"product": "h1"})
+    router.add("shop.example.com", r"/(category|tag)/", {"category": "h1"})
+    router.add("*.example.com", r"/", {"site": "title"})
+    router.add("*", r"/feed", {"feed": "title"})
+    return router
+
+def route_key(router, url):
+    parselet = router.route(url)
+    if parselet is not None:
+        return parselet.keys()[0]
+
+def test_route():
+    router = make_router()
+    assert_equal(len(router), 4)
+    assert_equal(route_key(router, "http://shop.example.com/product/12"), "product")
+    assert_equal(route_key(router, "http://SHOP.example.com:8080/tag/x"), "category")
+    assert_equal(route_key(router, "http://shop.example.com/about"), "site")
+    assert_equal(route_key(router, "http://a.b.example.com/"), "site")
+    assert_equal(route_key(router, "http://example.com/"), "site")
+    assert_equal(route_key(router, "http://other.org/feed?page=2"), "feed")
+    assert_equal(route_key(router, "http://other.org/about"), None)
+    # more specific hosts first, even when their routes do not match
+    assert_equal(route_key(router, "http://shop.example.com/feed"), "site")
+
+def test_first_matching_route_wins():
+    router = ParseletRouter()
+    router.add("example.com", r"/a", {"first": "h1"})
+    router.add("example.com", r"/a/b", {"second": "h1"})
+    assert_equal(route_key(router, "http://example.com/a/b"), "first")
+
+    # routes added after the first dispatch are taken into account
+    router.add("example.com", r"/c", {"third": "h1"})
+    assert_equal(route_key(router, "http://example.com/c"), "third")
+
+def test_inline_flags():
+    router = ParseletRouter()
+    router.add("example.com", r"(?i)/product/", {"product": "h1"})
+    router.add("example.com", r"/about", {"about": "h1"})
+    assert_equal(route_key(router, "http://example.com/PRODUCT/1"), "product")
+    assert_equal(route_key(router, "http://example.com/about"), "about")
+    # flags apply to their own pattern only
+    assert_equal(route_key(router, "http://example.com/ABOUT"), None)
+
+def test_backreferences_rejected():
+    router = ParseletRouter()
+    for pattern in (r"/(\w+)/\1", r"/(?P<section>\w+)/(?P=section)",
+                    r"/(a)?(?(1)b|c)"):
+        assert_raises(ValueError, router.add, "example.com", pattern, {"x": "h1"})
+    assert_equal(len(router), 0)
+    # escaped backslashes are not backreferences
+    router.add("example.com", r"/(a)\\1", {"x": "h1"})
+    router.add("example.com", r"/about", {"about": "h1"})
+    assert_equal(route_key(router, "http://example.com/a\\1"), "x")
+    assert_equal(route_key(router, "http://example.com/about"), "about")
+
+def test_lazy_compilation():
+    registry = MetricsRegistry()
+    router = make_router(metrics=registry)
+    assert_equal(registry.to_dict()["route_compilations_total"], 0)
+
+    parselet = router.route("http://shop.example.com/product/12")
+    assert_is_instance(parselet, parslepy.Parselet)
+    assert_is(router.route("http://shop.example.com/product/13"), parselet)
+    assert_equal(registry.to_dict()["route_compilations_total"], 1)
+
+    router.route("http://other.org/")
+    assert_equal(registry.to_dict()["route_misses_total"], 1)
+    assert_equal(router.dispatch_seconds.count(), 3)
+
+def test_shared_metrics():
+    registry = MetricsRegistry()
+    first = make_router(metrics=registry)
+    second = make_router(metrics=registry)
+    first.route("http://shop.example.com/product/12")
+    second.route("http://shop.example.com/product/12")
+    assert_equal(registry.to_dict()["route_compilations_total"], 2)
+    assert_is(first.dispatch_seconds, second.dispatch_seconds)
+
+def test_parselet_instances_and_files():
+    tmpdir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmpdir, "blog.let.json")
+        with open(path, "w") as fp:
+            json.dump({"post": "h1"}, fp)
+        parselet = parslepy.Parselet({"home": "title"})
+        router = ParseletRouter()
+        router.add("example.com", r"/blog/", path)
+        router.add("example.com", r"/$", parselet)
+        assert_is(router.route("http://example.com/"), parselet)
+        assert_equal(router.parse_fromstring("http://example.com/blog/1", html),
+            {"post": "Heading"})
+    finally:
+        shutil.rmtree(tmpdir)
+
+def test_parse_without_route():
+    router = make_router()
+    assert_raises(LookupError, router.parse_fromstring, "http://other.org/", html)
@@ -0,0 +1,55 @@
+from __future__ import unicode_literals
+import parslepy
+from parslepy.sampling import SlowSampler
+from parslepy.tracing import MultiTracer, Tracer
+from nose.tools import *
+from .tools import *
+import io
+import json
+import lxml.etree
+
+html = news_html()
+
+rules = NEWS_RULES
+
+def test_sample_everything():
+    sampler = SlowSampler(selector_threshold=0, document_threshold=0)
+    parselet = parslepy.Parselet(rules, tracer=sampler)
+    parselet.parse_fromstring(html, source="http://example.com/news")
+
+    samples = sampler.dump()
+    kinds = [s["kind"] for s in samples]
+    # h1, li.newsitem, and a @href twice, then the document
+    assert_equal(kinds, ["selector"] * 4 + ["document"])
+    for sample in samples:
+        assert_equal(sample["source"], "http://example.com/news")
+        assert_equal(sample["size"], len(html))
+
+    paths = sorted(set(s["path"] for s in samples if s["kind"] == "selector"))
+    assert_equal(paths, ["news", "news/url", "title"])
+    assert_in("descendant-or-self::a/@href",
+        [s["selector"] for s in samples])
+
+def test_sample_threshold():
+    sampler = SlowSampler(selector_threshold=60, document_threshold=60)
+    parselet = parslepy.Parselet(rules, tracer=sampler)
+    parselet.parse_fromstring(html)
+    assert_equal(sampler.dump(), [])
+
+def test_ring_buffer():
+    sampler = SlowSampler(selector_threshold=0, document_threshold=None, capacity=3)
+    parselet = parslepy.Parselet(rules, tracer=MultiTracer(Tracer(), sampler))
+    doc = lxml.etree.fromstring(html, parser=lxml.etree.HTMLParser())
+    for i in range(5):
+        parselet.extract(doc, source="doc%d" % i)
+
+    samples = sampler.dump()
+    assert_equal(len(samples), 3)
+    assert_equal(samples[-1]["source"], "doc4")
+
+    out = io.StringIO()
+    sampler.dump(out)
+    assert_equal([json.loads(l) for l in out.getvalue().splitlines()], samples)
+
+    sampler.clear()
+    assert_equal(sampler.dump(), [])
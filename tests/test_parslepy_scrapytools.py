@@ -0,0 +1,255 @@
+from __future__ import unicode_literals
+import parslepy
+from nose.tools import *
+from nose import SkipTest
+from .tools import *
+from . import fake_scrapy
+import threading
+import lxml.html
+
+fake_scrapy.install()
+
+from scrapy.item import Item, Field
+from scrapy.loader import ItemLoader
+from parslepy.utils import scrapytools
+
+html = """
+<html>
+<head><title>Products</title></head>
+<body>
+<div class="product"><h2>First</h2><a href="/p/1">details</a></div>
+<div class="product"><h2>Second</h2><a href="/p/2#top">details</a></div>
+<a class="next" href="/page/2">next</a>
+</body>
+</html>
+"""
+
+rules = {
+    "title": "title",
+    "products(div.product)": [{"name": "h2", "url": "a @href"}],
+    "next?": ["a.next @href"],
+}
+
+
+class StubSelector(object):
+    """
+    Parses the response body on first access to `root`, like Scrapy's selector
+    """
+
+    def __init__(self, body):
+        self.body = body
+        self.parses = 0
+        self._root = None
+
+    @property
+    def root(self):
+        if self._root is None:
+            self.parses += 1
+            self._root = lxml.html.fromstring(self.body)
+        return self._root
+
+
+class StubResponse(object):
+
+    def __init__(self, url="http://example.com/list", body=html, encoding="utf-8"):
+        self.url = url
+        self.body = body.encode(encoding)
+        self.encoding = encoding
+        self.selector = StubSelector(body)
+
+
+class FakeReactor(object):
+    """
+    Runs callbacks from pool threads right away, and records shutdown triggers
+    """
+
+    def __init__(self):
+        self.triggers = {}
+
+    def callFromThread(self, f, *args, **kwargs):
+        f(*args, **kwargs)
+
+    def addSystemEventTrigger(self, phase, event, f):
+        trigger = object()
+        self.triggers[trigger] = f
+        return trigger
+
+    def removeSystemEventTrigger(self, trigger):
+        del self.triggers[trigger]
+
+
+class CountingParselet(parslepy.Parselet):
+    """
+    Counts extractions from trees and from document strings
+    """
+
+    extractions = 0
+    parses = 0
+    tree_walks = 0
+
+    def extract(self, document, *args, **kwargs):
+        self.extractions += 1
+        return super(CountingParselet, self).extract(document, *args, **kwargs)
+
+    def parse_fromstring(self, s, *args, **kwargs):
+        self.parses += 1
+        return super(CountingParselet, self).parse_fromstring(s, *args, **kwargs)
+
+    def _keys(self, parselet_node):
+        self.tree_walks += 1
+        return super(CountingParselet, self)._keys(parselet_node)
+
+
+class StubSpider(object):
+    parselet = parslepy.Parselet(rules)
+
+
+class ProductPage(Item):
+    response = Field()
+    title = Field()
+    products = Field()
+    next = Field()
+
+
+class ProductTitle(Item):
+    response = Field()
+    title = Field()
+    products = Field()
+
+
+def require_twisted():
+    try:
+        import twisted.python.threadpool
+    except ImportError:
+        raise SkipTest("Twisted not installed")
+
+def wait_result(d):
+    results = []
+    done = threading.Event()
+    def store(result):
+        results.append(result)
+        done.set()
+    d.addBoth(store)
+    assert_true(done.wait(10))
+    return results[0]
+
+
+def test_extract_response():
+    response = StubResponse()
+    extracted = scrapytools.extract_response(StubSpider.parselet, response)
+    assert_equal(extracted["title"], "Products")
+    assert_equal([p["name"] for p in extracted["products"]], ["First", "Second"])
+
+def test_extract_response_without_tree():
+    # e.g. non-text responses: the body is parsed
+    response = StubResponse()
+    response.selector = None
+    parselet = CountingParselet(rules)
+    extracted = scrapytools.extract_response(parselet, response)
+    assert_equal(extracted["title"], "Products")
+    assert_equal(parselet.parses, 1)
+
+def test_item_class_loader_reuses_tree():
+    parselet = CountingParselet(rules)
+    response = StubResponse()
+    config = scrapytools.ParsleyItemLoaderConfig(ProductPage, ItemLoader)
+    loader = scrapytools.ParsleyItemClassLoader(parselet, [config], response)
+    items = list(loader.iter_items()) + list(loader.iter_items(response))
+    assert_equal(len(items), 2)
+    # Scrapy's tree is parsed once, then reused; the body is never parsed again
+    assert_equal(response.selector.parses, 1)
+    assert_equal(parselet.extractions, 1)
+    assert_equal(parselet.parses, 0)
+
+    # another response
+    other = StubResponse(url="http://example.com/other")
+    list(loader.iter_items(other))
+    assert_equal(other.selector.parses, 1)
+    assert_equal(parselet.extractions, 2)
+
+def test_loader_items_and_requests_share_extraction():
+    parselet = CountingParselet(rules)
+    response = StubResponse()
+    loader = scrapytools.ParsleyLoader(parselet, response)
+    items = list(loader.iter_items(
+        scrapytools.ParsleyItemLoaderConfig(iter_item_key="products")))
+    requests = list(loader.iter_requests(
+        scrapytools.ParsleyRequestConfig(iter_request_key="next")))
+    assert_equal([item["name"] for item in items], ["First", "Second"])
+    assert_equal([request.url for request in requests],
+        ["http://example.com/page/2"])
+    assert_equal(response.selector.parses, 1)
+    assert_equal(parselet.extractions, 1)
+
+    loader.invalidate()
+    list(loader.iter_items(
+        scrapytools.ParsleyItemLoaderConfig(iter_item_key="products")))
+    assert_equal(parselet.extractions, 2)
+
+def test_parselet_item_classes():
+    item_classes = scrapytools.parselet_item_classes(parslepy.Parselet(rules))
+    assert_equal(sorted(item_classes, key=str), [None, "products"])
+    assert_equal(sorted(item_classes[None].fields), ["next", "products", "title"])
+    assert_equal(sorted(item_classes["products"].fields), ["name", "url"])
+    # one class per name and key set
+    assert_is(scrapytools.parselet_item_classes(parslepy.Parselet(rules))["products"],
+        item_classes["products"])
+
+def test_item_classes_built_once():
+    parselet = CountingParselet(rules)
+    loader = scrapytools.ParsleyImplicitItemClassLoader(parselet,
+        [scrapytools.ParsleyItemLoaderConfig(iter_item_key="products")])
+    walks = parselet.tree_walks
+    first = list(loader.iter_items(StubResponse()))
+    second = list(loader.iter_items(StubResponse(url="http://example.com/2")))
+    assert_equal(len(first), 2)
+    assert_is(type(first[0]), type(second[0]))
+    assert_equal(parselet.tree_walks, walks)
+
+    loader = scrapytools.ParsleyLoader(parselet)
+    walks = parselet.tree_walks
+    config = scrapytools.ParsleyItemLoaderConfig()
+    first = list(loader.iter_items(config, StubResponse()))
+    second = list(loader.iter_items(config, StubResponse(url="http://example.com/2")))
+    assert_is(type(first[0]), type(second[0]))
+    assert_equal(sorted(first[0].keys()), ["next", "products", "title"])
+    assert_equal(parselet.tree_walks, walks)
+
+def test_threaded_extractor():
+    require_twisted()
+    reactor = FakeReactor()
+    extractor = scrapytools.ThreadedExtractor(max_threads=2, reactor=reactor)
+    try:
+        result = wait_result(extractor.extract(StubSpider.parselet, StubResponse()))
+        assert_equal(result["title"], "Products")
+    finally:
+        extractor.stop()
+    assert_equal(reactor.triggers, {})
+
+def check_pipeline(item):
+    require_twisted()
+    pipeline = scrapytools.ParsleyExtractionPipeline(max_threads=1,
+        reactor=FakeReactor())
+    spider = StubSpider()
+    pipeline.open_spider(spider)
+    try:
+        return wait_result(pipeline.process_item(item, spider))
+    finally:
+        pipeline.close_spider(spider)
+
+def test_pipeline_dict_item():
+    item = check_pipeline({"response": StubResponse(), "page": 1})
+    assert_equal(sorted(item.keys()), ["next", "page", "products", "title"])
+    assert_equal(item["next"], ["/page/2"])
+
+def test_pipeline_declared_fields():
+    # "next" is not a field of ProductTitle
+    item = check_pipeline(ProductTitle(response=StubResponse()))
+    assert_is_instance(item, ProductTitle)
+    assert_equal(sorted(item.keys()), ["products", "title"])
+    assert_equal(item["title"], "Products")
+
+def test_pipeline_passes_other_items():
+    pipeline = scrapytools.ParsleyExtractionPipeline()
+    item = {"title": "x"}
+    assert_is(pipeline.process_item(item, StubSpider()), item)
@@ -0,0 +1,89 @@
+from __future__ import unicode_literals
+import parslepy
+from parslepy.batch import BatchExtractor
+from parslepy.serializers import JsonLinesSerializer, MsgpackSerializer, \
+    CsvSerializer, output_paths, lookup_path
+import parslepy.serializers
+from nose.tools import *
+from nose.plugins.skip import SkipTest
+from .tools import *
+import csv
+import io
+import json
+
+html = news_html(before='<div class="meta"><span class="author">Jane</span></div>')
+
+rules = {
+    "title": "title",
+    "meta(div.meta)": {
+        "author": "span.author",
+        "date?": "span.date",
+    },
+    "--(body)": {"heading": "h1"},
+    "news(li.newsitem)": [{"url": "a @href"}],
+}
+
+def test_output_paths():
+    parselet = parslepy.Parselet(rules)
+    assert_equal(output_paths(parselet.parselet_tree),
+        ["heading", "meta/author", "meta/date", "news", "title"])
+
+def test_lookup_path():
+    record = {"a": {"b": "x"}, "c": "y"}
+    assert_equal(lookup_path(record, "a/b"), "x")
+    assert_equal(lookup_path(record, "c"), "y")
+    assert_equal(lookup_path(record, "c/d"), None)
+    assert_equal(lookup_path(record, "e/f"), None)
+
+def test_jsonlines():
+    parselet = parslepy.Parselet(rules)
+    result = parselet.parse_fromstring(html)
+    out = io.StringIO()
+    serializer = JsonLinesSerializer(out)
+    serializer.write(result)
+    serializer.write({"x": 1})
+    serializer.close()
+    assert_equal(serializer.records, 2)
+    lines = out.getvalue().splitlines()
+    assert_equal(lines[0], json.dumps(result, sort_keys=True))
+    assert_equal([json.loads(l) for l in lines], [result, {"x": 1}])
+
+def test_csv():
+    parselet = parslepy.Parselet(rules)
+    out = io.StringIO()
+    serializer = CsvSerializer.for_parselet(out, parselet)
+    serializer.write(parselet.parse_fromstring(html))
+    serializer.write({"title": "Other"})
+    rows = list(csv.reader(io.StringIO(out.getvalue())))
+    assert_equal(rows, [
+        ["heading", "meta/author", "meta/date", "news", "title"],
+        ["What's new", "Jane", "",
+         '[{"url": "/article-001.html"}, {"url": "/article-002.html"}]',
+         "Sample document to test parslepy"],
+        ["", "", "", "", "Other"],
+    ])
+
+def test_msgpack():
+    if parslepy.serializers.msgpack is None:
+        assert_raises(RuntimeError, MsgpackSerializer, io.BytesIO())
+        raise SkipTest("msgpack not installed")
+    out = io.BytesIO()
+    serializer = MsgpackSerializer(out)
+    serializer.write({"title": "a"})
+    serializer.write({"title": "b"})
+    unpacker = parslepy.serializers.msgpack.Unpacker(io.BytesIO(out.getvalue()), raw=False)
+    assert_equal(list(unpacker), [{"title": "a"}, {"title": "b"}])
+
+def test_batch_csv():
+    extractor = BatchExtractor({"title": "title", "heading?": "h1"})
+    out = io.StringIO()
+    extractor.run([("doc1", html.encode("utf-8"), "utf-8")], out, format="csv")
+    rows = list(csv.reader(io.StringIO(out.getvalue())))
+    assert_equal(rows, [
+        ["source", "error", "result/heading", "result/title"],
+        ["doc1", "", "What's new", "Sample document to test parslepy"],
+    ])
+
+def test_batch_unknown_format():
+    extractor = BatchExtractor({"title": "title"})
+    assert_raises(ValueError, extractor.run, [], io.StringIO(), format="xml")
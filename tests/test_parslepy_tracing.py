@@ -0,0 +1,123 @@
+from __future__ import unicode_literals
+import parslepy
+import parslepy.base
+from parslepy.tracing import Tracer, PrintTracer, JsonLinesTracer, MultiTracer, folded_stacks
+from nose.tools import *
+from .tools import *
+import io
+import json
+
+html = news_html()
+
+rules = NEWS_RULES
+
+class RecordingTracer(Tracer):
+
+    def __init__(self):
+        self.events = []
+
+    def start_document(self, document, source=None, size=None):
+        self.events.append(("start_document", size))
+
+    def end_document(self, document, output):
+        self.events.append(("end_document",))
+
+    def start_key(self, ctx):
+        self.events.append(("start_key", ctx.path))
+
+    def end_key(self, ctx, extracted):
+        self.events.append(("end_key", ctx.path))
+
+    def start_scope(self, ctx, count):
+        self.events.append(("start_scope", ctx.path, count))
+
+    def end_scope(self, ctx, count):
+        self.events.append(("end_scope", ctx.path, count))
+
+    def start_selector(self, selector, document):
+        self.events.append(("start_selector",))
+
+    def end_selector(self, selector, result):
+        self.events.append(("end_selector",))
+
+
+def test_tracer_events():
+    tracer = RecordingTracer()
+    parselet = parslepy.Parselet({"news(li.newsitem)": [{"url": "a @href"}]},
+        tracer=tracer)
+    parselet.parse_fromstring(html)
+    assert_equal(tracer.events, [
+        ("start_document", len(html)),
+        ("start_key", "news"),
+        ("start_selector",), ("end_selector",),
+        ("start_scope", "news", 2),
+        ("start_key", "news/url"),
+        ("start_selector",), ("end_selector",),
+        ("end_key", "news/url"),
+        ("start_key", "news/url"),
+        ("start_selector",), ("end_selector",),
+        ("end_key", "news/url"),
+        ("end_scope", "news", 2),
+        ("end_key", "news"),
+        ("end_document",),
+    ])
+
+def test_tracer_output_unchanged():
+    expected = parslepy.Parselet(rules).parse_fromstring(html)
+    traced = parslepy.Parselet(rules, tracer=RecordingTracer()).parse_fromstring(html)
+    assert_dict_equal(traced, expected)
+
+def test_jsonlines_tracer():
+    out = io.StringIO()
+    tracer = JsonLinesTracer(out)
+    parselet = parslepy.Parselet(rules, tracer=tracer)
+    parselet.parse_fromstring(html)
+
+    spans = [json.loads(l) for l in out.getvalue().splitlines()]
+    kinds = set(s["kind"] for s in spans)
+    assert_equal(kinds, set(["document", "key", "scope", "selector"]))
+    assert_equal(spans[-1]["kind"], "document")
+    for span in spans:
+        assert_true(span["duration"] >= 0)
+
+    url_spans = [s for s in spans if s["kind"] == "key" and s["path"] == "news/url"]
+    assert_equal(len(url_spans), 2)
+    assert_equal(url_spans[0]["stack"][:2], ["document", "news"])
+
+    folded = folded_stacks(out.getvalue().splitlines())
+    assert_true(any(l.startswith("document;news;") for l in folded))
+
+def test_debug_prints():
+    out = io.StringIO()
+    parselet = parslepy.Parselet(rules, tracer=MultiTracer(PrintTracer(out)))
+    parselet.parse_fromstring(html)
+    assert_in("news/url", out.getvalue())
+    assert_in("2 elements in scope", out.getvalue())
+
+def test_debug_flag_attaches_print_tracer():
+    parselet = parslepy.Parselet(rules, debug=True)
+    assert_is_instance(parselet.tracer, PrintTracer)
+
+class MessageTracer(Tracer):
+
+    def __init__(self):
+        self.messages = []
+
+    def message(self, text):
+        self.messages.append(text)
+
+def test_selector_errors_reach_parselet_tracer():
+    # evaluation errors, reported by the selector handler
+    tracer = MessageTracer()
+    parselet = parslepy.Parselet({"x?($undefined)": {"y": "."}}, tracer=tracer)
+    parselet.parse_fromstring(html)
+    assert_in("Undefined variable", tracer.messages[-1])
+
+    # compile errors, with a handler having another tracer
+    handler = parslepy.DefaultSelectorHandler(tracer=MessageTracer())
+    tracer = MessageTracer()
+    assert_raises(SyntaxError, parslepy.Parselet, {"x": "a[["},
+        selector_handler=handler, tracer=tracer)
+    assert_true(any(m.startswith("XPathSyntaxError") for m in tracer.messages),
+        tracer.messages)
+    assert_true(any("a[[" in m for m in handler.tracer.messages))
@@ -0,0 +1,77 @@
+from __future__ import unicode_literals
+from parslepy.utils.urltools import canonicalize_url, URLJoiner, BloomFilter, iter_urls
+from nose.tools import *
+from .tools import *
+
+try:
+    from urllib.parse import urljoin
+except ImportError:
+    from urlparse import urljoin
+
+def test_canonicalize_url():
+    urls = (
+        ("HTTP://Example.COM:80?b=2&a=1#top", "http://example.com/?a=1&b=2"),
+        ("https://example.com:443/a/b", "https://example.com/a/b"),
+        ("https://example.com:8443/a", "https://example.com:8443/a"),
+        ("http://User@Example.com/Path", "http://User@example.com/Path"),
+        ("http://[::1]:80/", "http://[::1]/"),
+        ("http://[::1]:8080/", "http://[::1]:8080/"),
+    )
+    for url, expected in urls:
+        assert_equal(canonicalize_url(url), expected)
+    assert_equal(canonicalize_url("http://a.com/#x", keep_fragments=True), "http://a.com/#x")
+
+def test_url_joiner():
+    bases = ("http://example.com/news/index.html?page=2", "https://example.com",
+             "http://example.com/a/b/")
+    links = ("a.html", "/b.html", "//cdn.example.com/c.js", "?page=3", "#top",
+             "../up.html", "/x/../y.html", "https://other.org/", " /spaces.html ",
+             "mailto:someone@example.com", "")
+    for base in bases:
+        joiner = URLJoiner(base)
+        assert_equal(list(joiner.join_all(links)),
+                     [urljoin(base, link.strip()) for link in links], base)
+
+def test_bloom_filter():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    urls = ["http://example.com/%d" % i for i in range(1000)]
+    assert_true(all(bloom.add(url) for url in urls[:500]))
+    assert_true(all(url in bloom for url in urls[:500]))
+    assert_false(bloom.add(urls[0]))
+    false_positives = sum(1 for url in urls[500:] if url in bloom)
+    assert_true(false_positives < 20, false_positives)
+    assert_equal(len(bloom), 500)
+
+    # past its capacity, a new filter is started;
+    # recent URLs are still found
+    for url in urls[500:]:
+        bloom.add(url)
+    assert_true(len(bloom) <= 1000)
+    new_urls = ["http://example.com/new/%d" % i for i in range(20)]
+    for url in new_urls:
+        bloom.add(url)
+    assert_true(len(bloom) < 20)
+    assert_true(all(url in bloom for url in new_urls))
+    assert_in(urls[999], bloom)
+
+    assert_raises(ValueError, BloomFilter, 0)
+
+def test_iter_urls():
+    base = "http://example.com/news/"
+    links = ["a.html", "/news/a.html#top", "b.html?y=1&x=2", "b.html?x=2&y=1",
+             "", "http://EXAMPLE.com/news/a.html", "c.html"]
+    assert_equal(list(iter_urls(base, links)), [
+        "http://example.com/news/a.html",
+        "http://example.com/news/b.html?y=1&x=2",
+        "http://example.com/news/c.html",
+    ])
+    assert_equal(len(list(iter_urls(base, links, canonicalize=False))), 6)
+
+    seen = set()
+    assert_equal(len(list(iter_urls(base, links, seen))), 3)
+    assert_equal(list(iter_urls(base, ["c.html", "d.html"], seen)),
+        ["http://example.com/news/d.html"])
+
+    seen = BloomFilter(capacity=100)
+    assert_equal(len(list(iter_urls(base, links, seen))), 3)
+    assert_equal(list(iter_urls(base, links, seen)), [])
@@ -0,0 +1,99 @@
+from __future__ import unicode_literals
+from parslepy.batch import BatchExtractor
+from parslepy.warc import iter_warc_records, iter_warc_documents, \
+    parse_http_response, content_charset, InvalidWarcRecord
+from nose.tools import *
+from .tools import *
+import gzip
+import io
+
+def http_response(body, headers=()):
+    head = ["HTTP/1.1 200 OK"] + ["%s: %s" % h for h in headers]
+    return ("\r\n".join(head) + "\r\n\r\n").encode("ascii") + body
+
+def warc_record(warc_type, uri, content):
+    head = "\r\n".join([
+        "WARC/1.0",
+        "WARC-Type: %s" % warc_type,
+        "WARC-Target-URI: %s" % uri,
+        "Content-Length: %d" % len(content),
+    ]) + "\r\n\r\n"
+    return head.encode("ascii") + content + b"\r\n\r\n"
+
+def gzip_member(data):
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode="wb") as fp:
+        fp.write(data)
+    return buf.getvalue()
+
+def chunked(data, size=7):
+    chunks = [data[i:i + size] for i in range(0, len(data), size)]
+    return b"".join(("%x\r\n" % len(c)).encode("ascii") + c + b"\r\n"
+                    for c in chunks) + b"0\r\n\r\n"
+
+page1 = "<html><head><title>caf\xe9</title></head></html>".encode("latin-1")
+page2 = b"<html><head><title>Second page</title></head></html>"
+
+records = [
+    warc_record("warcinfo", "", b"software: test\r\n"),
+    warc_record("request", "http://example.com/1", b"GET /1 HTTP/1.1\r\n\r\n"),
+    warc_record("response", "http://example.com/1", http_response(page1,
+        [("Content-Type", "text/html; charset=ISO-8859-1")])),
+    warc_record("response", "http://example.com/2", http_response(
+        chunked(gzip_member(page2)),
+        [("Content-Type", "text/html"),
+         ("Transfer-Encoding", "chunked"),
+         ("Content-Encoding", "gzip")])),
+    warc_record("response", "http://example.com/logo.png", http_response(b"\x89PNG",
+        [("Content-Type", "image/png")])),
+]
+
+def check_archive(data):
+    documents = list(iter_warc_documents(io.BytesIO(data)))
+    assert_equal(documents, [
+        ("http://example.com/1", page1, "ISO-8859-1"),
+        ("http://example.com/2", page2, None),
+    ])
+
+def test_iter_warc_documents():
+    check_archive(b"".join(records))
+
+def test_iter_warc_documents_gzip_per_record():
+    check_archive(b"".join(gzip_member(r) for r in records))
+
+def test_iter_warc_records():
+    types = [r.type for r in iter_warc_records(io.BytesIO(b"".join(records)))]
+    assert_equal(types, ["warcinfo", "request", "response", "response", "response"])
+
+def test_invalid_records():
+    assert_raises(InvalidWarcRecord, list,
+        iter_warc_records(io.BytesIO(b"HTTP/1.1 200 OK\r\n\r\n")))
+    assert_raises(InvalidWarcRecord, list,
+        iter_warc_records(io.BytesIO(records[2][:-40])))
+
+    data = warc_record("response", "http://example.com/x", b"garbage")
+    assert_raises(InvalidWarcRecord, list, iter_warc_documents(io.BytesIO(data)))
+    assert_equal(list(iter_warc_documents(io.BytesIO(data), skip_invalid=True)), [])
+
+def test_parse_http_response():
+    status, headers, body = parse_http_response(
+        b"HTTP/1.0 404 Not Found\nContent-Type: text/plain\n\nnope")
+    assert_equal(status, 404)
+    assert_equal(headers, {"content-type": "text/plain"})
+    assert_equal(body, b"nope")
+
+def test_content_charset():
+    assert_equal(content_charset('text/html; charset="utf-8"'), "utf-8")
+    assert_equal(content_charset("text/html;charset=windows-1252"), "windows-1252")
+    assert_equal(content_charset("text/html"), None)
+    assert_equal(content_charset(None), None)
+
+def test_batch_extraction():
+    extractor = BatchExtractor({"title": "title"})
+    data = b"".join(gzip_member(r) for r in records)
+    results = dict((r["source"], r["result"]) for r in
+        extractor.iter_results(iter_warc_documents(io.BytesIO(data))))
+    assert_equal(results, {
+        "http://example.com/1": {"title": "caf\xe9"},
+        "http://example.com/2": {"title": "Second page"},
+    })
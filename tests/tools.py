@@ -10,3 +10,44 @@ except ImportError:  # for Python < 2.7
         assert_tuple_equal = _binding.assertTupleEqual
     except:
         raise
+
+
+# sample news page shared by the tests
+NEWS_ARTICLES = [
+    ("/article-001.html", "This is the first article"),
+    ("/article-002.html", "A second report on something"),
+    ("/article-003.html", "Python is great!"),
+]
+
+def news_html(articles=2, items=(), before="", after="", ul_attributes=""):
+    """
+    Return the sample news page: a title, a "What's new" heading
+    and a list with the first `articles` news items, then `items`
+    (HTML of other <li> elements); `before` and `after` are
+    inserted before and after the list
+    """
+
+    lines = ['<li class="newsitem"><a href="%s">%s</a></li>' % article
+             for article in NEWS_ARTICLES[:articles]]
+    lines.extend(items)
+    return "\n".join([
+        "",
+        "<html>",
+        "<head><title>Sample document to test parslepy</title></head>",
+        "<body>",
+        '<h1 id="main">What\'s new</h1>',
+        ] + ([before] if before else []) + [
+        "<ul%s>" % ul_attributes,
+        ] + ["    " + line for line in lines] + [
+        "</ul>",
+        ] + ([after] if after else []) + [
+        "</body>",
+        "</html>",
+        "",
+    ])
+
+# the title of the page and the URLs of its news items
+NEWS_RULES = {
+    "title": "h1",
+    "news(li.newsitem)": [{"url": "a @href"}],
+}